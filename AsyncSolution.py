@@ -0,0 +1,332 @@
+import importlib
+from typing import List, Dict
+from Utility.AsyncDBConnector import AsyncDBConnector
+from Utility.Status import Status
+from Utility.Exceptions import DatabaseException
+from Utility.DBConnector import ResultSet
+from Utility.EntityCache import EntityCache
+from Utility.SharedCache import SharedCache
+from Business.File import File
+from Business.RAM import RAM
+from Business.Disk import Disk
+# Solution registers the prepared statements executed below (DBConnector.prepare) when it is imported, nothing
+# else of it is used here
+importlib.import_module("Solution")
+
+'''
+    asyncio counterparts of the Solution functions, with the same arguments and return values
+    each call borrows a connection from the pool of the running event loop, so many concurrent calls
+    are multiplexed over a few connections, e.g.
+        statuses = await asyncio.gather(*[AsyncSolution.addFile(file) for file in files])
+'''
+
+
+async def _rollback(conn):
+    if conn is not None:
+        await conn.rollback()
+
+
+async def _close(conn):
+    if conn is not None:
+        await conn.close()
+
+
+# runs the statements in one transaction and maps the outcome to a Status like the synchronous add* functions
+async def _write(statements, foreign_key_status=Status.BAD_PARAMS) -> Status:
+    conn = None
+    try:
+        conn = await AsyncDBConnector.connect()
+        for name, params in statements:
+            await conn.executePrepared(name, params)
+        await conn.commit()
+    except DatabaseException.ConnectionInvalid as e:
+        await _rollback(conn)
+        return Status.ERROR
+    except (DatabaseException.NOT_NULL_VIOLATION, DatabaseException.CHECK_VIOLATION) as e:
+        await _rollback(conn)
+        return Status.BAD_PARAMS
+    except DatabaseException.UNIQUE_VIOLATION as e:
+        await _rollback(conn)
+        return Status.ALREADY_EXISTS
+    except DatabaseException.FOREIGN_KEY_VIOLATION as e:
+        await _rollback(conn)
+        return foreign_key_status
+    except Exception as e:
+        await _rollback(conn)
+        return Status.ERROR
+    finally:
+        # will happen any way after code try termination or exception handling
+        await _close(conn)
+    return Status.OK
+
+
+# runs a single query, returns its ResultSet or None on any error
+async def _read(name, params=()) -> ResultSet:
+    conn = None
+    try:
+        conn = await AsyncDBConnector.connect()
+        _, result = await conn.executePrepared(name, params)
+        await conn.commit()
+    except Exception as e:
+        await _rollback(conn)
+        return None
+    finally:
+        # will happen any way after code try termination or exception handling
+        await _close(conn)
+    return result
+
+
+# _write that drops keys from the EntityCache once the statements committed
+async def _writeAndInvalidate(statements, keys, foreign_key_status=Status.BAD_PARAMS) -> Status:
+    status = await _write(statements, foreign_key_status)
+    if status == Status.OK:
+        EntityCache.invalidate(*keys)
+    return status
+
+
+# _read through the SharedCache and the EntityCache
+# returns the row values (None if there is no such row) or False on any error
+async def _readCached(name, key) -> tuple:
+    shared = SharedCache.get()
+    if shared is not None:
+        row = shared.lookup(*key)
+        if row is not None:
+            return row
+    cache = EntityCache.get()
+    generation = None
+    if cache is not None:
+        found, row = cache.lookup(key)
+        if found:
+            return row
+        generation = cache.generation()
+    result = await _read(name, (key[1],))
+    if result is None:
+        return False
+    row = None if result.isEmpty() else tuple(result.rows[0])
+    if cache is not None:
+        cache.put(key, row, generation)
+    return row
+
+
+async def addFile(file: File) -> Status:
+    return await _writeAndInvalidate([("addFile", (file.getFileID(), file.getType(), file.getSize()))],
+                                     [("File", file.getFileID())])
+
+
+async def getFileByID(fileID: int) -> File:
+    row = await _readCached("getFileByID", ("File", fileID))
+    if not row:
+        return File.badFile()
+    return File(*row)
+
+
+async def deleteFile(file: File) -> Status:
+    conn = None
+    try:
+        conn = await AsyncDBConnector.connect()
+        _, disks = await conn.executePrepared("deleteFileFreeSpace", (file.getFileID(), file.getSize()))
+        await conn.executePrepared("deleteFile", (file.getFileID(),))
+        await conn.commit()
+    except:
+        await _rollback(conn)
+        return Status.ERROR
+    finally:
+        # will happen any way after code try termination or exception handling
+        await _close(conn)
+    EntityCache.invalidate(("File", file.getFileID()), *[("Disk", diskID) for diskID in disks.column(0)])
+    return Status.OK
+
+
+async def addDisk(disk: Disk) -> Status:
+    return await _writeAndInvalidate([("addDisk", (disk.getDiskID(), disk.getCompany(), disk.getSpeed(),
+                                                   disk.getFreeSpace(), disk.getCost()))],
+                                     [("Disk", disk.getDiskID())])
+
+
+async def getDiskByID(diskID: int) -> Disk:
+    row = await _readCached("getDiskByID", ("Disk", diskID))
+    if not row:
+        return Disk.badDisk()
+    return Disk(*row)
+
+
+# deletes the row of the prepared statement name, NOT_EXISTS if there was none
+async def _delete(name, key) -> Status:
+    conn = None
+    try:
+        conn = await AsyncDBConnector.connect()
+        rows_effected, _ = await conn.executePrepared(name, (key,))
+        if rows_effected == 0:
+            return Status.NOT_EXISTS
+        await conn.commit()
+    except:
+        await _rollback(conn)
+        return Status.ERROR
+    finally:
+        # will happen any way after code try termination or exception handling
+        await _close(conn)
+    return Status.OK
+
+
+async def deleteDisk(diskID: int) -> Status:
+    status = await _delete("deleteDisk", diskID)
+    EntityCache.invalidate(("Disk", diskID))
+    return status
+
+
+async def addRAM(ram: RAM) -> Status:
+    return await _writeAndInvalidate([("addRAM", (ram.getRamID(), ram.getCompany(), ram.getSize()))],
+                                     [("RAM", ram.getRamID())])
+
+
+async def getRAMByID(ramID: int) -> RAM:
+    row = await _readCached("getRAMByID", ("RAM", ramID))
+    if not row:
+        return RAM.badRAM()
+    return RAM(*row)
+
+
+async def deleteRAM(ramID: int) -> Status:
+    status = await _delete("deleteRAM", ramID)
+    EntityCache.invalidate(("RAM", ramID))
+    return status
+
+
+async def addDiskAndFile(disk: Disk, file: File) -> Status:
+    return await _writeAndInvalidate([("addFile", (file.getFileID(), file.getType(), file.getSize())),
+                                      ("addDisk", (disk.getDiskID(), disk.getCompany(), disk.getSpeed(),
+                                                   disk.getFreeSpace(), disk.getCost()))],
+                                     [("File", file.getFileID()), ("Disk", disk.getDiskID())])
+
+
+async def addFileToDisk(file: File, diskID: int) -> Status:
+    return await _writeAndInvalidate([("addFileToDisk", (file.getFileID(), diskID)),
+                                      ("addFileToDiskFreeSpace", (diskID, file.getSize()))],
+                                     [("Disk", diskID)], foreign_key_status=Status.NOT_EXISTS)
+
+
+async def removeFileFromDisk(file: File, diskID: int) -> Status:
+    conn = None
+    try:
+        conn = await AsyncDBConnector.connect()
+        await conn.executePrepared("removeFileFromDiskFreeSpace", (file.getFileID(), diskID, file.getSize()))
+        await conn.executePrepared("removeFileFromDisk", (file.getFileID(), diskID))
+        await conn.commit()
+    except (DatabaseException.CHECK_VIOLATION, DatabaseException.FOREIGN_KEY_VIOLATION) as e:
+        await _rollback(conn)
+        return Status.OK
+    except Exception as e:
+        await _rollback(conn)
+        return Status.ERROR
+    finally:
+        # will happen any way after code try termination or exception handling
+        await _close(conn)
+    EntityCache.invalidate(("Disk", diskID))
+    return Status.OK
+
+
+async def addRAMToDisk(ramID: int, diskID: int) -> Status:
+    return await _write([("addRAMToDisk", (ramID, diskID))], foreign_key_status=Status.NOT_EXISTS)
+
+
+async def removeRAMFromDisk(ramID: int, diskID: int) -> Status:
+    conn = None
+    try:
+        conn = await AsyncDBConnector.connect()
+        rows_effected, _ = await conn.executePrepared("removeRAMFromDisk", (ramID, diskID))
+        await conn.commit()
+    except (DatabaseException.CHECK_VIOLATION, DatabaseException.FOREIGN_KEY_VIOLATION) as e:
+        await _rollback(conn)
+        return Status.NOT_EXISTS
+    except Exception as e:
+        await _rollback(conn)
+        return Status.ERROR
+    finally:
+        # will happen any way after code try termination or exception handling
+        await _close(conn)
+    if rows_effected == 0:
+        return Status.NOT_EXISTS
+    return Status.OK
+
+
+async def averageFileSizeOnDisk(diskID: int) -> float:
+    result = await _read("averageFileSizeOnDisk", (diskID,))
+    if result is None:
+        return -1
+    if not result.scalar():
+        return 0
+    return float(result.scalar())
+
+
+async def averageFileSizeOnDisks(diskIDs: List[int]) -> List[float]:
+    result = await _read("averageFileSizeOnDisks", (list(diskIDs),))
+    if result is None:
+        return [-1] * len(diskIDs)
+    return [float(average) if average else 0 for average in result.column(0)]
+
+
+async def diskTotalRAM(diskID: int) -> int:
+    result = await _read("diskTotalRAM", (diskID,))
+    if result is None:
+        return -1
+    if not result.scalar():
+        return 0
+    return result.scalar()
+
+
+async def getCostForType(type: str) -> int:
+    result = await _read("getCostForType", (type,))
+    if result is None:
+        return -1
+    if not result.scalar():
+        return 0
+    return result.scalar()
+
+
+async def getCostPerType() -> Dict[str, int]:
+    result = await _read("getCostPerType")
+    if result is None:
+        return {}
+    return dict(zip(result.column(0), result.column(1)))
+
+
+async def _topK(name: str, params: tuple, k) -> List[int]:
+    result = await _read(name, params + (k,))
+    if result is None:
+        return []
+    return result.column(0)
+
+
+async def getFilesCanBeAddedToDisk(diskID: int, k: int = 5) -> List[int]:
+    return await _topK("getFilesCanBeAddedToDisk", (diskID,), k)
+
+
+async def getFilesCanBeAddedToDiskAndRAM(diskID: int, k: int = 5) -> List[int]:
+    return await _topK("getFilesCanBeAddedToDiskAndRAM", (diskID,), k)
+
+
+async def isCompanyExclusive(diskID: int) -> bool:
+    result = await _read("isCompanyExclusive", (diskID,))
+    return result is not None and result.size() == 1
+
+
+async def getExclusiveDisks() -> List[int]:
+    result = await _read("getExclusiveDisks")
+    if result is None:
+        return []
+    return result.column(0)
+
+
+async def getConflictingDisks() -> List[int]:
+    result = await _read("getConflictingDisks")
+    if result is None:
+        return []
+    return result.column(0)
+
+
+async def mostAvailableDisks(k: int = 5) -> List[int]:
+    return await _topK("mostAvailableDisks", (), k)
+
+
+async def getCloseFiles(fileID: int, k: int = 10) -> List[int]:
+    return await _topK("getCloseFiles", (fileID,), k)
@@ -36,6 +36,13 @@ class Disk:
     def setCost(self, cost):
         self.__cost = cost
 
+    # whether a disk with these values can be added
+    @staticmethod
+    def validParams(diskID, company, speed, free_space, cost) -> bool:
+        if company is None or not all(isinstance(value, int) for value in (diskID, speed, free_space, cost)):
+            return False
+        return diskID > 0 and speed > 0 and free_space >= 0 and cost > 0
+
     @staticmethod
     def badDisk():
         return Disk()
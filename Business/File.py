@@ -22,6 +22,11 @@ class File:
     def setSize(self, size):
         self.__size = size
 
+    # False for a row the Files table rejects, fileID and size must be ints
+    @staticmethod
+    def validParams(fileID, type, size) -> bool:
+        return type is not None and isinstance(fileID, int) and fileID > 0 and isinstance(size, int) and size >= 0
+
     @staticmethod
     def badFile():
         return File()
@@ -22,6 +22,11 @@ class RAM:
     def setSize(self, size):
         self.__size = size
 
+    # positive int id and size, some company
+    @staticmethod
+    def validParams(ramID, company, size) -> bool:
+        return company is not None and isinstance(ramID, int) and ramID > 0 and isinstance(size, int) and size > 0
+
     @staticmethod
     def badRAM():
         return RAM()
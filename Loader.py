@@ -0,0 +1,255 @@
+import csv
+import io
+import struct
+from typing import Iterable
+import Utility.DBConnector as Connector
+from Utility.Exceptions import DatabaseException
+from Utility.EntityCache import EntityCache
+from Business.File import File
+from Business.RAM import RAM
+from Business.Disk import Disk
+
+'''
+    bulk loading with COPY FROM STDIN, for initial loads and disaster recovery
+    a source is one of
+        - a path or a file object with CSV rows (format="csv", columns ordered as in the table)
+        - a path or a binary file object in PostgreSQL's binary COPY format (format="binary")
+        - an iterable of tuples (or of File / Disk / RAM objects for the matching table)
+    the input is streamed in chunks and checked against the NOT NULL and CHECK constraints of createTables before
+    it is sent, an invalid row aborts the whole load with NOT_NULL_VIOLATION / CHECK_VIOLATION
+    malformed input (a value that is not an integer, a wrong number of columns, a broken binary stream) aborts it
+    with ValueError
+    every load runs in its own transaction and returns the number of loaded rows
+'''
+
+# PostgreSQL binary COPY framing
+_SIGNATURE = b"PGCOPY\n\xff\r\n\x00"
+_INT = struct.Struct("!i")
+_SHORT = struct.Struct("!h")
+
+
+# how a table is loaded: column names, which columns are integers and the row check
+class _Table:
+    def __init__(self, name: str, columns: tuple, integers: tuple, isValid, toRow=None):
+        self.name = name
+        self.columns = columns
+        self.integers = integers
+        self.isValid = isValid
+        self.toRow = toRow
+
+
+_FILES = _Table("Files", ("file_id", "type", "size"), (True, False, True), File.validParams,
+                lambda file: (file.getFileID(), file.getType(), file.getSize()))
+_DISKS = _Table("Disks", ("disk_id", "company", "speed", "free_space", "cost"), (True, False, True, True, True),
+                Disk.validParams,
+                lambda disk: (disk.getDiskID(), disk.getCompany(), disk.getSpeed(), disk.getFreeSpace(),
+                              disk.getCost()))
+_RAMS = _Table("Rams", ("ram_id", "company", "size"), (True, False, True), RAM.validParams,
+               lambda ram: (ram.getRamID(), ram.getCompany(), ram.getSize()))
+_FILES_IN_DISKS = _Table("FilesInDisks", ("file_id", "disk_id"), (True, True),
+                         lambda file_id, disk_id: file_id is not None and disk_id is not None)
+_RAMS_IN_DISKS = _Table("RamsInDisks", ("ram_id", "disk_id"), (True, True),
+                        lambda ram_id, disk_id: ram_id is not None and disk_id is not None)
+
+
+def loadFiles(source, format="csv", chunkSize=1 << 16) -> int:
+    return _load(_FILES, source, format, chunkSize)
+
+
+def loadDisks(source, format="csv", chunkSize=1 << 16) -> int:
+    return _load(_DISKS, source, format, chunkSize)
+
+
+def loadRAMs(source, format="csv", chunkSize=1 << 16) -> int:
+    return _load(_RAMS, source, format, chunkSize)
+
+
+# rows are (file_id, disk_id), the free_space of every disk that received files is reduced by their total size
+def loadFilesInDisks(source, format="csv", chunkSize=1 << 16) -> int:
+    return _load(_FILES_IN_DISKS, source, format, chunkSize, staged=True)
+
+
+# rows are (ram_id, disk_id)
+def loadRamsInDisks(source, format="csv", chunkSize=1 << 16) -> int:
+    return _load(_RAMS_IN_DISKS, source, format, chunkSize)
+
+
+def _load(table: _Table, source, format: str, chunkSize: int, staged=False) -> int:
+    if format not in ("csv", "binary"):
+        raise ValueError("unknown format " + str(format) + ", expected csv or binary")
+    opened = None
+    if isinstance(source, str):
+        opened = source = open(source, "rb" if format == "binary" else "r", newline="")
+    conn = None
+    try:
+        conn = Connector.DBConnector()
+        target = table.name
+        if staged:
+            # placements go through a staging table so free_space can be fixed in one set-based pass
+            target = "Load" + table.name
+            conn.execute("CREATE TEMP TABLE " + target + " (file_id integer, disk_id integer) ON COMMIT DROP")
+        if format == "binary" and hasattr(source, "read"):
+            chunks = _binaryChunks(table, source, chunkSize)
+            query = "COPY " + target + "(" + ", ".join(table.columns) + ") FROM STDIN WITH (FORMAT binary)"
+        else:
+            rows = _csvRows(table, source) if hasattr(source, "read") else _objectRows(table, source)
+            chunks = _textChunks(rows, chunkSize)
+            query = "COPY " + target + "(" + ", ".join(table.columns) + ") FROM STDIN"
+        loaded = conn.copyFrom(query, _ChunkReader(chunks), chunkSize)
+        if staged:
+            conn.execute("INSERT INTO FilesInDisks(file_id, disk_id) SELECT file_id, disk_id FROM " + target)
+            conn.execute("UPDATE Disks SET free_space = Disks.free_space - loaded.total_size "
+                         "FROM (SELECT " + target + ".disk_id, SUM(Files.size) AS total_size FROM " + target + " "
+                         "INNER JOIN Files ON " + target + ".file_id = Files.file_id "
+                         "GROUP BY " + target + ".disk_id) AS loaded "
+                         "WHERE Disks.disk_id = loaded.disk_id")
+            # ON COMMIT DROP only happens at the end of a Session, a second load in it creates the table again
+            conn.execute("DROP TABLE " + target)
+        conn.commit()
+        # a load may add rows that are cached as missing, or change free_space of many disks
+        EntityCache.flush()
+        return loaded
+    except Exception:
+        if conn is not None:
+            conn.rollback()
+        raise
+    finally:
+        if conn is not None:
+            conn.close()
+        if opened is not None:
+            opened.close()
+
+
+# ValueError for input that is not a row of table at all
+def _malformed(table: _Table, line: int, problem: str) -> ValueError:
+    return ValueError("malformed " + table.name + " row " + str(line) + ": " + problem)
+
+
+# raises the violation a row would cause in the database
+def _check(table: _Table, row: tuple, line: int):
+    if len(row) != len(table.columns):
+        raise _malformed(table, line, "expected " + str(len(table.columns)) + " columns")
+    for value, integer in zip(row, table.integers):
+        if integer and value is not None and not isinstance(value, int):
+            raise _malformed(table, line, repr(value) + " is not an integer")
+    if table.isValid(*row):
+        return
+    if None in row:
+        raise DatabaseException.NOT_NULL_VIOLATION("NOT_NULL_VIOLATION in " + table.name + " row " + str(line))
+    raise DatabaseException.CHECK_VIOLATION("CHECK_VIOLATION in " + table.name + " row " + str(line))
+
+
+# rows of an iterable of tuples or Business objects
+def _objectRows(table: _Table, source: Iterable):
+    for line, row in enumerate(source, 1):
+        if not isinstance(row, (tuple, list)) and table.toRow is not None:
+            row = table.toRow(row)
+        row = tuple(row)
+        _check(table, row, line)
+        yield row
+
+
+# rows of a CSV file, an empty field is NULL
+def _csvRows(table: _Table, source):
+    for line, fields in enumerate(csv.reader(source), 1):
+        if not fields:
+            continue
+        try:
+            row = tuple(None if field == "" else int(field) if integer else field
+                        for field, integer in zip(fields, table.integers))
+        except ValueError:
+            raise _malformed(table, line, "not an integer")
+        _check(table, row + tuple(fields[len(table.integers):]), line)
+        yield row
+
+
+# encodes rows in COPY's text format, about chunkSize bytes per chunk
+def _textChunks(rows, chunkSize: int):
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(_textField(value) for value in row))
+        buffer.write("\n")
+        if buffer.tell() >= chunkSize:
+            yield buffer.getvalue().encode()
+            buffer = io.StringIO()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def _textField(value) -> str:
+    if value is None:
+        return "\\N"
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+# validates a binary COPY stream tuple by tuple and passes it on unchanged, about chunkSize bytes per chunk
+def _binaryChunks(table: _Table, source, chunkSize: int):
+    header = _readExactly(source, len(_SIGNATURE) + 8)
+    if header[:len(_SIGNATURE)] != _SIGNATURE:
+        raise ValueError("malformed " + table.name + " input: not a binary COPY stream")
+    extension = _readExactly(source, _INT.unpack_from(header, len(_SIGNATURE) + 4)[0])
+    buffer = bytearray(header + extension)
+    line = 0
+    while True:
+        count_bytes = _readExactly(source, 2)
+        buffer += count_bytes
+        count = _SHORT.unpack(count_bytes)[0]
+        if count == -1:
+            break
+        line += 1
+        if count != len(table.columns):
+            raise _malformed(table, line, "expected " + str(len(table.columns)) + " columns")
+        row = []
+        for integer in table.integers:
+            length_bytes = _readExactly(source, 4)
+            length = _INT.unpack(length_bytes)[0]
+            data = _readExactly(source, length) if length >= 0 else b""
+            buffer += length_bytes + data
+            if length < 0:
+                row.append(None)
+            elif integer:
+                if length != 4:
+                    raise _malformed(table, line, "integer field of " + str(length) + " bytes")
+                row.append(_INT.unpack(data)[0])
+            else:
+                row.append(data.decode())
+        _check(table, tuple(row), line)
+        if len(buffer) >= chunkSize:
+            yield bytes(buffer)
+            buffer = bytearray()
+    yield bytes(buffer)
+
+
+def _readExactly(source, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        more = source.read(size - len(data))
+        if not more:
+            raise ValueError("malformed input: binary COPY stream ended unexpectedly")
+        data += more
+    return data
+
+
+# file-like object over a generator of byte chunks, as expected by cursor.copy_expert
+# psycopg2 turns exceptions raised in read() into QueryCanceled, so the original one is kept in error
+class _ChunkReader:
+    def __init__(self, chunks):
+        self.error = None
+        self.__chunks = chunks
+        self.__pending = b""
+
+    def read(self, size=-1):
+        try:
+            while self.__chunks is not None and (size < 0 or len(self.__pending) < size):
+                chunk = next(self.__chunks, None)
+                if chunk is None:
+                    self.__chunks = None
+                    break
+                self.__pending += chunk
+        except Exception as e:
+            self.error = e
+            raise
+        if size < 0:
+            size = len(self.__pending)
+        data, self.__pending = self.__pending[:size], self.__pending[size:]
+        return data
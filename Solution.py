@@ -1,13 +1,131 @@
-from typing import List
+import sys
+from typing import List, Dict
 import Utility.DBConnector as Connector
 from Utility.Status import Status
 from Utility.Exceptions import DatabaseException
 from Utility.DBConnector import ResultSet
+from Utility.Session import Session
+from Utility.EntityCache import EntityCache
+from Utility.SharedCache import SharedCache
+from Utility import ChangeListener
 from Business.File import File
 from Business.RAM import RAM
 from Business.Disk import Disk
 from psycopg2 import sql
 
+# every query below is PREPAREd once per pooled connection and then EXECUTEd with bound values
+Connector.DBConnector.prepare("addFile", "INSERT INTO Files(file_id, type, size) VALUES($1, $2, $3)",
+                              ("integer", "text", "integer"))
+Connector.DBConnector.prepare("getFileByID", "SELECT * FROM Files WHERE file_id=$1", ("integer",))
+Connector.DBConnector.prepare("deleteFileFreeSpace",
+                              "UPDATE Disks SET free_space = free_space + $2 "
+                              "WHERE disk_id IN (SELECT disk_id FROM FilesInDisks WHERE file_id=$1) RETURNING disk_id",
+                              ("integer", "integer"))
+Connector.DBConnector.prepare("deleteFile", "DELETE FROM Files WHERE file_id=$1", ("integer",))
+Connector.DBConnector.prepare("addDisk",
+                              "INSERT INTO Disks(disk_id, company, speed, free_space, cost) VALUES($1, $2, $3, $4, $5)",
+                              ("integer", "text", "integer", "integer", "integer"))
+Connector.DBConnector.prepare("getDiskByID", "SELECT * FROM Disks WHERE disk_id=$1", ("integer",))
+Connector.DBConnector.prepare("deleteDisk", "DELETE FROM Disks WHERE disk_id=$1", ("integer",))
+Connector.DBConnector.prepare("addRAM", "INSERT INTO Rams(ram_id, company, size) VALUES($1, $2, $3)",
+                              ("integer", "text", "integer"))
+Connector.DBConnector.prepare("getRAMByID", "SELECT * FROM Rams WHERE ram_id=$1", ("integer",))
+Connector.DBConnector.prepare("getFilesByIDs", "SELECT * FROM Files WHERE file_id = ANY($1)", ("integer[]",))
+Connector.DBConnector.prepare("getDisksByIDs", "SELECT * FROM Disks WHERE disk_id = ANY($1)", ("integer[]",))
+Connector.DBConnector.prepare("getRAMsByIDs", "SELECT * FROM Rams WHERE ram_id = ANY($1)", ("integer[]",))
+Connector.DBConnector.prepare("deleteRAM", "DELETE FROM Rams WHERE ram_id=$1", ("integer",))
+Connector.DBConnector.prepare("addFileToDisk", "INSERT INTO FilesInDisks(file_id, disk_id) VALUES($1, $2)",
+                              ("integer", "integer"))
+Connector.DBConnector.prepare("addFileToDiskFreeSpace",
+                              "UPDATE Disks SET free_space = free_space - $2 WHERE disk_id=$1",
+                              ("integer", "integer"))
+Connector.DBConnector.prepare("removeFileFromDiskFreeSpace",
+                              "UPDATE Disks SET free_space = free_space + $3 "
+                              "WHERE disk_id=(SELECT disk_id FROM FilesInDisks WHERE file_id=$1 AND disk_id=$2)",
+                              ("integer", "integer", "integer"))
+Connector.DBConnector.prepare("removeFileFromDisk", "DELETE FROM FilesInDisks WHERE file_id=$1 AND disk_id=$2",
+                              ("integer", "integer"))
+Connector.DBConnector.prepare("lockDiskFreeSpace", "SELECT free_space FROM Disks WHERE disk_id=$1 FOR UPDATE",
+                              ("integer",))
+Connector.DBConnector.prepare("filesToDiskState",
+                              "SELECT ids.file_id, Files.file_id IS NOT NULL, FilesInDisks.file_id IS NOT NULL "
+                              "FROM UNNEST($1) AS ids(file_id) "
+                              "LEFT JOIN Files ON Files.file_id = ids.file_id "
+                              "LEFT JOIN FilesInDisks ON FilesInDisks.file_id = ids.file_id AND FilesInDisks.disk_id = $2",
+                              ("integer[]", "integer"))
+Connector.DBConnector.prepare("addFilesToDisk", "INSERT INTO FilesInDisks(file_id, disk_id) SELECT UNNEST($1), $2",
+                              ("integer[]", "integer"))
+Connector.DBConnector.prepare("removeFilesFromDisk",
+                              "DELETE FROM FilesInDisks WHERE disk_id=$2 AND file_id = ANY($1) RETURNING file_id",
+                              ("integer[]", "integer"))
+Connector.DBConnector.prepare("removeFilesFromDiskFreeSpace",
+                              "UPDATE Disks SET free_space = free_space + $2 WHERE disk_id=$1", ("integer", "integer"))
+Connector.DBConnector.prepare("addRAMToDisk", "INSERT INTO RamsInDisks(ram_id, disk_id) VALUES($1, $2)",
+                              ("integer", "integer"))
+Connector.DBConnector.prepare("removeRAMFromDisk", "DELETE FROM RamsInDisks WHERE ram_id=$1 AND disk_id=$2",
+                              ("integer", "integer"))
+Connector.DBConnector.prepare("averageFileSizeOnDisk",
+                              "SELECT total_file_size::numeric / NULLIF(file_count, 0) FROM DiskStats WHERE disk_id = $1",
+                              ("integer",))
+Connector.DBConnector.prepare("averageFileSizeOnDisks",
+                              "SELECT DiskStats.total_file_size::numeric / NULLIF(DiskStats.file_count, 0) "
+                              "FROM UNNEST($1) WITH ORDINALITY AS ids(disk_id, position) "
+                              "LEFT OUTER JOIN DiskStats ON ids.disk_id = DiskStats.disk_id "
+                              "ORDER BY ids.position",
+                              ("integer[]",))
+Connector.DBConnector.prepare("diskTotalRAM", "SELECT total_ram FROM DiskStats WHERE disk_id = $1", ("integer",))
+Connector.DBConnector.prepare("getCostForType", "SELECT cost FROM TypeCosts WHERE type = $1", ("text",))
+Connector.DBConnector.prepare("getCostPerType", "SELECT type, cost FROM TypeCosts WHERE cost != 0 ORDER BY type")
+Connector.DBConnector.prepare("getFilesCanBeAddedToDisk",
+                              "SELECT file_id FROM Files "
+                              "WHERE Files.size <= "
+                              "(SELECT free_space FROM Disks WHERE disk_id=$1) "
+                              "ORDER BY file_id DESC LIMIT $2",
+                              ("integer", "bigint"))
+Connector.DBConnector.prepare("getFilesCanBeAddedToDiskAndRAM",
+                              "SELECT file_id FROM Files "
+                              "WHERE Files.size <= "
+                              "(SELECT LEAST(Disks.free_space, DiskStats.total_ram) FROM Disks "
+                              "INNER JOIN DiskStats ON Disks.disk_id = DiskStats.disk_id WHERE Disks.disk_id = $1) "
+                              "ORDER BY file_id ASC LIMIT $2",
+                              ("integer", "bigint"))
+Connector.DBConnector.prepare("isCompanyExclusive",
+                              "SELECT disk_id FROM DiskStats WHERE disk_id = $1 AND foreign_ram_count = 0",
+                              ("integer",))
+Connector.DBConnector.prepare("getExclusiveDisks",
+                              "SELECT disk_id FROM DiskStats WHERE foreign_ram_count = 0 ORDER BY disk_id ASC")
+Connector.DBConnector.prepare("getConflictingDisks",
+                              "SELECT disk_id FROM DiskStats WHERE conflict_count > 0 ORDER BY disk_id ASC")
+Connector.DBConnector.prepare("mostAvailableDisks",
+                              "SELECT disk_id FROM CountFilesCanBeInDisksWithZeros "
+                              "ORDER BY count DESC, speed DESC, disk_id ASC LIMIT $1",
+                              ("bigint",))
+# a file on no disk is close to every other file, otherwise an index range read of its pairs
+Connector.DBConnector.prepare("getCloseFiles",
+                              "SELECT file2_id FROM FilePairs "
+                              "WHERE file_id = $1 AND shared_disks * 2 >= "
+                              "(SELECT disk_count FROM FilePlacements WHERE file_id = $1) "
+                              "UNION ALL "
+                              "SELECT file_id FROM Files "
+                              "WHERE file_id != $1 AND (SELECT disk_count FROM FilePlacements WHERE file_id = $1) = 0 "
+                              "ORDER BY file2_id ASC LIMIT $2",
+                              ("integer", "bigint"))
+Connector.DBConnector.prepare("existingIndexes",
+                              "SELECT indexname FROM pg_indexes "
+                              "WHERE schemaname = current_schema() AND indexname = ANY($1)",
+                              ("name[]",))
+
+# secondary indexes created by createTables and checked by verifyIndexes, as (name, table, columns)
+_INDEXES = [
+    # the placement primary keys lead with file_id/ram_id, these serve the disk_id lookups and the Disks cascades
+    ("FilesInDisksDiskIndex", "FilesInDisks", "disk_id, file_id"),
+    ("RamsInDisksDiskIndex", "RamsInDisks", "disk_id, ram_id"),
+    # size range scans of getFilesCanBeAddedToDisk(AndRAM) with file_id in the index (index-only)
+    ("FilesSizeIndex", "Files", "size, file_id"),
+    ("FilesTypeIndex", "Files", "type"),
+    ("DisksFreeSpaceIndex", "Disks", "free_space"),
+]
+
 
 def createTables():
     conn = None
@@ -42,6 +160,8 @@ def createTables():
                      "disk_id integer,"
                      "FOREIGN KEY (disk_id) REFERENCES Disks(disk_id) ON DELETE CASCADE,"
                      "PRIMARY KEY (ram_id, disk_id))")
+        for name, table, columns in _INDEXES:
+            conn.execute("CREATE INDEX " + name + " ON " + table + "(" + columns + ")")
         # views
 
         conn.execute("CREATE VIEW FilesInDisksWithFileData AS "
@@ -72,17 +192,20 @@ def createTables():
         conn.execute("CREATE VIEW FilesInDisksWithoutSingleFiles AS "
                      "SELECT file_id, disk_id FROM FilesInDisks WHERE file_id IN (SELECT file_id FROM CountFilesInDisks1)")
 
-        conn.execute("CREATE VIEW FilesCanBeInDisks AS "
-                     "SELECT file_id, disk_id, speed FROM Files, Disks WHERE Files.size <= Disks.free_space")
+        # number of files that fit on each disk (0 included) without joining Files x Disks:
+        # file sizes and free spaces are sorted together once and every disk counts the file sizes before it,
+        # a file of exactly free_space sorts before the disk (kind 0 < 1) so it is counted
+        conn.execute("CREATE VIEW CountFilesCanBeInDisksWithZeros AS "
+                     "SELECT disk_id, count, speed FROM "
+                     "(SELECT kind, disk_id, speed, "
+                     "COUNT(*) FILTER (WHERE kind = 0) OVER (ORDER BY value, kind ROWS UNBOUNDED PRECEDING) AS count "
+                     "FROM (SELECT size AS value, 0 AS kind, NULL::integer AS disk_id, NULL::integer AS speed FROM Files "
+                     "UNION ALL "
+                     "SELECT free_space, 1, disk_id, speed FROM Disks) AS Sizes) AS Sweep "
+                     "WHERE kind = 1")
 
         conn.execute("CREATE VIEW CountFilesCanBeInDisks AS "
-                     "SELECT disk_id, COUNT(*), speed FROM FilesCanBeInDisks GROUP BY disk_id, speed")
-
-        conn.execute("CREATE VIEW CountFilesCanBeInDisksWithZeros AS "
-                     "SELECT disk_id, count, speed FROM CountFilesCanBeInDisks "
-                     "UNION "
-                     "SELECT Disks.disk_id, 0 AS count, Disks.speed FROM Disks "
-                     "WHERE disk_id IN (SELECT disk_id FROM Disks EXCEPT SELECT disk_id FROM CountFilesCanBeInDisks)")
+                     "SELECT disk_id, count, speed FROM CountFilesCanBeInDisksWithZeros WHERE count > 0")
 
         conn.execute("CREATE VIEW FilesInNoDisk AS "
                      "SELECT file_id FROM Files EXCEPT SELECT file_id FROM FilesInDisks")
@@ -105,6 +228,12 @@ def createTables():
         conn.execute("CREATE VIEW CountFilesInDisksForClose AS "
                      "SELECT file_id, file2_id, COUNT(*) FROM FilesInDisksForCloseNoDup GROUP BY file_id, file2_id")
 
+        _createCloseFilesIndex(conn)
+        _createDiskStats(conn)
+        _createTypeCosts(conn)
+        _createChangeNotifications(conn)
+        _notifyAllChanged(conn)
+
 
 
         conn.commit()
@@ -124,6 +253,8 @@ def createTables():
     finally:
         # will happen any way after try termination or exception handling
         conn.close()
+    # nothing cached before is valid anymore
+    EntityCache.flush()
 
 
 def clearTables():
@@ -150,6 +281,8 @@ def clearTables():
         print(e)
     finally:
         conn.close()
+    # nothing cached before is valid anymore
+    EntityCache.flush()
 
 
 def dropTables():
@@ -166,12 +299,26 @@ def dropTables():
         conn.execute("DROP VIEW IF EXISTS FilesInDisksWithFileDataAndCost CASCADE")
         conn.execute("DROP VIEW IF EXISTS PricePerType CASCADE")
         conn.execute("DROP VIEW IF EXISTS CountFilesInDisks1 CASCADE")
+        # no longer created, dropped for schemas created before the sweep
         conn.execute("DROP VIEW IF EXISTS FilesCanBeInDisks CASCADE")
         conn.execute("DROP VIEW IF EXISTS CountFilesCanBeInDisks CASCADE")
+        conn.execute("DROP VIEW IF EXISTS CountFilesCanBeInDisksWithZeros CASCADE")
         conn.execute("DROP VIEW IF EXISTS FilesInDisksForClose CASCADE")
         conn.execute("DROP VIEW IF EXISTS FilesInDisksForCloseNoDup CASCADE")
         conn.execute("DROP VIEW IF EXISTS CountFilesInDisks2 CASCADE")
         conn.execute("DROP VIEW IF EXISTS CountFilesInDisksForClose CASCADE")
+        conn.execute("DROP TABLE IF EXISTS FilePairs CASCADE")
+        conn.execute("DROP TABLE IF EXISTS FilePlacements CASCADE")
+        conn.execute("DROP FUNCTION IF EXISTS FilesAdded, FilesInDisksAdded, FilesInDisksRemoved CASCADE")
+        conn.execute("DROP TABLE IF EXISTS DiskStats CASCADE")
+        conn.execute("DROP FUNCTION IF EXISTS DisksAdded, FilesInDisksStatsAdded, FilesInDisksStatsRemoved, "
+                     "FileDeleting, RamsInDisksStatsAdded, RamsInDisksStatsRemoved, RamDeleting, "
+                     "FilesInDisksConflictsAdded, FilesInDisksConflictsRemoved CASCADE")
+        conn.execute("DROP TABLE IF EXISTS TypeCosts CASCADE")
+        conn.execute("DROP FUNCTION IF EXISTS FilesInDisksCostAdded, FilesInDisksCostRemoved, FileCostDeleting, "
+                     "DiskCostDeleting CASCADE")
+        conn.execute("DROP FUNCTION IF EXISTS NotifyChanges CASCADE")
+        _notifyAllChanged(conn)
         conn.commit()
     except DatabaseException.ConnectionInvalid as e:
         print(e)
@@ -188,18 +335,422 @@ def dropTables():
     finally:
         # will happen any way after code try termination or exception handling
         conn.close()
+    # nothing cached before is valid anymore
+    EntityCache.flush()
+
+
+# DROP and CREATE instead of CREATE OR REPLACE TRIGGER, which needs PostgreSQL 14
+def _createTrigger(conn, name: str, when: str, table: str, body: str):
+    conn.execute("DROP TRIGGER IF EXISTS " + name + " ON " + table)
+    conn.execute("CREATE TRIGGER " + name + " " + when + " ON " + table + " " + body)
+
+
+# co-location index behind getCloseFiles, kept exact by triggers:
+#   FilePlacements - number of disks of every file (0 for a file on no disk)
+#   FilePairs      - number of disks shared by every two different files that share at least one
+# the FilesInDisks triggers are per statement and see all changed rows at once (transition tables),
+# so multi-row inserts/deletes (cascades from Files and Disks, bulk loads) are counted once per pair
+def _createCloseFilesIndex(conn):
+    conn.execute("CREATE TABLE IF NOT EXISTS FilePlacements"
+                 "(file_id integer PRIMARY KEY REFERENCES Files(file_id) ON DELETE CASCADE,"
+                 "disk_count integer NOT NULL)")
+    conn.execute("CREATE TABLE IF NOT EXISTS FilePairs"
+                 "(file_id integer REFERENCES Files(file_id) ON DELETE CASCADE,"
+                 "file2_id integer REFERENCES Files(file_id) ON DELETE CASCADE,"
+                 "shared_disks integer NOT NULL,"
+                 "PRIMARY KEY (file_id, file2_id))")
+    # FilePairs has a row for both orders of a pair, the cascade from Files looks rows up by file2_id as well
+    conn.execute("CREATE INDEX IF NOT EXISTS FilePairsFile2Index ON FilePairs(file2_id)")
+
+    conn.execute("CREATE OR REPLACE FUNCTION FilesAdded() RETURNS trigger AS $$ BEGIN "
+                 "INSERT INTO FilePlacements(file_id, disk_count) SELECT file_id, 0 FROM NewFiles; "
+                 "RETURN NULL; "
+                 "END $$ LANGUAGE plpgsql")
+    _createTrigger(conn, "FilesAddedTrigger", "AFTER INSERT", "Files",
+                   "REFERENCING NEW TABLE AS NewFiles FOR EACH STATEMENT EXECUTE FUNCTION FilesAdded()")
+
+    # a pair gains one shared disk for every disk that holds both files after the insert and at least one of
+    # them because of it
+    conn.execute("CREATE OR REPLACE FUNCTION FilesInDisksAdded() RETURNS trigger AS $$ BEGIN "
+                 "UPDATE FilePlacements SET disk_count = disk_count + added.count "
+                 "FROM (SELECT file_id, COUNT(*) AS count FROM NewFilesInDisks GROUP BY file_id) AS added "
+                 "WHERE FilePlacements.file_id = added.file_id; "
+                 "INSERT INTO FilePairs(file_id, file2_id, shared_disks) "
+                 "SELECT file_id, file2_id, COUNT(*) FROM "
+                 "(SELECT changed.file_id, other.file_id AS file2_id FROM NewFilesInDisks changed "
+                 "INNER JOIN FilesInDisks other ON changed.disk_id = other.disk_id AND changed.file_id != other.file_id "
+                 "UNION ALL "
+                 "SELECT other.file_id, changed.file_id FROM NewFilesInDisks changed "
+                 "INNER JOIN FilesInDisks other ON changed.disk_id = other.disk_id AND changed.file_id != other.file_id "
+                 "WHERE NOT EXISTS (SELECT 1 FROM NewFilesInDisks "
+                 "WHERE NewFilesInDisks.file_id = other.file_id AND NewFilesInDisks.disk_id = other.disk_id)) "
+                 "AS shared GROUP BY file_id, file2_id "
+                 "ON CONFLICT (file_id, file2_id) DO UPDATE SET shared_disks = FilePairs.shared_disks + EXCLUDED.shared_disks; "
+                 "RETURN NULL; "
+                 "END $$ LANGUAGE plpgsql")
+    _createTrigger(conn, "FilesInDisksAddedTrigger", "AFTER INSERT", "FilesInDisks",
+                   "REFERENCING NEW TABLE AS NewFilesInDisks FOR EACH STATEMENT EXECUTE FUNCTION FilesInDisksAdded()")
+
+    # the mirror image: every disk that held both files before the delete and at least one of them stops counting,
+    # pairs that share no disk anymore are removed
+    conn.execute("CREATE OR REPLACE FUNCTION FilesInDisksRemoved() RETURNS trigger AS $$ BEGIN "
+                 "UPDATE FilePlacements SET disk_count = disk_count - removed.count "
+                 "FROM (SELECT file_id, COUNT(*) AS count FROM OldFilesInDisks GROUP BY file_id) AS removed "
+                 "WHERE FilePlacements.file_id = removed.file_id; "
+                 "WITH removed AS "
+                 "(SELECT file_id, file2_id, COUNT(*) AS count FROM "
+                 "(SELECT changed.file_id, other.file_id AS file2_id FROM OldFilesInDisks changed INNER JOIN "
+                 "(SELECT file_id, disk_id FROM FilesInDisks UNION ALL SELECT file_id, disk_id FROM OldFilesInDisks) "
+                 "AS other ON changed.disk_id = other.disk_id AND changed.file_id != other.file_id "
+                 "UNION ALL "
+                 "SELECT other.file_id, changed.file_id FROM OldFilesInDisks changed "
+                 "INNER JOIN FilesInDisks other ON changed.disk_id = other.disk_id AND changed.file_id != other.file_id) "
+                 "AS shared GROUP BY file_id, file2_id), "
+                 "gone AS (DELETE FROM FilePairs USING removed WHERE FilePairs.file_id = removed.file_id "
+                 "AND FilePairs.file2_id = removed.file2_id AND FilePairs.shared_disks <= removed.count) "
+                 "UPDATE FilePairs SET shared_disks = shared_disks - removed.count FROM removed "
+                 "WHERE FilePairs.file_id = removed.file_id AND FilePairs.file2_id = removed.file2_id "
+                 "AND FilePairs.shared_disks > removed.count; "
+                 "RETURN NULL; "
+                 "END $$ LANGUAGE plpgsql")
+    _createTrigger(conn, "FilesInDisksRemovedTrigger", "AFTER DELETE", "FilesInDisks",
+                   "REFERENCING OLD TABLE AS OldFilesInDisks FOR EACH STATEMENT EXECUTE FUNCTION FilesInDisksRemoved()")
+
+
+# recomputes the getCloseFiles index from Files and FilesInDisks, creating it first if the tables were created
+# before it existed
+def rebuildCloseFilesIndex() -> Status:
+    conn = None
+    try:
+        conn = Connector.DBConnector()
+        _createCloseFilesIndex(conn)
+        conn.execute("DELETE FROM FilePairs")
+        conn.execute("DELETE FROM FilePlacements")
+        conn.execute("INSERT INTO FilePlacements(file_id, disk_count) "
+                     "SELECT Files.file_id, COUNT(FilesInDisks.disk_id) FROM Files "
+                     "LEFT OUTER JOIN FilesInDisks ON Files.file_id = FilesInDisks.file_id GROUP BY Files.file_id")
+        conn.execute("INSERT INTO FilePairs(file_id, file2_id, shared_disks) "
+                     "SELECT t1.file_id, t2.file_id, COUNT(*) "
+                     "FROM FilesInDisks t1 INNER JOIN FilesInDisks t2 ON t1.disk_id = t2.disk_id "
+                     "WHERE t1.file_id != t2.file_id GROUP BY t1.file_id, t2.file_id")
+        conn.commit()
+    except Exception as e:
+        if conn is not None:
+            conn.rollback()
+        return Status.ERROR
+    finally:
+        # will happen any way after code try termination or exception handling
+        if conn is not None:
+            conn.close()
+    return Status.OK
+
+
+# per-disk aggregates, one row per disk kept exact by triggers:
+#   file_count, total_file_size - number and total (database) size of the files on the disk
+#   total_ram                   - total size of the RAMs attached to the disk
+#   conflict_count              - number of files on the disk that are also on another disk
+#   foreign_ram_count           - number of RAMs attached to the disk made by another company than the disk
+# a file deleted from Files is accounted for before the delete (FileDeleting) because the FilesInDisks rows removed by
+# the cascade can't be joined with it anymore, the FilesInDisks triggers only count rows whose file still exists
+# (the same for RAMs)
+def _createDiskStats(conn):
+    conn.execute("CREATE TABLE IF NOT EXISTS DiskStats"
+                 "(disk_id integer PRIMARY KEY REFERENCES Disks(disk_id) ON DELETE CASCADE,"
+                 "file_count integer NOT NULL DEFAULT 0,"
+                 "total_file_size bigint NOT NULL DEFAULT 0,"
+                 "total_ram bigint NOT NULL DEFAULT 0,"
+                 "conflict_count integer NOT NULL DEFAULT 0,"
+                 "foreign_ram_count integer NOT NULL DEFAULT 0)")
+    # getConflictingDisks reads only the conflicting disks, in disk_id order
+    conn.execute("CREATE INDEX IF NOT EXISTS DiskStatsConflictIndex ON DiskStats(disk_id) WHERE conflict_count > 0")
+
+    conn.execute("CREATE OR REPLACE FUNCTION DisksAdded() RETURNS trigger AS $$ BEGIN "
+                 "INSERT INTO DiskStats(disk_id) SELECT disk_id FROM NewDisks; "
+                 "RETURN NULL; "
+                 "END $$ LANGUAGE plpgsql")
+    _createTrigger(conn, "DisksAddedTrigger", "AFTER INSERT", "Disks",
+                   "REFERENCING NEW TABLE AS NewDisks FOR EACH STATEMENT EXECUTE FUNCTION DisksAdded()")
+
+    conn.execute("CREATE OR REPLACE FUNCTION FilesInDisksStatsAdded() RETURNS trigger AS $$ BEGIN "
+                 "UPDATE DiskStats SET file_count = file_count + added.count, "
+                 "total_file_size = total_file_size + added.size "
+                 "FROM (SELECT changed.disk_id, COUNT(*) AS count, SUM(Files.size) AS size FROM NewFilesInDisks changed "
+                 "INNER JOIN Files ON changed.file_id = Files.file_id GROUP BY changed.disk_id) AS added "
+                 "WHERE DiskStats.disk_id = added.disk_id; "
+                 "RETURN NULL; "
+                 "END $$ LANGUAGE plpgsql")
+    _createTrigger(conn, "FilesInDisksStatsAddedTrigger", "AFTER INSERT", "FilesInDisks",
+                   "REFERENCING NEW TABLE AS NewFilesInDisks FOR EACH STATEMENT "
+                   "EXECUTE FUNCTION FilesInDisksStatsAdded()")
+
+    conn.execute("CREATE OR REPLACE FUNCTION FilesInDisksStatsRemoved() RETURNS trigger AS $$ BEGIN "
+                 "UPDATE DiskStats SET file_count = file_count - removed.count, "
+                 "total_file_size = total_file_size - removed.size "
+                 "FROM (SELECT changed.disk_id, COUNT(*) AS count, SUM(Files.size) AS size FROM OldFilesInDisks changed "
+                 "INNER JOIN Files ON changed.file_id = Files.file_id GROUP BY changed.disk_id) AS removed "
+                 "WHERE DiskStats.disk_id = removed.disk_id; "
+                 "RETURN NULL; "
+                 "END $$ LANGUAGE plpgsql")
+    _createTrigger(conn, "FilesInDisksStatsRemovedTrigger", "AFTER DELETE", "FilesInDisks",
+                   "REFERENCING OLD TABLE AS OldFilesInDisks FOR EACH STATEMENT "
+                   "EXECUTE FUNCTION FilesInDisksStatsRemoved()")
+
+    conn.execute("CREATE OR REPLACE FUNCTION FileDeleting() RETURNS trigger AS $$ BEGIN "
+                 "UPDATE DiskStats SET file_count = file_count - 1, total_file_size = total_file_size - OLD.size "
+                 "WHERE disk_id IN (SELECT disk_id FROM FilesInDisks WHERE file_id = OLD.file_id); "
+                 "RETURN OLD; "
+                 "END $$ LANGUAGE plpgsql")
+    _createTrigger(conn, "FileDeletingTrigger", "BEFORE DELETE", "Files",
+                   "FOR EACH ROW EXECUTE FUNCTION FileDeleting()")
+
+    # a file counts as a conflict on each of its disks while it has 2 replicas or more, so when the replica count of a
+    # file crosses 2 every disk it is on changes, and a new (removed) replica changes its own disk
+    # replica counts are counted in FilesInDisks (primary key range) rather than read from FilePlacements, which
+    # another trigger on the same statement maintains
+    conn.execute("CREATE OR REPLACE FUNCTION FilesInDisksConflictsAdded() RETURNS trigger AS $$ BEGIN "
+                 "UPDATE DiskStats SET conflict_count = conflict_count + delta.count "
+                 "FROM (SELECT FilesInDisks.disk_id, "
+                 "SUM((replicas.count >= 2)::integer "
+                 "- (changed.file_id IS NULL AND replicas.count - replicas.added >= 2)::integer) AS count "
+                 "FROM (SELECT added.file_id, added.added, "
+                 "(SELECT COUNT(*) FROM FilesInDisks WHERE FilesInDisks.file_id = added.file_id) AS count "
+                 "FROM (SELECT file_id, COUNT(*) AS added FROM NewFilesInDisks GROUP BY file_id) AS added) AS replicas "
+                 "INNER JOIN FilesInDisks ON FilesInDisks.file_id = replicas.file_id "
+                 "LEFT OUTER JOIN NewFilesInDisks changed "
+                 "ON FilesInDisks.file_id = changed.file_id AND FilesInDisks.disk_id = changed.disk_id "
+                 "GROUP BY FilesInDisks.disk_id) AS delta "
+                 "WHERE DiskStats.disk_id = delta.disk_id AND delta.count != 0; "
+                 "RETURN NULL; "
+                 "END $$ LANGUAGE plpgsql")
+    _createTrigger(conn, "FilesInDisksConflictsAddedTrigger", "AFTER INSERT", "FilesInDisks",
+                   "REFERENCING NEW TABLE AS NewFilesInDisks FOR EACH STATEMENT "
+                   "EXECUTE FUNCTION FilesInDisksConflictsAdded()")
+
+    conn.execute("CREATE OR REPLACE FUNCTION FilesInDisksConflictsRemoved() RETURNS trigger AS $$ BEGIN "
+                 "UPDATE DiskStats SET conflict_count = conflict_count + delta.count "
+                 "FROM (SELECT placements.disk_id, "
+                 "SUM((NOT placements.removed AND replicas.count >= 2)::integer "
+                 "- (replicas.count + replicas.removed >= 2)::integer) AS count "
+                 "FROM (SELECT removed.file_id, removed.removed, "
+                 "(SELECT COUNT(*) FROM FilesInDisks WHERE FilesInDisks.file_id = removed.file_id) AS count "
+                 "FROM (SELECT file_id, COUNT(*) AS removed FROM OldFilesInDisks GROUP BY file_id) AS removed) "
+                 "AS replicas INNER JOIN "
+                 "(SELECT file_id, disk_id, FALSE AS removed FROM FilesInDisks "
+                 "WHERE file_id IN (SELECT file_id FROM OldFilesInDisks) "
+                 "UNION ALL "
+                 "SELECT file_id, disk_id, TRUE FROM OldFilesInDisks) AS placements "
+                 "ON placements.file_id = replicas.file_id "
+                 "GROUP BY placements.disk_id) AS delta "
+                 "WHERE DiskStats.disk_id = delta.disk_id AND delta.count != 0; "
+                 "RETURN NULL; "
+                 "END $$ LANGUAGE plpgsql")
+    _createTrigger(conn, "FilesInDisksConflictsRemovedTrigger", "AFTER DELETE", "FilesInDisks",
+                   "REFERENCING OLD TABLE AS OldFilesInDisks FOR EACH STATEMENT "
+                   "EXECUTE FUNCTION FilesInDisksConflictsRemoved()")
+
+    conn.execute("CREATE OR REPLACE FUNCTION RamsInDisksStatsAdded() RETURNS trigger AS $$ BEGIN "
+                 "UPDATE DiskStats SET total_ram = total_ram + added.size, "
+                 "foreign_ram_count = foreign_ram_count + added.foreign_count "
+                 "FROM (SELECT changed.disk_id, SUM(Rams.size) AS size, "
+                 "COUNT(*) FILTER (WHERE Rams.company != Disks.company) AS foreign_count FROM NewRamsInDisks changed "
+                 "INNER JOIN Rams ON changed.ram_id = Rams.ram_id "
+                 "INNER JOIN Disks ON changed.disk_id = Disks.disk_id GROUP BY changed.disk_id) AS added "
+                 "WHERE DiskStats.disk_id = added.disk_id; "
+                 "RETURN NULL; "
+                 "END $$ LANGUAGE plpgsql")
+    _createTrigger(conn, "RamsInDisksStatsAddedTrigger", "AFTER INSERT", "RamsInDisks",
+                   "REFERENCING NEW TABLE AS NewRamsInDisks FOR EACH STATEMENT "
+                   "EXECUTE FUNCTION RamsInDisksStatsAdded()")
+
+    conn.execute("CREATE OR REPLACE FUNCTION RamsInDisksStatsRemoved() RETURNS trigger AS $$ BEGIN "
+                 "UPDATE DiskStats SET total_ram = total_ram - removed.size, "
+                 "foreign_ram_count = foreign_ram_count - removed.foreign_count "
+                 "FROM (SELECT changed.disk_id, SUM(Rams.size) AS size, "
+                 "COUNT(*) FILTER (WHERE Rams.company != Disks.company) AS foreign_count FROM OldRamsInDisks changed "
+                 "INNER JOIN Rams ON changed.ram_id = Rams.ram_id "
+                 "INNER JOIN Disks ON changed.disk_id = Disks.disk_id GROUP BY changed.disk_id) AS removed "
+                 "WHERE DiskStats.disk_id = removed.disk_id; "
+                 "RETURN NULL; "
+                 "END $$ LANGUAGE plpgsql")
+    _createTrigger(conn, "RamsInDisksStatsRemovedTrigger", "AFTER DELETE", "RamsInDisks",
+                   "REFERENCING OLD TABLE AS OldRamsInDisks FOR EACH STATEMENT "
+                   "EXECUTE FUNCTION RamsInDisksStatsRemoved()")
+
+    conn.execute("CREATE OR REPLACE FUNCTION RamDeleting() RETURNS trigger AS $$ BEGIN "
+                 "UPDATE DiskStats SET total_ram = total_ram - OLD.size, "
+                 "foreign_ram_count = foreign_ram_count - (Disks.company != OLD.company)::integer FROM Disks "
+                 "WHERE DiskStats.disk_id = Disks.disk_id "
+                 "AND DiskStats.disk_id IN (SELECT disk_id FROM RamsInDisks WHERE ram_id = OLD.ram_id); "
+                 "RETURN OLD; "
+                 "END $$ LANGUAGE plpgsql")
+    _createTrigger(conn, "RamDeletingTrigger", "BEFORE DELETE", "Rams",
+                   "FOR EACH ROW EXECUTE FUNCTION RamDeleting()")
+
+
+# recomputes DiskStats from Disks, FilesInDisks and RamsInDisks, creating it first if the tables were created before it existed
+def rebuildDiskStats() -> Status:
+    conn = None
+    try:
+        conn = Connector.DBConnector()
+        _createDiskStats(conn)
+        conn.execute("DELETE FROM DiskStats")
+        conn.execute("INSERT INTO DiskStats(disk_id, file_count, total_file_size) "
+                     "SELECT Disks.disk_id, COUNT(Files.file_id), COALESCE(SUM(Files.size), 0) FROM Disks "
+                     "LEFT OUTER JOIN FilesInDisks ON Disks.disk_id = FilesInDisks.disk_id "
+                     "LEFT OUTER JOIN Files ON FilesInDisks.file_id = Files.file_id "
+                     "GROUP BY Disks.disk_id")
+        conn.execute("UPDATE DiskStats SET total_ram = rams.total_ram, foreign_ram_count = rams.foreign_count "
+                     "FROM (SELECT RamsInDisksWithRamData.disk_id, SUM(ram_size) AS total_ram, "
+                     "COUNT(*) FILTER (WHERE ram_company != Disks.company) AS foreign_count "
+                     "FROM RamsInDisksWithRamData INNER JOIN Disks ON RamsInDisksWithRamData.disk_id = Disks.disk_id "
+                     "GROUP BY RamsInDisksWithRamData.disk_id) AS rams WHERE DiskStats.disk_id = rams.disk_id")
+        conn.execute("UPDATE DiskStats SET conflict_count = conflicts.count "
+                     "FROM (SELECT disk_id, COUNT(*) AS count FROM FilesInDisksWithoutSingleFiles GROUP BY disk_id) "
+                     "AS conflicts WHERE DiskStats.disk_id = conflicts.disk_id")
+        conn.commit()
+    except Exception as e:
+        if conn is not None:
+            conn.rollback()
+        return Status.ERROR
+    finally:
+        # will happen any way after code try termination or exception handling
+        if conn is not None:
+            conn.close()
+    return Status.OK
+
+
+# cost ledger behind getCostForType: the total disk cost * (database) file size of the placed files of every type
+# files and disks deleted from their tables are accounted for before the delete, like in DiskStats
+def _createTypeCosts(conn):
+    conn.execute("CREATE TABLE IF NOT EXISTS TypeCosts"
+                 "(type text PRIMARY KEY,"
+                 "cost bigint NOT NULL)")
+
+    conn.execute("CREATE OR REPLACE FUNCTION FilesInDisksCostAdded() RETURNS trigger AS $$ BEGIN "
+                 "INSERT INTO TypeCosts(type, cost) "
+                 "SELECT Files.type, SUM(Disks.cost * Files.size::bigint) FROM NewFilesInDisks changed "
+                 "INNER JOIN Files ON changed.file_id = Files.file_id "
+                 "INNER JOIN Disks ON changed.disk_id = Disks.disk_id GROUP BY Files.type "
+                 "ON CONFLICT (type) DO UPDATE SET cost = TypeCosts.cost + EXCLUDED.cost; "
+                 "RETURN NULL; "
+                 "END $$ LANGUAGE plpgsql")
+    _createTrigger(conn, "FilesInDisksCostAddedTrigger", "AFTER INSERT", "FilesInDisks",
+                   "REFERENCING NEW TABLE AS NewFilesInDisks FOR EACH STATEMENT "
+                   "EXECUTE FUNCTION FilesInDisksCostAdded()")
+
+    conn.execute("CREATE OR REPLACE FUNCTION FilesInDisksCostRemoved() RETURNS trigger AS $$ BEGIN "
+                 "UPDATE TypeCosts SET cost = TypeCosts.cost - removed.cost "
+                 "FROM (SELECT Files.type, SUM(Disks.cost * Files.size::bigint) AS cost FROM OldFilesInDisks changed "
+                 "INNER JOIN Files ON changed.file_id = Files.file_id "
+                 "INNER JOIN Disks ON changed.disk_id = Disks.disk_id GROUP BY Files.type) AS removed "
+                 "WHERE TypeCosts.type = removed.type; "
+                 "RETURN NULL; "
+                 "END $$ LANGUAGE plpgsql")
+    _createTrigger(conn, "FilesInDisksCostRemovedTrigger", "AFTER DELETE", "FilesInDisks",
+                   "REFERENCING OLD TABLE AS OldFilesInDisks FOR EACH STATEMENT "
+                   "EXECUTE FUNCTION FilesInDisksCostRemoved()")
+
+    conn.execute("CREATE OR REPLACE FUNCTION FileCostDeleting() RETURNS trigger AS $$ BEGIN "
+                 "UPDATE TypeCosts SET cost = cost - OLD.size::bigint * "
+                 "(SELECT COALESCE(SUM(Disks.cost), 0) FROM FilesInDisks "
+                 "INNER JOIN Disks ON FilesInDisks.disk_id = Disks.disk_id WHERE FilesInDisks.file_id = OLD.file_id) "
+                 "WHERE type = OLD.type; "
+                 "RETURN OLD; "
+                 "END $$ LANGUAGE plpgsql")
+    _createTrigger(conn, "FileCostDeletingTrigger", "BEFORE DELETE", "Files",
+                   "FOR EACH ROW EXECUTE FUNCTION FileCostDeleting()")
+
+    conn.execute("CREATE OR REPLACE FUNCTION DiskCostDeleting() RETURNS trigger AS $$ BEGIN "
+                 "UPDATE TypeCosts SET cost = TypeCosts.cost - removed.cost "
+                 "FROM (SELECT Files.type, SUM(OLD.cost * Files.size::bigint) AS cost FROM FilesInDisks "
+                 "INNER JOIN Files ON FilesInDisks.file_id = Files.file_id "
+                 "WHERE FilesInDisks.disk_id = OLD.disk_id GROUP BY Files.type) AS removed "
+                 "WHERE TypeCosts.type = removed.type; "
+                 "RETURN OLD; "
+                 "END $$ LANGUAGE plpgsql")
+    _createTrigger(conn, "DiskCostDeletingTrigger", "BEFORE DELETE", "Disks",
+                   "FOR EACH ROW EXECUTE FUNCTION DiskCostDeleting()")
+
+
+# recomputes TypeCosts from FilesInDisks, creating it first if the tables were created before it existed
+def rebuildTypeCosts() -> Status:
+    conn = None
+    try:
+        conn = Connector.DBConnector()
+        _createTypeCosts(conn)
+        conn.execute("DELETE FROM TypeCosts")
+        conn.execute("INSERT INTO TypeCosts(type, cost) "
+                     "SELECT file_type, SUM(disk_cost * file_size::bigint) FROM FilesInDisksWithFileDataAndCost "
+                     "GROUP BY file_type")
+        conn.commit()
+    except Exception as e:
+        if conn is not None:
+            conn.rollback()
+        return Status.ERROR
+    finally:
+        # will happen any way after code try termination or exception handling
+        if conn is not None:
+            conn.close()
+    return Status.OK
+
+
+# the column whose values a change of the table is notified with (see Utility/ChangeListener)
+_NOTIFIED_KEYS = {"Files": "file_id", "Disks": "disk_id", "Rams": "ram_id", "FilesInDisks": "disk_id",
+                  "RamsInDisks": "disk_id"}
+
+
+# one notification per changing statement and table, not per row, with the distinct keys of the changed rows
+# NOTIFY drops duplicate payloads of the same transaction, so repeated changes of a key are sent once
+def _createChangeNotifications(conn):
+    conn.execute("CREATE OR REPLACE FUNCTION NotifyChanges() RETURNS trigger AS $$ "
+                 "DECLARE keys text; BEGIN "
+                 "EXECUTE format('SELECT CASE WHEN COUNT(DISTINCT %1$I) > %2$s THEN ''*'' "
+                 "ELSE string_agg(DISTINCT %1$I::text, '','') END FROM changed', TG_ARGV[1], " +
+                 str(ChangeListener.MAX_KEYS_PER_NOTIFICATION) + ") INTO keys; "
+                 "IF keys IS NOT NULL THEN "
+                 "PERFORM pg_notify('" + ChangeListener.CHANNEL + "', TG_ARGV[0] || ' ' || keys); "
+                 "END IF; "
+                 "RETURN NULL; "
+                 "END $$ LANGUAGE plpgsql")
+    for table in ChangeListener.TABLES:
+        for event, transition in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+            _createTrigger(conn, table + "Notify" + event.capitalize() + "Trigger", "AFTER " + event, table,
+                           "REFERENCING " + transition + " TABLE AS changed "
+                           "FOR EACH STATEMENT EXECUTE FUNCTION NotifyChanges('" + table + "', '" +
+                           _NOTIFIED_KEYS[table] + "')")
+
+
+# tables created or dropped, nothing a listener has cached is valid anymore
+def _notifyAllChanged(conn):
+    conn.execute("SELECT pg_notify('" + ChangeListener.CHANNEL + "', name || ' *') FROM UNNEST(ARRAY['" +
+                 "', '".join(ChangeListener.TABLES) + "']) AS name")
+
+
+# names of the indexes of createTables that are missing from the database (all of them if it can't be queried)
+def verifyIndexes() -> List[str]:
+    conn = None
+    names = [name for name, _, _ in _INDEXES]
+    try:
+        conn = Connector.DBConnector()
+        _, result = conn.executePrepared("existingIndexes", ([name.lower() for name in names],))
+        conn.commit()
+    except Exception as e:
+        if conn is not None:
+            conn.rollback()
+        return names
+    finally:
+        # will happen any way after code try termination or exception handling
+        if conn is not None:
+            conn.close()
+    existing = set(result.column(0))
+    return [name for name in names if name.lower() not in existing]
 
 
 def addFile(file: File) -> Status:
     conn = None
     try:
         conn = Connector.DBConnector()
-        query = sql.SQL(
-            "INSERT INTO Files(file_id, type, size) VALUES({file_id}, {type}, {size})").format(
-            file_id=sql.Literal(file.getFileID()),
-            type=sql.Literal(file.getType()),
-            size=sql.Literal(file.getSize()))
-        conn.execute(query)
+        conn.executePrepared("addFile", (file.getFileID(), file.getType(), file.getSize()))
         conn.commit()
     except DatabaseException.ConnectionInvalid as e:
         conn.rollback()
@@ -222,6 +773,7 @@ def addFile(file: File) -> Status:
     finally:
         # will happen any way after code try termination or exception handling
         conn.close()
+    EntityCache.invalidate(("File", file.getFileID()))
     return Status.OK
 
 
@@ -230,16 +782,28 @@ def getFileByID(fileID: int) -> File:
     ret = File.badFile()
     rows_affected = 0
     result = ResultSet()
+    shared = SharedCache.get()
+    if shared is not None:
+        row = shared.lookup("File", fileID)
+        if row is not None:
+            return File(*row)
+    cache = EntityCache.get()
+    if cache is not None:
+        found, row = cache.lookup(("File", fileID))
+        if found:
+            return File(*row) if row is not None else File.badFile()
+        generation = cache.generation()
 
     try:
         conn = Connector.DBConnector()
-        query = sql.SQL(
-            "SELECT * FROM Files WHERE file_id={id}").format(
-            id=sql.Literal(fileID))
-        rows_affected, result = conn.execute(query)
+        rows_affected, result = conn.executePrepared("getFileByID", (fileID,))
 
         if rows_affected != 0:
-            ret = File(result[0]["file_id"], result[0]["type"], result[0]["size"])
+            row = result.row(0)
+            ret = File(row["file_id"], row["type"], row["size"])
+        if cache is not None:
+            cache.put(("File", fileID), (ret.getFileID(), ret.getType(), ret.getSize()) if rows_affected else None,
+                      generation)
 
     except:
         ret = File.badFile()
@@ -253,15 +817,8 @@ def deleteFile(file: File) -> Status:
     conn = None
     try:
         conn = Connector.DBConnector()
-        query = sql.SQL(
-            "BEGIN;"
-            "UPDATE Disks SET free_space = free_space + {needed_space} "
-                "WHERE disk_id IN (SELECT disk_id FROM FilesInDisks WHERE file_id={f_id});"
-            "DELETE FROM Files WHERE file_id={f_id};"
-            "COMMIT;").format(
-            f_id=sql.Literal(file.getFileID()),
-            needed_space=sql.Literal(file.getSize()))
-        rows_effected, _ =conn.execute(query)
+        _, disks = conn.executePrepared("deleteFileFreeSpace", (file.getFileID(), file.getSize()))
+        rows_effected, _ = conn.executePrepared("deleteFile", (file.getFileID(),))
         conn.commit()
 
     except:
@@ -270,6 +827,8 @@ def deleteFile(file: File) -> Status:
     finally:
         # will happen any way after code try termination or exception handling
         conn.close()
+    # the disks the file was on got its space back
+    EntityCache.invalidate(("File", file.getFileID()), *[("Disk", diskID) for diskID in disks.column(0)])
     return Status.OK
 
 
@@ -277,14 +836,8 @@ def addDisk(disk: Disk) -> Status:
     conn = None
     try:
         conn = Connector.DBConnector()
-        query = sql.SQL(
-            "INSERT INTO Disks(disk_id, company, speed, free_space, cost) VALUES({disk_id}, {company}, {speed}, {free_space}, {cost})").format(
-            disk_id=sql.Literal(disk.getDiskID()),
-            company=sql.Literal(disk.getCompany()),
-            speed=sql.Literal(disk.getSpeed()),
-            free_space=sql.Literal(disk.getFreeSpace()),
-            cost=sql.Literal(disk.getCost()))
-        conn.execute(query)
+        conn.executePrepared("addDisk", (disk.getDiskID(), disk.getCompany(), disk.getSpeed(), disk.getFreeSpace(),
+                                         disk.getCost()))
         conn.commit()
     except DatabaseException.ConnectionInvalid as e:
         conn.rollback()
@@ -307,6 +860,7 @@ def addDisk(disk: Disk) -> Status:
     finally:
         # will happen any way after code try termination or exception handling
         conn.close()
+    EntityCache.invalidate(("Disk", disk.getDiskID()))
     return Status.OK
 
 
@@ -316,15 +870,28 @@ def getDiskByID(diskID: int) -> Disk:
     rows_effected = 0
     result = ResultSet()
 
+    shared = SharedCache.get()
+    if shared is not None:
+        row = shared.lookup("Disk", diskID)
+        if row is not None:
+            return Disk(*row)
+    cache = EntityCache.get()
+    if cache is not None:
+        found, row = cache.lookup(("Disk", diskID))
+        if found:
+            return Disk(*row) if row is not None else Disk.badDisk()
+        generation = cache.generation()
+
     try:
         conn = Connector.DBConnector()
-        query = sql.SQL(
-            "SELECT * FROM Disks WHERE disk_id={id}").format(
-            id=sql.Literal(diskID))
-        rows_effected, result = conn.execute(query)
+        rows_effected, result = conn.executePrepared("getDiskByID", (diskID,))
 
         if rows_effected != 0:
-            ret = Disk(result[0]["disk_id"], result[0]["company"], result[0]["speed"], result[0]["free_space"], result[0]["cost"])
+            row = result.row(0)
+            ret = Disk(row["disk_id"], row["company"], row["speed"], row["free_space"], row["cost"])
+        if cache is not None:
+            cache.put(("Disk", diskID), (ret.getDiskID(), ret.getCompany(), ret.getSpeed(), ret.getFreeSpace(),
+                                         ret.getCost()) if rows_effected else None, generation)
 
     except:
         ret = Disk.badDisk()
@@ -338,10 +905,7 @@ def deleteDisk(diskID: int) -> Status:
     conn = None
     try:
         conn = Connector.DBConnector()
-        query = sql.SQL(
-            "DELETE FROM Disks WHERE disk_id={id};").format(
-            id=sql.Literal(diskID))
-        rows_effected, _ = conn.execute(query)
+        rows_effected, _ = conn.executePrepared("deleteDisk", (diskID,))
         if rows_effected == 0:
             return Status.NOT_EXISTS
         conn.commit()
@@ -352,6 +916,7 @@ def deleteDisk(diskID: int) -> Status:
     finally:
         # will happen any way after code try termination or exception handling
         conn.close()
+    EntityCache.invalidate(("Disk", diskID))
     return Status.OK
 
 
@@ -359,12 +924,7 @@ def addRAM(ram: RAM) -> Status:
     conn = None
     try:
         conn = Connector.DBConnector()
-        query = sql.SQL(
-            "INSERT INTO Rams(ram_id, company, size) VALUES({ram_id}, {company}, {size})").format(
-            ram_id=sql.Literal(ram.getRamID()),
-            company=sql.Literal(ram.getCompany()),
-            size=sql.Literal(ram.getSize()))
-        conn.execute(query)
+        conn.executePrepared("addRAM", (ram.getRamID(), ram.getCompany(), ram.getSize()))
         conn.commit()
     except DatabaseException.ConnectionInvalid as e:
         conn.rollback()
@@ -387,6 +947,7 @@ def addRAM(ram: RAM) -> Status:
     finally:
         # will happen any way after code try termination or exception handling
         conn.close()
+    EntityCache.invalidate(("RAM", ram.getRamID()))
     return Status.OK
 
 
@@ -396,15 +957,28 @@ def getRAMByID(ramID: int) -> RAM:
     rows_effected = 0
     result = ResultSet()
 
+    shared = SharedCache.get()
+    if shared is not None:
+        row = shared.lookup("RAM", ramID)
+        if row is not None:
+            return RAM(*row)
+    cache = EntityCache.get()
+    if cache is not None:
+        found, row = cache.lookup(("RAM", ramID))
+        if found:
+            return RAM(*row) if row is not None else RAM.badRAM()
+        generation = cache.generation()
+
     try:
         conn = Connector.DBConnector()
-        query = sql.SQL(
-            "SELECT * FROM Rams WHERE ram_id={id}").format(
-            id=sql.Literal(ramID))
-        rows_effected, result = conn.execute(query)
+        rows_effected, result = conn.executePrepared("getRAMByID", (ramID,))
 
         if rows_effected != 0:
-            ret = RAM(result[0]["ram_id"], result[0]["company"], result[0]["size"])
+            row = result.row(0)
+            ret = RAM(row["ram_id"], row["company"], row["size"])
+        if cache is not None:
+            cache.put(("RAM", ramID), (ret.getRamID(), ret.getCompany(), ret.getSize()) if rows_effected else None,
+                      generation)
 
     except:
         ret = RAM.badRAM()
@@ -418,10 +992,7 @@ def deleteRAM(ramID: int) -> Status:
     conn = None
     try:
         conn = Connector.DBConnector()
-        query = sql.SQL(
-            "DELETE FROM Rams WHERE ram_id={id}; ").format(
-            id=sql.Literal(ramID))
-        rows_effected, _ = conn.execute(query)
+        rows_effected, _ = conn.executePrepared("deleteRAM", (ramID,))
         if rows_effected == 0:
             return Status.NOT_EXISTS
         conn.commit()
@@ -432,6 +1003,7 @@ def deleteRAM(ramID: int) -> Status:
     finally:
         # will happen any way after code try termination or exception handling
         conn.close()
+    EntityCache.invalidate(("RAM", ramID))
     return Status.OK
 
 
@@ -439,18 +1011,9 @@ def addDiskAndFile(disk: Disk, file: File) -> Status:
     conn = None
     try:
         conn = Connector.DBConnector()
-        query = sql.SQL(
-            "BEGIN; INSERT INTO Files(file_id, type, size) VALUES({file_id}, {type}, {size}); "
-            "INSERT INTO Disks(disk_id, company, speed, free_space, cost) VALUES({disk_id}, {company}, {speed}, {free_space}, {cost}); COMMIT;").format(
-            file_id=sql.Literal(file.getFileID()),
-            type=sql.Literal(file.getType()),
-            size=sql.Literal(file.getSize()),
-            disk_id=sql.Literal(disk.getDiskID()),
-            company=sql.Literal(disk.getCompany()),
-            speed=sql.Literal(disk.getSpeed()),
-            free_space=sql.Literal(disk.getFreeSpace()),
-            cost=sql.Literal(disk.getCost()))
-        conn.execute(query)
+        conn.executePrepared("addFile", (file.getFileID(), file.getType(), file.getSize()))
+        conn.executePrepared("addDisk", (disk.getDiskID(), disk.getCompany(), disk.getSpeed(), disk.getFreeSpace(),
+                                         disk.getCost()))
         conn.commit()
     except DatabaseException.ConnectionInvalid as e:
         conn.rollback()
@@ -473,6 +1036,7 @@ def addDiskAndFile(disk: Disk, file: File) -> Status:
     finally:
         # will happen any way after code try termination or exception handling
         conn.close()
+    EntityCache.invalidate(("File", file.getFileID()), ("Disk", disk.getDiskID()))
     return Status.OK
 
 
@@ -480,15 +1044,8 @@ def addFileToDisk(file: File, diskID: int) -> Status:
     conn = None
     try:
         conn = Connector.DBConnector()
-        query = sql.SQL(
-            "BEGIN;"
-            "INSERT INTO FilesInDisks(file_id, disk_id) VALUES({f_id}, {d_id});"
-            "UPDATE Disks SET free_space = free_space - {needed_space} WHERE disk_id={d_id};"
-            "COMMIT;").format(
-            f_id=sql.Literal(file.getFileID()),
-            d_id=sql.Literal(diskID),
-            needed_space=sql.Literal(file.getSize()))
-        conn.execute(query)
+        conn.executePrepared("addFileToDisk", (file.getFileID(), diskID))
+        conn.executePrepared("addFileToDiskFreeSpace", (diskID, file.getSize()))
         conn.commit()
     except DatabaseException.ConnectionInvalid as e:
         conn.rollback()
@@ -511,6 +1068,7 @@ def addFileToDisk(file: File, diskID: int) -> Status:
     finally:
         # will happen any way after code try termination or exception handling
         conn.close()
+    EntityCache.invalidate(("Disk", diskID))
     return Status.OK
 
 
@@ -518,16 +1076,8 @@ def removeFileFromDisk(file: File, diskID: int) -> Status:
     conn = None
     try:
         conn = Connector.DBConnector()
-        query = sql.SQL(
-            "BEGIN;"
-            "UPDATE Disks SET free_space = free_space + {needed_space} "
-                "WHERE disk_id=(SELECT disk_id FROM FilesInDisks WHERE file_id={f_id} AND disk_id={d_id});"
-            "DELETE FROM FilesInDisks WHERE file_id={f_id} AND disk_id={d_id};"
-            "COMMIT;").format(
-            f_id=sql.Literal(file.getFileID()),
-            d_id=sql.Literal(diskID),
-            needed_space=sql.Literal(file.getSize()))
-        conn.execute(query)
+        conn.executePrepared("removeFileFromDiskFreeSpace", (file.getFileID(), diskID, file.getSize()))
+        conn.executePrepared("removeFileFromDisk", (file.getFileID(), diskID))
         conn.commit()
     except DatabaseException.ConnectionInvalid as e:
         conn.rollback()
@@ -550,18 +1100,111 @@ def removeFileFromDisk(file: File, diskID: int) -> Status:
     finally:
         # will happen any way after code try termination or exception handling
         conn.close()
+    EntityCache.invalidate(("Disk", diskID))
     return Status.OK
 
 
+# places files on the disk with one INSERT and one free_space UPDATE, returns a Status per file like addFileToDisk
+# atomic - if the files do not fit all together none of them is placed (BAD_PARAMS), otherwise they are placed in
+# order while they fit, as consecutive addFileToDisk calls would
+def addFilesToDisk(files: List[File], diskID: int, atomic: bool = True) -> List[Status]:
+    if diskID is None:
+        return [Status.BAD_PARAMS] * len(files)
+    for attempt in range(2):
+        statuses = [Status.BAD_PARAMS] * len(files)
+        conn = None
+        try:
+            conn = Connector.DBConnector()
+            placed = _placeFiles(conn, files, diskID, atomic, statuses)
+            conn.commit()
+        except (DatabaseException.UNIQUE_VIOLATION, DatabaseException.FOREIGN_KEY_VIOLATION) as e:
+            # a concurrent placement or delete of one of the files got in between, decide once more
+            conn.rollback()
+            continue
+        except Exception as e:
+            if conn is not None:
+                conn.rollback()
+            return [Status.ERROR] * len(files)
+        finally:
+            # will happen any way after code try termination or exception handling
+            if conn is not None:
+                conn.close()
+        if placed:
+            EntityCache.invalidate(("Disk", diskID))
+        return statuses
+    return [Status.ERROR] * len(files)
+
+
+# fills statuses and places the OK files, True if any was placed
+def _placeFiles(conn, files: List[File], diskID: int, atomic: bool, statuses: list) -> bool:
+    _, disk = conn.executePrepared("lockDiskFreeSpace", (diskID,))
+    ids = [file.getFileID() for file in files if file.getFileID() is not None]
+    _, result = conn.executePrepared("filesToDiskState", (ids, diskID))
+    state = {row[0]: (row[1], row[2]) for row in result.rows}
+
+    candidates = []  # positions of the files that may be placed
+    for i, file in enumerate(files):
+        if file.getFileID() is None:
+            continue
+        exists, onDisk = state[file.getFileID()]
+        if disk.isEmpty() or not exists:
+            statuses[i] = Status.NOT_EXISTS
+        elif onDisk:
+            statuses[i] = Status.ALREADY_EXISTS
+        elif file.getSize() is not None:
+            candidates.append(i)
+
+    free_space = disk.scalar() if not disk.isEmpty() else 0
+    placing = {}  # file id -> position of the file placed with it
+    for i in candidates:
+        if files[i].getFileID() in placing:
+            statuses[i] = Status.ALREADY_EXISTS
+        elif atomic or files[i].getSize() <= free_space:
+            free_space -= files[i].getSize()
+            placing[files[i].getFileID()] = i
+    if not placing or free_space < 0:
+        return False
+    candidates = list(placing.values())
+
+    conn.executePrepared("addFilesToDisk", ([files[i].getFileID() for i in candidates], diskID))
+    conn.executePrepared("addFileToDiskFreeSpace", (diskID, sum(files[i].getSize() for i in candidates)))
+    for i in candidates:
+        statuses[i] = Status.OK
+    return True
+
+
+# takes files off the disk with one DELETE and one free_space UPDATE, returns a Status per file like
+# removeFileFromDisk (OK also for files that were not on the disk)
+def removeFilesFromDisk(files: List[File], diskID: int) -> List[Status]:
+    conn = None
+    sizes = {}
+    for file in files:
+        sizes.setdefault(file.getFileID(), file.getSize())
+    try:
+        conn = Connector.DBConnector()
+        _, result = conn.executePrepared("removeFilesFromDisk", ([key for key in sizes if key is not None], diskID))
+        removed = result.column(0)
+        if removed:
+            conn.executePrepared("removeFilesFromDiskFreeSpace", (diskID, sum(sizes[key] for key in removed)))
+        conn.commit()
+    except Exception as e:
+        if conn is not None:
+            conn.rollback()
+        return [Status.ERROR] * len(files)
+    finally:
+        # will happen any way after code try termination or exception handling
+        if conn is not None:
+            conn.close()
+    if removed:
+        EntityCache.invalidate(("Disk", diskID))
+    return [Status.OK] * len(files)
+
+
 def addRAMToDisk(ramID: int, diskID: int) -> Status:
     conn = None
     try:
         conn = Connector.DBConnector()
-        query = sql.SQL(
-            "INSERT INTO RamsInDisks(ram_id, disk_id) VALUES({r_id},{d_id})").format(
-            r_id=sql.Literal(ramID),
-            d_id=sql.Literal(diskID))
-        conn.execute(query)
+        conn.executePrepared("addRAMToDisk", (ramID, diskID))
         conn.commit()
     except DatabaseException.ConnectionInvalid as e:
         conn.rollback()
@@ -591,11 +1234,7 @@ def removeRAMFromDisk(ramID: int, diskID: int) -> Status:
     conn = None
     try:
         conn = Connector.DBConnector()
-        query = sql.SQL(
-            "DELETE FROM RamsInDisks WHERE ram_id={r_id} AND disk_id={d_id}").format(
-            r_id=sql.Literal(ramID),
-            d_id=sql.Literal(diskID))
-        rows_effected, _ = conn.execute(query)
+        rows_effected, _ = conn.executePrepared("removeRAMFromDisk", (ramID, diskID))
         conn.commit()
     except DatabaseException.ConnectionInvalid as e:
         conn.rollback()
@@ -627,10 +1266,7 @@ def averageFileSizeOnDisk(diskID: int) -> float:
     conn = None
     try:
         conn = Connector.DBConnector()
-        query = sql.SQL(
-            "SELECT AVG(FilesInDisksWithFileData.file_size) FROM FilesInDisksWithFileData WHERE disk_id = {d_id}").format(
-            d_id=sql.Literal(diskID))
-        _ , result = conn.execute(query)
+        _, result = conn.executePrepared("averageFileSizeOnDisk", (diskID,))
         conn.commit()
     except DatabaseException.ConnectionInvalid as e:
         conn.rollback()
@@ -653,19 +1289,16 @@ def averageFileSizeOnDisk(diskID: int) -> float:
     finally:
         # will happen any way after code try termination or exception handling
         conn.close()
-    if not list(result[0].values())[0]:
+    if not result.scalar():
         return 0
-    return float(list(result[0].values())[0])
+    return float(result.scalar())
 
 
 def diskTotalRAM(diskID: int) -> int:
     conn = None
     try:
         conn = Connector.DBConnector()
-        query = sql.SQL(
-            "SELECT SUM(RamsInDisksWithRamData.ram_size) FROM RamsInDisksWithRamData WHERE disk_id = {d_id}").format(
-            d_id=sql.Literal(diskID))
-        _, result = conn.execute(query)
+        _, result = conn.executePrepared("diskTotalRAM", (diskID,))
         conn.commit()
     except DatabaseException.ConnectionInvalid as e:
         conn.rollback()
@@ -688,19 +1321,34 @@ def diskTotalRAM(diskID: int) -> int:
     finally:
         # will happen any way after code try termination or exception handling
         conn.close()
-    if not list(result[0].values())[0]:
+    if not result.scalar():
         return 0
-    return list(result[0].values())[0]
+    return result.scalar()
+
+
+# averageFileSizeOnDisk of every disk in diskIDs with one query, in the same order (0 for an unknown disk)
+def averageFileSizeOnDisks(diskIDs: List[int]) -> List[float]:
+    conn = None
+    try:
+        conn = Connector.DBConnector()
+        _, result = conn.executePrepared("averageFileSizeOnDisks", (list(diskIDs),))
+        conn.commit()
+    except Exception as e:
+        if conn is not None:
+            conn.rollback()
+        return [-1] * len(diskIDs)
+    finally:
+        # will happen any way after code try termination or exception handling
+        if conn is not None:
+            conn.close()
+    return [float(average) if average else 0 for average in result.column(0)]
 
 
 def getCostForType(type: str) -> int:
     conn = None
     try:
         conn = Connector.DBConnector()
-        query = sql.SQL(
-            "SELECT SUM(price) FROM PricePerType WHERE file_type = {f_type}").format(
-            f_type=sql.Literal(type))
-        _, result = conn.execute(query)
+        _, result = conn.executePrepared("getCostForType", (type,))
         conn.commit()
     except DatabaseException.ConnectionInvalid as e:
         conn.rollback()
@@ -723,69 +1371,55 @@ def getCostForType(type: str) -> int:
     finally:
         # will happen any way after code try termination or exception handling
         conn.close()
-    if not list(result[0].values())[0]:
+    if not result.scalar():
         return 0
-    return list(result[0].values())[0]
+    return result.scalar()
 
 
-def getFilesCanBeAddedToDisk(diskID: int) -> List[int]:
-    my_result = []
+# getCostForType of every type with a non-zero cost, in one lookup
+def getCostPerType() -> Dict[str, int]:
     conn = None
     try:
         conn = Connector.DBConnector()
-        query = sql.SQL(
-            "SELECT file_id FROM Files "
-            "WHERE Files.size <= "
-            "(SELECT free_space FROM Disks WHERE disk_id={d_id})"
-            "ORDER BY file_id DESC;").format(
-            d_id=sql.Literal(diskID))
-        rows_effected, result = conn.execute(query)
+        _, result = conn.executePrepared("getCostPerType")
         conn.commit()
-
-    except:
-        conn.rollback()
-        return my_result
+    except Exception as e:
+        if conn is not None:
+            conn.rollback()
+        return {}
     finally:
         # will happen any way after code try termination or exception handling
-        conn.close()
-    if rows_effected == 0:
-        return []
-    for i in range(len(list(result.rows))):
-        if i >= 5:
-            break
-        my_result.append(list(result[i].values())[0])
-    return my_result
+        if conn is not None:
+            conn.close()
+    return dict(zip(result.column(0), result.column(1)))
 
 
-def getFilesCanBeAddedToDiskAndRAM(diskID: int) -> List[int]:
+# the top-k queries below carry their k as the last parameter and LIMIT in the database,
+# so only the returned ids cross the wire (k=None means no limit)
+def _topK(name: str, params: tuple, k) -> List[int]:
     conn = None
-    my_result = []
     try:
         conn = Connector.DBConnector()
-        query = sql.SQL(
-            "SELECT file_id FROM Files "
-            "WHERE "
-            "Files.size <= (SELECT free_space FROM Disks WHERE disk_id={d_id}) "
-            "AND "
-            "Files.size <= (SELECT COALESCE(SUM(RamsInDisksWithRamData.ram_size) , 0) FROM RamsInDisksWithRamData WHERE disk_id = {d_id}) "
-            "ORDER BY file_id ASC;").format(
-            d_id=sql.Literal(diskID))
-        rows_effected, result = conn.execute(query)
+        _, result = conn.executePrepared(name, params + (k,))
         conn.commit()
 
     except:
-        conn.rollback()
-        return my_result
+        if conn is not None:
+            conn.rollback()
+        return []
     finally:
         # will happen any way after code try termination or exception handling
-        conn.close()
-    if rows_effected == 0:
-        return my_result
-    for i in range(len(list(result.rows))):
-        if i >= 5:
-            break
-        my_result.append(list(result[i].values())[0])
-    return my_result
+        if conn is not None:
+            conn.close()
+    return result.column(0)
+
+
+def getFilesCanBeAddedToDisk(diskID: int, k: int = 5) -> List[int]:
+    return _topK("getFilesCanBeAddedToDisk", (diskID,), k)
+
+
+def getFilesCanBeAddedToDiskAndRAM(diskID: int, k: int = 5) -> List[int]:
+    return _topK("getFilesCanBeAddedToDiskAndRAM", (diskID,), k)
 
 
 def isCompanyExclusive(diskID: int) -> bool:
@@ -793,14 +1427,7 @@ def isCompanyExclusive(diskID: int) -> bool:
     rows_effected = 0
     try:
         conn = Connector.DBConnector()
-        query = sql.SQL(
-            "SELECT company FROM "
-	        "(SELECT company FROM Disks WHERE disk_id={d_id} "
-	        "UNION "
-	        "SELECT ram_company AS company FROM RamsInDisksWithRamData WHERE disk_id={d_id}) AS comany "
-            "GROUP BY company").format(
-            d_id=sql.Literal(diskID))
-        rows_effected, _= conn.execute(query)
+        rows_effected, _ = conn.executePrepared("isCompanyExclusive", (diskID,))
         conn.commit()
 
     except:
@@ -814,37 +1441,30 @@ def isCompanyExclusive(diskID: int) -> bool:
     return False
 
 
-def getConflictingDisks() -> List[int]:
+# every disk isCompanyExclusive is True for, in disk_id order
+def getExclusiveDisks() -> List[int]:
     conn = None
-    my_result = []
     try:
         conn = Connector.DBConnector()
-        query = sql.SQL(
-            "SELECT DISTINCT disk_id FROM FilesInDisksWithoutSingleFiles "
-            "ORDER BY disk_id ASC")
-        _, result = conn.execute(query)
+        _, result = conn.executePrepared("getExclusiveDisks")
         conn.commit()
-
-    except:
-        conn.rollback()
-        return my_result
+    except Exception as e:
+        if conn is not None:
+            conn.rollback()
+        return []
     finally:
         # will happen any way after code try termination or exception handling
-        conn.close()
-    for i in range(len(list(result.rows))):
-        my_result.append(list(result[i].values())[0])
-    return my_result
+        if conn is not None:
+            conn.close()
+    return result.column(0)
 
 
-def mostAvailableDisks() -> List[int]:
+def getConflictingDisks() -> List[int]:
     conn = None
     my_result = []
     try:
         conn = Connector.DBConnector()
-        query = sql.SQL(
-            "SELECT disk_id FROM CountFilesCanBeInDisksWithZeros "
-            "ORDER BY count DESC, speed DESC, disk_id ASC")
-        _, result = conn.execute(query)
+        _, result = conn.executePrepared("getConflictingDisks")
         conn.commit()
 
     except:
@@ -853,34 +1473,189 @@ def mostAvailableDisks() -> List[int]:
     finally:
         # will happen any way after code try termination or exception handling
         conn.close()
-    for i in range(len(list(result.rows))):
-        if i>=5:
-            break
-        my_result.append(list(result[i].values())[0])
-    return my_result
+    return result.column(0)
+
+
+def mostAvailableDisks(k: int = 5) -> List[int]:
+    return _topK("mostAvailableDisks", (), k)
+
 
+def getCloseFiles(fileID: int, k: int = 10) -> List[int]:
+    return _topK("getCloseFiles", (fileID,), k)
+
+
+# inserts rows (tuples ordered as columns) into table in one transaction and returns a Status per row
+# rows failing isValid (or with an id that is not an int) are BAD_PARAMS, ids already in the table (or earlier in
+# rows) are ALREADY_EXISTS
+# if the database still rejects the batch, rows are inserted one by one under savepoints to find the culprits
+def _addMany(table: str, columns: tuple, rows: list, isValid) -> List[Status]:
+    statuses = [Status.BAD_PARAMS] * len(rows)
+    candidates = {}  # id -> position of its first valid row
+    for i, row in enumerate(rows):
+        if not isinstance(row[0], int) or not isValid(*row):
+            continue
+        if row[0] in candidates:
+            statuses[i] = Status.ALREADY_EXISTS
+        else:
+            candidates[row[0]] = i
+    if not candidates:
+        return statuses
 
-def getCloseFiles(fileID: int) -> List[int]:
     conn = None
-    my_result = []
     try:
         conn = Connector.DBConnector()
-        query = sql.SQL(
-            "SELECT file2_id FROM CountFilesInDisksForClose "
-            "WHERE file_id = {f_id} AND count * 2 >= (SELECT count FROM CountFilesInDisks2 WHERE file_id = {f_id}) "
-            "ORDER BY file2_id ASC").format(
-            f_id=sql.Literal(fileID))
-        _, result = conn.execute(query)
+        query = sql.SQL("INSERT INTO {table}({columns}) VALUES %s ON CONFLICT ({key}) DO NOTHING RETURNING {key}").format(
+            table=sql.Identifier(table.lower()),
+            columns=sql.SQL(", ").join(map(sql.Identifier, columns)),
+            key=sql.Identifier(columns[0]))
+        try:
+            _, result = conn.executeMany(query, [rows[i] for i in candidates.values()], fetch=True)
+            inserted = set(result.column(0))
+            for key, i in candidates.items():
+                statuses[i] = Status.OK if key in inserted else Status.ALREADY_EXISTS
+        except DatabaseException.ConnectionInvalid:
+            raise
+        except Exception:
+            conn.rollback()
+            _addOneByOne(conn, table, columns, rows, candidates.values(), statuses)
         conn.commit()
-
-    except:
-        conn.rollback()
-        return my_result
+    except Exception as e:
+        if conn is not None:
+            conn.rollback()
+        for i in candidates.values():
+            statuses[i] = Status.ERROR
     finally:
         # will happen any way after code try termination or exception handling
-        conn.close()
-    for i in range(len(list(result.rows))):
-        if i >= 10:
-            break
-        my_result.append(list(result[i].values())[0])
-    return my_result
+        if conn is not None:
+            conn.close()
+    return statuses
+
+
+def _addOneByOne(conn, table: str, columns: tuple, rows: list, positions, statuses: list):
+    table = sql.Identifier(table.lower())
+    columns = sql.SQL(", ").join(map(sql.Identifier, columns))
+    for i in positions:
+        conn.execute("SAVEPOINT add_many")
+        try:
+            conn.execute(sql.SQL("INSERT INTO {table}({columns}) VALUES ({values})").format(
+                table=table, columns=columns, values=sql.SQL(", ").join(map(sql.Literal, rows[i]))))
+            statuses[i] = Status.OK
+            conn.execute("RELEASE SAVEPOINT add_many")
+            continue
+        except DatabaseException.ConnectionInvalid as e:
+            raise
+        except DatabaseException.UNIQUE_VIOLATION as e:
+            statuses[i] = Status.ALREADY_EXISTS
+        except (DatabaseException.NOT_NULL_VIOLATION, DatabaseException.CHECK_VIOLATION,
+                DatabaseException.FOREIGN_KEY_VIOLATION) as e:
+            statuses[i] = Status.BAD_PARAMS
+        except Exception as e:
+            statuses[i] = Status.ERROR
+        conn.execute("ROLLBACK TO SAVEPOINT add_many")
+
+
+def addFiles(files: List[File]) -> List[Status]:
+    statuses = _addMany("Files", ("file_id", "type", "size"),
+                        [(file.getFileID(), file.getType(), file.getSize()) for file in files],
+                        File.validParams)
+    EntityCache.invalidate(*[("File", file.getFileID()) for file, status in zip(files, statuses)
+                             if status == Status.OK])
+    return statuses
+
+
+def addDisks(disks: List[Disk]) -> List[Status]:
+    statuses = _addMany("Disks", ("disk_id", "company", "speed", "free_space", "cost"),
+                        [(disk.getDiskID(), disk.getCompany(), disk.getSpeed(), disk.getFreeSpace(), disk.getCost())
+                         for disk in disks],
+                        Disk.validParams)
+    EntityCache.invalidate(*[("Disk", disk.getDiskID()) for disk, status in zip(disks, statuses)
+                             if status == Status.OK])
+    return statuses
+
+
+def addRAMs(rams: List[RAM]) -> List[Status]:
+    statuses = _addMany("Rams", ("ram_id", "company", "size"),
+                        [(ram.getRamID(), ram.getCompany(), ram.getSize()) for ram in rams],
+                        RAM.validParams)
+    EntityCache.invalidate(*[("RAM", ram.getRamID()) for ram, status in zip(rams, statuses)
+                             if status == Status.OK])
+    return statuses
+
+
+# ids sent in one = ANY query of the get*ByIDs functions
+_LOOKUP_CHUNK = 10000
+
+
+# the rows (tuples ordered as the constructor arguments, None for missing ids) of ids in input order
+# rows are taken from the caches where possible, the others are queried with one = ANY query per _LOOKUP_CHUNK ids
+# ids that are not integer column values are missing (a single one would fail the typed query of the chunk)
+# None on any error
+def _getManyByIDs(entity: str, statement: str, ids: list) -> list:
+    rows = {}
+    conn = None
+    try:
+        keys = list(dict.fromkeys(key for key in ids if _isIntegerKey(key)))
+        shared = SharedCache.get()
+        cache = EntityCache.get()
+        for key in keys:
+            row = shared.lookup(entity, key) if shared is not None else None
+            if row is not None:
+                rows[key] = row
+            elif cache is not None:
+                found, row = cache.lookup((entity, key))
+                if found:
+                    rows[key] = row
+        missing = [key for key in keys if key not in rows]
+        if missing:
+            conn = Connector.DBConnector()
+            for start in range(0, len(missing), _LOOKUP_CHUNK):
+                chunk = missing[start:start + _LOOKUP_CHUNK]
+                generation = cache.generation() if cache is not None else None
+                _, result = conn.executePrepared(statement, (chunk,))
+                found = {row[0]: tuple(row) for row in result.rows}
+                for key in chunk:
+                    rows[key] = found.get(key)
+                    if cache is not None:
+                        cache.put((entity, key), rows[key], generation)
+            conn.commit()
+    except Exception as e:
+        if conn is not None:
+            conn.rollback()
+        return None
+    finally:
+        # will happen any way after code try termination or exception handling
+        if conn is not None:
+            conn.close()
+    return [rows[key] if _isIntegerKey(key) else None for key in ids]
+
+
+# whether key fits an integer column
+def _isIntegerKey(key) -> bool:
+    return type(key) is int and -2 ** 31 <= key < 2 ** 31
+
+
+def getFilesByIDs(fileIDs: List[int]) -> List[File]:
+    rows = _getManyByIDs("File", "getFilesByIDs", fileIDs)
+    if rows is None:
+        return [File.badFile() for _ in fileIDs]
+    return [File(*row) if row is not None else File.badFile() for row in rows]
+
+
+def getDisksByIDs(diskIDs: List[int]) -> List[Disk]:
+    rows = _getManyByIDs("Disk", "getDisksByIDs", diskIDs)
+    if rows is None:
+        return [Disk.badDisk() for _ in diskIDs]
+    return [Disk(*row) if row is not None else Disk.badDisk() for row in rows]
+
+
+def getRAMsByIDs(ramIDs: List[int]) -> List[RAM]:
+    rows = _getManyByIDs("RAM", "getRAMsByIDs", ramIDs)
+    if rows is None:
+        return [RAM.badRAM() for _ in ramIDs]
+    return [RAM(*row) if row is not None else RAM.badRAM() for row in rows]
+
+
+# a unit of work over the functions of this module: one connection, one transaction, a savepoint per call
+# usage: with Solution.session() as session: session.addDisk(disk) ... (see Utility.Session)
+def session() -> Session:
+    return Session(sys.modules[__name__])
@@ -1,10 +1,33 @@
+import asyncio
+import contextvars
+import io
+import os
+import random
+import time
 import unittest
+from unittest import mock
 import Solution
+import AsyncSolution
+import Loader
+from Utility.Exceptions import DatabaseException
+from Utility import Config
+from Utility import Instrumentation
+from Utility.ConnectionPool import ConnectionPool
+from Utility.EntityCache import EntityCache
+from Utility.ChangeListener import ChangeListener
+from Utility.SharedCache import SharedCache
+import Utility.DBConnector as Connector
 from Utility.Status import Status
 from Business.File import File
 from Business.RAM import RAM
 from Business.Disk import Disk
 
+# numpy is only needed for columnar results
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 '''
     Simple test, create one of your own
     make sure the tests' names start with test_
@@ -1115,6 +1138,699 @@ class Test(AbstractTest):
         self.assertListEqual([2], Solution.getCloseFiles(3), "Should work")
         self.assertListEqual([2, 3], Solution.getCloseFiles(4), "Should work")
 
+    def test_addMany(self):
+        # check database error
+        Solution.dropTables()
+        self.assertListEqual([Status.ERROR, Status.BAD_PARAMS], Solution.addFiles([File(1, "MP3", 1), File(0, "MP3", 1)]),
+                             "ERROR in case of a database error, BAD_PARAMS is checked first")
+        Solution.createTables()
+        self.assertListEqual([], Solution.addFiles([]), "Should work")
+        self.assertEqual(Status.OK, Solution.addFile(File(1, "MP3", 1)), "Should work")
+        statuses = Solution.addFiles([File(1, "MP3", 1), File(2, "MP3", 2), File(2, "WAV", 3), File(0, "MP3", 1),
+                                      File(3, None, 1), File(4, "MP3", -1), File(1, "MP3", -1), File(5, "WAV", 0)])
+        self.assertListEqual([Status.ALREADY_EXISTS, Status.OK, Status.ALREADY_EXISTS, Status.BAD_PARAMS,
+                              Status.BAD_PARAMS, Status.BAD_PARAMS, Status.BAD_PARAMS, Status.OK], statuses,
+                             "Same statuses as addFile")
+        self.assertEqual("MP3", Solution.getFileByID(2).getType(), "First occurrence wins")
+        self.assertEqual(None, Solution.getFileByID(4).getFileID(), "badFile")
+        statuses = Solution.addDisks([Disk(1, "DELL", 10, 10, 10), Disk(1, "DELL", 10, 10, 10),
+                                      Disk(2, "DELL", 0, 10, 10), Disk(3, "DELL", 10, -1, 10), Disk(4, "HP", 1, 0, 1)])
+        self.assertListEqual([Status.OK, Status.ALREADY_EXISTS, Status.BAD_PARAMS, Status.BAD_PARAMS, Status.OK],
+                             statuses, "Same statuses as addDisk")
+        statuses = Solution.addRAMs([RAM(1, "Kingston", 10), RAM(2, "Kingston", 0), RAM(3, None, 1),
+                                     RAM(1, "Kingston", 10)])
+        self.assertListEqual([Status.OK, Status.BAD_PARAMS, Status.BAD_PARAMS, Status.ALREADY_EXISTS], statuses,
+                             "Same statuses as addRAM")
+        self.assertEqual(10, Solution.getRAMByID(1).getSize(), "Should work")
+        # values that are not ints are BAD_PARAMS, also ids that can't be hashed
+        self.assertListEqual([Status.BAD_PARAMS] * 3,
+                             Solution.addRAMs([RAM(5, "Kingston", "a"), RAM([5], "Kingston", 1),
+                                               RAM("5", "Kingston", 1)]), "Should work")
+        self.assertListEqual([Status.BAD_PARAMS], Solution.addDisks([Disk({}, "DELL", 1, 1, 1)]), "Should work")
+        self.assertListEqual([Status.BAD_PARAMS], Solution.addFiles([File(5, "MP3", 1.5)]), "Should work")
+        # values the client can't judge are checked by the database row by row
+        self.assertEqual(Status.ERROR, Solution.addRAM(RAM(6, "Kingston", 2 ** 40)), "Out of range")
+        self.assertListEqual([Status.OK, Status.ERROR],
+                             Solution.addRAMs([RAM(5, "Kingston", 1), RAM(6, "Kingston", 2 ** 40)]),
+                             "ERROR like addRAM")
+        # and like every other query, those are seen by the instrumentation
+        aggregator = Instrumentation.LatencyAggregator().install()
+        try:
+            self.assertListEqual([Status.OK, Status.ERROR],
+                                 Solution.addRAMs([RAM(7, "Kingston", 1), RAM(8, "Kingston", 2 ** 40)]), "Should work")
+        finally:
+            aggregator.uninstall()
+        inserts = [query for (_, query) in aggregator.stats() if "INSERT INTO \"rams\"" in str(query)]
+        self.assertEqual(3, len(inserts), "The batch and one insert per row")
+
+    def test_loader(self):
+        self.assertEqual(3, Loader.loadFiles(io.StringIO("1,MP3,10\n2,WAV,20\n3,MP3,5\n")), "Should work")
+        self.assertEqual(2, Loader.loadDisks([Disk(1, "DELL", 1, 100, 2), (2, "HP", 3, 30, 1)]), "Should work")
+        self.assertEqual(1, Loader.loadRAMs([RAM(1, "Kingston", 4)]), "Should work")
+        # an invalid row rejects the whole load
+        self.assertRaises(DatabaseException.CHECK_VIOLATION, Loader.loadFiles, io.StringIO("4,MP3,1\n5,MP3,-1\n"))
+        self.assertRaises(DatabaseException.NOT_NULL_VIOLATION, Loader.loadRAMs, [(2, None, 4)])
+        # malformed input is no constraint violation
+        self.assertRaises(ValueError, Loader.loadFiles, io.StringIO("4,MP3,1\nfive,MP3,1\n"))
+        self.assertRaises(ValueError, Loader.loadFiles, [(4, "MP3", "1")])
+        self.assertRaises(ValueError, Loader.loadFiles, io.StringIO("4,MP3\n"))
+        # a file_id of 8 bytes
+        stream = (b"PGCOPY\n\xff\r\n\x00" + bytes(8) + b"\x00\x03" + b"\x00\x00\x00\x08" + (4).to_bytes(8, "big") +
+                  b"\x00\x00\x00\x03MP3" + b"\x00\x00\x00\x04" + (1).to_bytes(4, "big") + b"\xff\xff")
+        self.assertRaises(ValueError, Loader.loadFiles, io.BytesIO(stream), format="binary")
+        self.assertEqual(None, Solution.getFileByID(4).getFileID(), "Nothing was loaded")
+        # placements update free_space
+        self.assertEqual(3, Loader.loadFilesInDisks([(1, 1), (2, 1), (3, 2)]), "Should work")
+        self.assertEqual(70, Solution.getDiskByID(1).getFreeSpace(), "Should work")
+        self.assertEqual(25, Solution.getDiskByID(2).getFreeSpace(), "Should work")
+        self.assertRaises(DatabaseException.CHECK_VIOLATION, Loader.loadFilesInDisks, [(1, 2), (2, 2)])
+        self.assertEqual(25, Solution.getDiskByID(2).getFreeSpace(), "Shouldn't change")
+        self.assertEqual(1, Loader.loadRamsInDisks(io.StringIO("1,1\n")), "Should work")
+        self.assertEqual(4, Solution.diskTotalRAM(1), "Should work")
+
+    def test_rebuildCloseFilesIndex(self):
+        for i in range(1, 5):
+            self.assertEqual(Status.OK, Solution.addFile(File(i, "MP3", 1)), "Should work")
+        # placements loaded in bulk are counted once per pair
+        self.assertEqual(2, Loader.loadDisks([Disk(1, "DELL", 1, 100, 1), Disk(2, "DELL", 1, 100, 1)]), "Should work")
+        self.assertEqual(5, Loader.loadFilesInDisks([(1, 1), (2, 1), (3, 1), (1, 2), (2, 2)]), "Should work")
+        self.assertListEqual([2, 3], Solution.getCloseFiles(1), "Should work")
+        self.assertListEqual([2], Solution.getCloseFiles(1, 1), "k limits the result")
+        self.assertListEqual([1, 2, 3], Solution.getCloseFiles(4), "File 4 is on no disk")
+        self.assertEqual(Status.OK, Solution.rebuildCloseFilesIndex(), "Should work")
+        self.assertListEqual([2, 3], Solution.getCloseFiles(1), "Shouldn't change")
+        # deleting a disk removes its placements from every pair
+        self.assertEqual(Status.OK, Solution.deleteDisk(1), "Should work")
+        self.assertListEqual([2], Solution.getCloseFiles(1), "Should work")
+        self.assertListEqual([1, 2, 4], Solution.getCloseFiles(3), "File 3 is on no disk now")
+        Solution.dropTables()
+        self.assertEqual(Status.ERROR, Solution.rebuildCloseFilesIndex(), "ERROR in case of a database error")
+        Solution.createTables()
+
+    def test_averageFileSizeOnDisks(self):
+        self.assertEqual(Status.OK, Solution.addDisk(Disk(1, "DELL", 10, 100, 10)), "Should work")
+        self.assertEqual(Status.OK, Solution.addDisk(Disk(2, "DELL", 10, 100, 10)), "Should work")
+        self.assertEqual(Status.OK, Solution.addFile(File(1, "MP3", 3)), "Should work")
+        self.assertEqual(Status.OK, Solution.addFile(File(2, "MP3", 4)), "Should work")
+        self.assertEqual(Status.OK, Solution.addFileToDisk(File(1, "MP3", 3), 1), "Should work")
+        self.assertEqual(Status.OK, Solution.addFileToDisk(File(2, "MP3", 4), 1), "Should work")
+        self.assertEqual(Status.OK, Solution.addFileToDisk(File(2, "MP3", 4), 2), "Should work")
+        self.assertListEqual([3.5, 4, 0, 3.5], Solution.averageFileSizeOnDisks([1, 2, 3, 1]), "0 for unknown disks")
+        # deleting a file updates every disk it was on
+        self.assertEqual(Status.OK, Solution.deleteFile(File(2, "MP3", 4)), "Should work")
+        self.assertListEqual([3, 0], Solution.averageFileSizeOnDisks([1, 2]), "Should work")
+        self.assertEqual(Status.OK, Solution.rebuildDiskStats(), "Should work")
+        self.assertEqual(3, Solution.averageFileSizeOnDisk(1), "Shouldn't change")
+        Solution.dropTables()
+        self.assertListEqual([-1, -1], Solution.averageFileSizeOnDisks([1, 2]), "-1 in case of a database error")
+        Solution.createTables()
+
+    def test_getCostPerType(self):
+        self.assertDictEqual({}, Solution.getCostPerType(), "No files on disks")
+        self.assertEqual(Status.OK, Solution.addDisk(Disk(1, "DELL", 10, 100, 2)), "Should work")
+        self.assertEqual(Status.OK, Solution.addDisk(Disk(2, "DELL", 10, 100, 3)), "Should work")
+        self.assertEqual(Status.OK, Solution.addFile(File(1, "MP3", 4)), "Should work")
+        self.assertEqual(Status.OK, Solution.addFile(File(2, "WAV", 5)), "Should work")
+        self.assertEqual(Status.OK, Solution.addFileToDisk(File(1, "MP3", 4), 1), "Should work")
+        self.assertEqual(Status.OK, Solution.addFileToDisk(File(1, "MP3", 4), 2), "Should work")
+        self.assertEqual(Status.OK, Solution.addFileToDisk(File(2, "WAV", 5), 2), "Should work")
+        self.assertDictEqual({"MP3": 20, "WAV": 15}, Solution.getCostPerType(), "Should work")
+        # deleting a disk takes its placements out of the ledger
+        self.assertEqual(Status.OK, Solution.deleteDisk(2), "Should work")
+        self.assertDictEqual({"MP3": 8}, Solution.getCostPerType(), "Should work")
+        self.assertEqual(Status.OK, Solution.rebuildTypeCosts(), "Should work")
+        self.assertEqual(8, Solution.getCostForType("MP3"), "Shouldn't change")
+        self.assertEqual(Status.OK, Solution.deleteFile(File(1, "MP3", 4)), "Should work")
+        self.assertEqual(0, Solution.getCostForType("MP3"), "Should work")
+        Solution.dropTables()
+        self.assertDictEqual({}, Solution.getCostPerType(), "Empty in case of a database error")
+        Solution.createTables()
+
+    def test_getExclusiveDisks(self):
+        self.assertListEqual([], Solution.getExclusiveDisks(), "No disks")
+        self.assertEqual(Status.OK, Solution.addDisk(Disk(1, "DELL", 10, 10, 10)), "Should work")
+        self.assertEqual(Status.OK, Solution.addDisk(Disk(2, "HP", 10, 10, 10)), "Should work")
+        self.assertEqual(Status.OK, Solution.addRAM(RAM(1, "DELL", 10)), "Should work")
+        self.assertListEqual([1, 2], Solution.getExclusiveDisks(), "Disks without RAMs are exclusive")
+        self.assertEqual(Status.OK, Solution.addRAMToDisk(1, 1), "Should work")
+        self.assertEqual(Status.OK, Solution.addRAMToDisk(1, 2), "Should work")
+        self.assertListEqual([1], Solution.getExclusiveDisks(), "RAM 1 isn't made by HP")
+        self.assertEqual(Status.OK, Solution.deleteRAM(1), "Should work")
+        self.assertListEqual([1, 2], Solution.getExclusiveDisks(), "Should work")
+        self.assertEqual(True, Solution.isCompanyExclusive(2), "Should work")
+        Solution.dropTables()
+        self.assertListEqual([], Solution.getExclusiveDisks(), "Empty List in case of a database error")
+        Solution.createTables()
+
+    def test_verifyIndexes(self):
+        self.assertListEqual([], Solution.verifyIndexes(), "createTables creates every index")
+        Solution.dropTables()
+        self.assertIn("FilesInDisksDiskIndex", Solution.verifyIndexes(), "Should work")
+        Solution.createTables()
+
+    def test_session(self):
+        with Solution.session() as session:
+            self.assertEqual(Status.OK, session.addDisk(Disk(1, "DELL", 10, 10, 10)), "Should work")
+            self.assertEqual(Status.ALREADY_EXISTS, session.addDisk(Disk(1, "DELL", 10, 10, 10)), "Same Status as alone")
+            self.assertEqual(Status.OK, session.addFile(File(1, "MP3", 4)), "The failed call didn't abort the session")
+            self.assertEqual(Status.OK, session.addFileToDisk(File(1, "MP3", 4), 1), "Should work")
+            self.assertEqual(Status.OK, session.addFile(File(2, "MP3", 40)), "Should work")
+            self.assertEqual(Status.BAD_PARAMS, session.addFileToDisk(File(2, "MP3", 40), 1), "No space")
+            self.assertEqual(6, session.getDiskByID(1).getFreeSpace(), "Sees its own changes")
+        self.assertEqual(6, Solution.getDiskByID(1).getFreeSpace(), "Committed at the end")
+        # an exception rolls the whole session back
+        with self.assertRaises(KeyError):
+            with Solution.session() as session:
+                self.assertEqual(Status.OK, session.addFile(File(3, "MP3", 1)), "Should work")
+                raise KeyError("abort")
+        self.assertEqual(None, Solution.getFileByID(3).getFileID(), "Rolled back")
+
+    def test_entityCache(self):
+        EntityCache.configure(maxsize=2, ttl=60, negative_ttl=60)
+        try:
+            cache = EntityCache.get()
+            self.assertEqual(None, Solution.getDiskByID(1).getDiskID(), "Cached as missing")
+            self.assertEqual(Status.OK, Solution.addDisk(Disk(1, "DELL", 10, 10, 10)), "Should work")
+            self.assertEqual(10, Solution.getDiskByID(1).getFreeSpace(), "The negative entry was dropped")
+            self.assertEqual(Status.OK, Solution.addFile(File(1, "MP3", 4)), "Should work")
+            self.assertEqual(Status.OK, Solution.addFileToDisk(File(1, "MP3", 4), 1), "Should work")
+            self.assertEqual(6, Solution.getDiskByID(1).getFreeSpace(), "free_space invalidated")
+            self.assertEqual(6, Solution.getDiskByID(1).getFreeSpace(), "Served from the cache")
+            self.assertEqual(1, cache.stats()["hits"], "One hit")
+            self.assertEqual(Status.OK, Solution.deleteFile(File(1, "MP3", 4)), "Should work")
+            self.assertEqual(10, Solution.getDiskByID(1).getFreeSpace(), "Space given back")
+            Solution.getFileByID(1)
+            Solution.getRAMByID(1)
+            self.assertEqual(2, cache.size(), "Bounded by maxsize")
+            self.assertEqual(1, cache.stats()["evictions"], "Least recently used evicted")
+            self.assertEqual(Status.OK, Solution.deleteDisk(1), "Should work")
+            self.assertEqual(None, Solution.getDiskByID(1).getDiskID(), "Deleted")
+            Solution.clearTables()
+            self.assertEqual(0, cache.size(), "Flushed")
+        finally:
+            EntityCache.configure(maxsize=0)
+
+    def test_changeListener(self):
+        EntityCache.configure(maxsize=100, ttl=60, negative_ttl=60)
+        listener = ChangeListener(interval=0.01)
+        changes = []
+        listener.subscribe(changes.append)
+        listener.start()
+        try:
+            self.assertTrue(listener.waitUntilListening(10), "Should connect")
+            self.assertEqual(Status.OK, Solution.addDisk(Disk(1, "DELL", 10, 10, 10)), "Should work")
+            self.assertEqual(10, Solution.getDiskByID(1).getFreeSpace(), "Cached")
+            # another process changes the disk behind the cache's back
+            conn = Connector.DBConnector()
+            conn.execute("UPDATE Disks SET free_space = 3 WHERE disk_id = 1")
+            conn.commit()
+            conn.close()
+            for _ in range(200):
+                if any(change.get("Disks") == {1} for change in changes):
+                    break
+                time.sleep(0.01)
+            self.assertEqual(3, Solution.getDiskByID(1).getFreeSpace(), "Invalidated by the notification")
+        finally:
+            listener.stop(10)
+            EntityCache.configure(maxsize=0)
+        self.assertFalse(listener.is_alive(), "Stopped")
+
+    def test_sharedCache(self):
+        self.assertEqual(Status.OK, Solution.addDisk(Disk(1, "DELL", 10, 10, 10)), "Should work")
+        self.assertEqual(Status.OK, Solution.addFile(File(1, "MP3", 4)), "Should work")
+        writer = SharedCache.create("solution_test_" + str(id(self)), capacity=16)
+        try:
+            writer.refresh()
+            SharedCache.configure(name=writer.memory.name)
+            reader = SharedCache.get()
+            self.assertEqual(10, Solution.getDiskByID(1).getFreeSpace(), "Should work")
+            self.assertEqual("MP3", Solution.getFileByID(1).getType(), "Should work")
+            self.assertEqual(2, reader.stats()["hits"], "Served from shared memory")
+            self.assertEqual(None, Solution.getRAMByID(1).getRamID(), "Not cached, read from the database")
+            self.assertEqual(Status.OK, Solution.addFileToDisk(File(1, "MP3", 4), 1), "Should work")
+            self.assertEqual(6, Solution.getDiskByID(1).getFreeSpace(), "Own change is not served stale")
+            writer.apply({"Disks": {1}})
+            self.assertEqual(6, Solution.getDiskByID(1).getFreeSpace(), "Refreshed by the writer")
+            self.assertEqual(3, reader.stats()["hits"], "Served from shared memory again")
+            self.assertEqual(Status.OK, Solution.deleteDisk(1), "Should work")
+            writer.apply({"Disks": {1}})
+            self.assertEqual(None, Solution.getDiskByID(1).getDiskID(), "Deleted rows are dropped")
+        finally:
+            SharedCache.configure(name=None)
+            writer.close()
+            writer.unlink()
+
+    def test_getByIDs(self):
+        self.assertListEqual([Status.OK] * 3, Solution.addFiles([File(i, "MP3", i) for i in range(1, 4)]), "Should work")
+        self.assertEqual(Status.OK, Solution.addDisk(Disk(1, "DELL", 10, 10, 10)), "Should work")
+        files = Solution.getFilesByIDs([3, 9, 1, 3])
+        self.assertListEqual([3, None, 1, 3], [file.getFileID() for file in files], "Input order, badFile if missing")
+        self.assertListEqual([3, None, 1, 3], [file.getSize() for file in files], "Should work")
+        self.assertListEqual([1, None], [disk.getDiskID() for disk in Solution.getDisksByIDs([1, 2])], "Should work")
+        self.assertListEqual([None], [ram.getRamID() for ram in Solution.getRAMsByIDs([1])], "badRAM")
+        self.assertListEqual([], Solution.getFilesByIDs([]), "Should work")
+        chunk = Solution._LOOKUP_CHUNK
+        Solution._LOOKUP_CHUNK = 2
+        try:
+            self.assertListEqual([2, 1, None, 3], [file.getFileID() for file in Solution.getFilesByIDs([2, 1, 5, 3])],
+                                 "Chunked")
+        finally:
+            Solution._LOOKUP_CHUNK = chunk
+        # ids that are not integer values are missing, without failing the others
+        self.assertListEqual([None, 1, None, None, 3, None],
+                             [file.getFileID() for file in Solution.getFilesByIDs(["a", 1, [1], {}, 3, 2 ** 40])],
+                             "Bad ids are badFile")
+        self.assertListEqual([None, 1], [disk.getDiskID() for disk in Solution.getDisksByIDs([None, 1])], "Should work")
+
+    def test_addFilesToDisk(self):
+        files = [File(i, "MP3", i) for i in range(1, 6)]
+        self.assertListEqual([Status.OK] * 5, Solution.addFiles(files), "Should work")
+        self.assertEqual(Status.OK, Solution.addDisk(Disk(1, "DELL", 10, 10, 10)), "Should work")
+        self.assertEqual(Status.OK, Solution.addFileToDisk(files[0], 1), "Should work")
+        # 2 + 3 + 5 does not fit in 9
+        batch = [files[0], files[1], files[2], File(9, "MP3", 1), files[4], files[1]]
+        self.assertListEqual([Status.ALREADY_EXISTS, Status.BAD_PARAMS, Status.BAD_PARAMS, Status.NOT_EXISTS,
+                              Status.BAD_PARAMS, Status.ALREADY_EXISTS], Solution.addFilesToDisk(batch, 1),
+                             "Atomic, nothing placed")
+        self.assertEqual(9, Solution.getDiskByID(1).getFreeSpace(), "Nothing placed")
+        self.assertListEqual([Status.ALREADY_EXISTS, Status.OK, Status.OK, Status.NOT_EXISTS, Status.BAD_PARAMS,
+                              Status.ALREADY_EXISTS], Solution.addFilesToDisk(batch, 1, atomic=False),
+                             "Placed in order while they fit")
+        self.assertEqual(4, Solution.getDiskByID(1).getFreeSpace(), "Should work")
+        self.assertListEqual([Status.NOT_EXISTS], Solution.addFilesToDisk([files[3]], 2), "No disk")
+        self.assertListEqual([Status.OK] * 3, Solution.removeFilesFromDisk([files[0], files[2], files[4]], 1),
+                             "Should work")
+        self.assertEqual(8, Solution.getDiskByID(1).getFreeSpace(), "Only files on the disk give space back")
+        self.assertEqual(20, Solution.getCostForType("MP3"), "Only File 2 is left on the disk")
+
+    def test_connectionPool(self):
+        pool = ConnectionPool(Config.loadConfig(), minconn=0, maxconn=1, timeout=0.1)
+        try:
+            connection = pool.getconn()
+            self.assertEqual(1, pool.size(), "Opened lazily")
+            with self.assertRaises(DatabaseException.ConnectionInvalid):
+                pool.getconn()
+            pool.putconn(connection)
+            self.assertEqual(1, pool.idle(), "Returned to the pool")
+            self.assertIs(connection, pool.getconn(), "Reused instead of opening another")
+            pool.putconn(connection)
+        finally:
+            pool.closeall()
+        self.assertEqual(0, pool.size(), "Closed")
+        with self.assertRaises(DatabaseException.ConnectionInvalid):
+            pool.getconn()
+
+    def test_configOverrides(self):
+        with mock.patch.dict(os.environ, {"POOL_MAXCONN": "7", "POSTGRESQL_PORT": "6543"}):
+            self.assertEqual("7", Config.loadConfig("pool", required=False)["maxconn"], "Known key, not in the file")
+            self.assertEqual("6543", Config.loadConfig()["port"], "Overrides the file")
+        self.assertNotEqual("6543", Config.loadConfig().get("port"), "Only while set")
+        self.assertNotIn("maxconn", Config.loadConfig("pool", required=False), "Only while set")
+        self.assertEqual({}, Config.loadConfig("missing", required=False), "Optional section")
+        with self.assertRaises(DatabaseException.database_ini_ERROR):
+            Config.loadConfig("missing")
+
+    def test_executeStream(self):
+        self.assertListEqual([Status.OK] * 10, Solution.addFiles([File(i, "MP3", 11 - i) for i in range(1, 11)]),
+                             "Should work")
+        conn = Connector.DBConnector()
+        try:
+            stream = conn.executeStream("SELECT file_id, size FROM Files ORDER BY size", itersize=3)
+            self.assertListEqual([(i, 11 - i) for i in range(10, 0, -1)],
+                                 [(row["file_id"], row["SIZE"]) for row in stream], "All chunks, in order")
+            self.assertEqual(10, stream.rows_read, "Should work")
+            self.assertListEqual(["file_id", "size"], stream.cols_header, "Should work")
+
+            stream = conn.executeStream("SELECT file_id FROM Files ORDER BY file_id", itersize=3)
+            for chunk in stream.chunks():
+                self.assertListEqual([(1,), (2,), (3,)], chunk, "First chunk only")
+                break
+            _, cursors = conn.execute("SELECT name FROM pg_cursors")
+            self.assertTrue(cursors.isEmpty(), "Named cursor closed on early exit")
+
+            stream = conn.executeStream("SELECT file_id FROM Files", itersize=3)
+            stream.close()
+            _, cursors = conn.execute("SELECT name FROM pg_cursors")
+            self.assertTrue(cursors.isEmpty(), "Named cursor closed by close()")
+            self.assertListEqual([], list(stream), "Nothing left to read")
+        finally:
+            conn.close()
+
+    @unittest.skipIf(numpy is None, "requires numpy")
+    def test_executeColumnar(self):
+        files = [File(1, "MP3", 4), File(2, "MP3", 6), File(3, "WAV", 1), File(4, "WAV", 9), File(5, "TXT", 5)]
+        self.assertListEqual([Status.OK] * 5, Solution.addFiles(files), "Should work")
+        self.assertEqual(Status.OK, Solution.addDisk(Disk(1, "DELL", 10, 100, 10)), "Should work")
+        self.assertEqual(Status.OK, Solution.addFileToDisk(files[0], 1), "Should work")
+        conn = Connector.DBConnector()
+        try:
+            result = conn.executeColumnar("SELECT Files.file_id, Files.type, Files.size, FilesInDisks.disk_id "
+                                          "FROM Files LEFT JOIN FilesInDisks ON Files.file_id = FilesInDisks.file_id "
+                                          "ORDER BY Files.file_id", chunksize=2)
+        finally:
+            conn.close()
+        self.assertEqual(5, result.size(), "Read in chunks")
+        self.assertEqual("int64", str(result.column("size").dtype), "Integer column")
+        self.assertEqual("float64", str(result.column("disk_id").dtype), "Widened for its NULLs")
+        self.assertEqual(1, int(numpy.nansum(result.column("disk_id"))), "NULLs are nan")
+        self.assertEqual(25, result.sum("size"), "Should work")
+        self.assertEqual(5, result.mean("SIZE"), "Case insensitive")
+        self.assertEqual(1, result.min("size"), "Should work")
+        self.assertEqual(9, result.max("size"), "Should work")
+        large = result.filter(result.column("size") > 4)
+        self.assertListEqual([2, 4, 5], list(large.column("file_id")), "Should work")
+        self.assertTrue(numpy.isnan(result.filter(result.column("size") > 100).mean("size")), "Empty")
+        keys, sums = result.groupBy("type", "size", "sum")
+        self.assertListEqual(["MP3", "TXT", "WAV"], list(keys), "Sorted keys")
+        self.assertListEqual([10, 5, 10], list(sums), "Should work")
+        self.assertListEqual([2, 1, 2], list(result.groupBy("type", "size", "count")[1]), "Should work")
+        self.assertListEqual([4, 5, 1], list(result.groupBy("type", "size", "min")[1]), "Should work")
+        self.assertListEqual([6, 5, 9], list(result.groupBy("type", "size", "max")[1]), "Should work")
+        self.assertListEqual([5, 5, 5], list(result.groupBy("type", "size", "mean")[1]), "Should work")
+        with self.assertRaises(ValueError):
+            result.groupBy("type", "size", "median")
+        with self.assertRaises(KeyError):
+            result.sum("missing")
+        empty = result.filter(result.column("size") > 100)
+        for func in ("sum", "count", "mean", "min", "max"):
+            keys, values = empty.groupBy("type", "size", func)
+            self.assertEqual((0, 0), (len(keys), len(values)), "Empty groups")
+        # NULL keys are grouped under None, after the others
+        conn = Connector.DBConnector()
+        try:
+            result = conn.executeColumnar("SELECT FilesInDisks.disk_id::text AS disk, Files.size "
+                                          "FROM Files LEFT JOIN FilesInDisks ON Files.file_id = FilesInDisks.file_id")
+            self.assertListEqual(["1", None], list(result.groupBy("disk", "size", "count")[0]), "Should work")
+            self.assertListEqual([4, 21], list(result.groupBy("disk", "size", "sum")[1]), "Should work")
+            # integer, float and boolean columns are copied in binary, in the query's order
+            result = conn.executeColumnar("SELECT Files.file_id, Files.size / 2.0::float8 AS half, "
+                                          "Files.size > 4 AS big, FilesInDisks.disk_id "
+                                          "FROM Files LEFT JOIN FilesInDisks ON Files.file_id = FilesInDisks.file_id "
+                                          "ORDER BY Files.size DESC;")
+            self.assertListEqual([4, 2, 5, 1, 3], list(result.column("file_id")), "Should work")
+            self.assertListEqual([4.5, 3, 2.5, 2, 0.5], list(result.column("half")), "Should work")
+            self.assertListEqual([True, True, True, False, False], list(result.column("big")), "Should work")
+            self.assertEqual("float64", str(result.column("disk_id").dtype), "Widened for its NULLs")
+            self.assertListEqual([False, False, False, True, False], list(result.column("disk_id") == 1), "Should work")
+            self.assertEqual(0, conn.executeColumnar("SELECT file_id FROM Files WHERE file_id < 0").size(), "Empty")
+        finally:
+            conn.close()
+
+    def test_resultSetRow(self):
+        self.assertListEqual([Status.OK] * 2, Solution.addFiles([File(1, "MP3", 4), File(2, "WAV", 6)]), "Should work")
+        conn = Connector.DBConnector()
+        try:
+            _, result = conn.execute("SELECT file_id, type, size FROM Files ORDER BY file_id")
+            _, empty = conn.execute("SELECT file_id FROM Files WHERE file_id < 0")
+            _, total = conn.execute("SELECT SUM(size) FROM Files")
+        finally:
+            conn.close()
+        row = result.row(1)
+        self.assertEqual("WAV", row["type"], "By name")
+        self.assertEqual("WAV", row["TYPE"], "Case insensitive")
+        self.assertEqual(6, row[2], "By position")
+        self.assertEqual(None, row[None], "Like ResultSetDict")
+        self.assertEqual(3, len(row), "Should work")
+        self.assertListEqual(["file_id", "type", "size"], list(row), "Iterates over the names")
+        self.assertListEqual(["file_id", "type", "size"], list(row.keys()), "Should work")
+        self.assertListEqual([2, "WAV", 6], list(row.values()), "Should work")
+        self.assertListEqual([("file_id", 2), ("type", "WAV"), ("size", 6)], list(row.items()), "Should work")
+        self.assertEqual(6, row.get("Size"), "Should work")
+        self.assertEqual(-1, row.get("missing", -1), "Default")
+        self.assertDictEqual(dict(result[1]), dict(row.items()), "Same values as result[i]")
+        self.assertListEqual([1, 2], result.column("file_id"), "By name")
+        self.assertListEqual([4, 6], result.column(2), "By position")
+        self.assertListEqual([], empty.column("file_id"), "Empty")
+        self.assertEqual(1, result.scalar(), "First value of the first row")
+        self.assertEqual(10, total.scalar(), "Should work")
+        self.assertEqual(None, empty.scalar(), "Empty")
+
+    def test_instrumentation(self):
+        before = []
+        after = []
+
+        def failing(event):
+            raise RuntimeError("must not fail the query")
+
+        Instrumentation.addBeforeExecuteHook(lambda query, params: before.append((query, params)))
+        Instrumentation.addAfterExecuteHook(after.append)
+        Instrumentation.addAfterExecuteHook(failing)
+        try:
+            self.assertEqual(Status.OK, Solution.addFile(File(1, "MP3", 4)), "Should work")
+            self.assertEqual(Status.ALREADY_EXISTS, Solution.addFile(File(1, "MP3", 4)), "Should work")
+        finally:
+            for hook in Instrumentation._beforeHooks + Instrumentation._afterHooks:
+                Instrumentation.removeHook(hook)
+        self.assertFalse(Instrumentation.active, "No hook left")
+        self.assertEqual((1, "MP3", 4), before[-1][1], "Parameters of the statement")
+        self.assertIn("INSERT INTO Files", before[-1][0], "Statement text, not EXECUTE")
+        # a connection that did not PREPARE the statement yet reports the PREPARE too
+        inserts = [event for event in after if event.query.startswith("INSERT")]
+        self.assertEqual(2, len(inserts), "Should work")
+        self.assertEqual("Solution.addFile", inserts[0].caller, "Should work")
+        self.assertEqual(1, inserts[0].rowcount, "Should work")
+        self.assertEqual(None, inserts[0].exception, "Should work")
+        self.assertEqual(-1, inserts[1].rowcount, "Failed")
+        self.assertIs(DatabaseException.UNIQUE_VIOLATION, inserts[1].exception, "Mapped exception")
+        count = len(after)
+        Solution.getFileByID(1)
+        self.assertEqual(count, len(after), "Not called once removed")
+
+        histogram = Instrumentation.LatencyHistogram()
+        for millis in range(1, 101):
+            histogram.record(millis / 1000, failed=millis > 98)
+        self.assertEqual(100, histogram.count, "Should work")
+        self.assertEqual(2, histogram.errors, "Should work")
+        self.assertAlmostEqual(0.0505, histogram.mean(), 6, "Should work")
+        self.assertEqual(0.1, histogram.max, "Should work")
+        # buckets are upper bounds, at most 19% above the exact value
+        for fraction, exact in ((0.5, 0.05), (0.95, 0.095), (0.99, 0.099)):
+            self.assertGreaterEqual(histogram.percentile(fraction), exact, "Upper bound")
+            self.assertLessEqual(histogram.percentile(fraction), exact * 1.19, "Within a bucket")
+        self.assertEqual(0.1, histogram.percentile(1.0), "Capped at max")
+        self.assertEqual(0.0, Instrumentation.LatencyHistogram().percentile(0.5), "Empty")
+
+        # prepared before, so only the EXECUTEs are counted
+        Solution.getDiskByID(1)
+        aggregator = Instrumentation.LatencyAggregator().install()
+        try:
+            Solution.getFileByID(1)
+            Solution.getFileByID(2)
+            Solution.getDiskByID(1)
+        finally:
+            aggregator.uninstall()
+        self.assertEqual(2, aggregator.callCounts()["Solution.getFileByID"], "Should work")
+        self.assertEqual(1, aggregator.callCounts()["Solution.getDiskByID"], "Should work")
+        self.assertIn("Solution.getFileByID", aggregator.report(), "Should work")
+
+    def test_mostAvailableDisksSweep(self):
+        # ties of file sizes and free space, speeds and counts, checked against counting every pair
+        generator = random.Random(12)
+        files = [File(i, "MP3", generator.randint(1, 20)) for i in range(1, 61)]
+        disks = [Disk(i, "DELL", generator.randint(1, 3), generator.randint(0, 22), 1) for i in range(1, 25)]
+        disks.append(Disk(25, "DELL", 3, 0, 1))
+        self.assertListEqual([Status.OK] * 60, Solution.addFiles(files), "Should work")
+        self.assertListEqual([Status.OK] * 25, Solution.addDisks(disks), "Should work")
+        counts = {disk.getDiskID(): sum(file.getSize() <= disk.getFreeSpace() for file in files) for disk in disks}
+        expected = [disk.getDiskID() for disk in sorted(disks, key=lambda disk: (-counts[disk.getDiskID()],
+                                                                                -disk.getSpeed(), disk.getDiskID()))]
+        self.assertListEqual(expected, Solution.mostAvailableDisks(25), "Same as counting")
+        self.assertListEqual(expected[:5], Solution.mostAvailableDisks(), "Should work")
+        self.assertIn(0, counts.values(), "Disks that fit no file are included")
+
+    def test_diskStatsMaintained(self):
+        files = {i: File(i, "MP3", i * 10) for i in range(1, 7)}
+        disks = {i: Disk(i, "DELL" if i % 2 else "HP", 10, 1000, 10) for i in range(1, 5)}
+        rams = {i: RAM(i, "DELL" if i < 3 else "HP", i) for i in range(1, 5)}
+        self.assertListEqual([Status.OK] * 6, Solution.addFiles(list(files.values())), "Should work")
+        self.assertListEqual([Status.OK] * 4, Solution.addDisks(list(disks.values())), "Should work")
+        self.assertListEqual([Status.OK] * 4, Solution.addRAMs(list(rams.values())), "Should work")
+        placements = set()  # (file_id, disk_id)
+        ramPlacements = set()  # (ram_id, disk_id)
+
+        # DiskStats and the conflict counts against counting over the placements
+        def check(step):
+            for d in disks:
+                sizes = [files[f].getSize() for f, disk in placements if disk == d]
+                average = sum(sizes) / len(sizes) if sizes else 0
+                self.assertEqual(average, Solution.averageFileSizeOnDisk(d), step)
+                onDisk = [rams[r] for r, disk in ramPlacements if disk == d]
+                self.assertEqual(sum(ram.getSize() for ram in onDisk), Solution.diskTotalRAM(d), step)
+                self.assertEqual(all(ram.getCompany() == disks[d].getCompany() for ram in onDisk),
+                                 Solution.isCompanyExclusive(d), step)
+            copies = {}
+            for f, _ in placements:
+                copies[f] = copies.get(f, 0) + 1
+            self.assertListEqual(sorted({d for f, d in placements if copies[f] > 1}), Solution.getConflictingDisks(),
+                                 step)
+
+        # multi-row inserts
+        self.assertListEqual([Status.OK] * 4, Solution.addFilesToDisk([files[i] for i in (1, 2, 3, 4)], 1),
+                             "Should work")
+        self.assertListEqual([Status.OK] * 2, Solution.addFilesToDisk([files[i] for i in (2, 5)], 2), "Should work")
+        self.assertEqual(3, Loader.loadFilesInDisks([(3, 3), (6, 3), (1, 4)]), "Should work")
+        self.assertEqual(4, Loader.loadRamsInDisks([(1, 1), (3, 1), (2, 2), (4, 3)]), "Should work")
+        placements.update({(1, 1), (2, 1), (3, 1), (4, 1), (2, 2), (5, 2), (3, 3), (6, 3), (1, 4)})
+        ramPlacements.update({(1, 1), (3, 1), (2, 2), (4, 3)})
+        check("multi-row inserts")
+
+        # multi-row deletes, over one and over several disks
+        self.assertListEqual([Status.OK] * 2, Solution.removeFilesFromDisk([files[2], files[4]], 1), "Should work")
+        placements -= {(2, 1), (4, 1)}
+        check("removeFilesFromDisk")
+        conn = Connector.DBConnector()
+        conn.execute("DELETE FROM FilesInDisks WHERE file_id IN (3, 5)")
+        conn.execute("DELETE FROM RamsInDisks WHERE ram_id IN (1, 2)")
+        conn.commit()
+        conn.close()
+        placements -= {(3, 1), (3, 3), (5, 2)}
+        ramPlacements -= {(1, 1), (2, 2)}
+        check("multi-row DELETE")
+
+        # cascading deletes
+        self.assertEqual(Status.OK, Solution.addFilesToDisk([files[6]], 1)[0], "Should work")
+        self.assertEqual(Status.OK, Solution.addRAMToDisk(2, 3), "Should work")
+        placements.add((6, 1))
+        ramPlacements.add((2, 3))
+        check("re-added")
+        self.assertEqual(Status.OK, Solution.deleteFile(files[1]), "Should work")
+        placements = {(f, d) for f, d in placements if f != 1}
+        check("deleteFile")
+        self.assertEqual(Status.OK, Solution.deleteRAM(4), "Should work")
+        ramPlacements = {(r, d) for r, d in ramPlacements if r != 4}
+        check("deleteRAM")
+        self.assertEqual(Status.OK, Solution.deleteDisk(3), "Should work")
+        del disks[3]
+        placements = {(f, d) for f, d in placements if d != 3}
+        ramPlacements = {(r, d) for r, d in ramPlacements if d != 3}
+        check("deleteDisk")
+        Solution.clearTables()
+        self.assertListEqual([], Solution.getConflictingDisks(), "Should work")
+
+    def test_nestedSession(self):
+        with Solution.session() as outer:
+            self.assertEqual(Status.OK, outer.addDisk(Disk(1, "DELL", 10, 10, 10)), "Should work")
+            # a failing inner session takes only its own work back
+            with self.assertRaises(KeyError):
+                with Solution.session() as inner:
+                    self.assertEqual(Status.OK, inner.addFile(File(1, "MP3", 4)), "Should work")
+                    self.assertEqual(Status.OK, inner.addFileToDisk(File(1, "MP3", 4), 1), "Should work")
+                    raise KeyError("abort")
+            self.assertEqual(None, outer.getFileByID(1).getFileID(), "Inner session rolled back")
+            inner = Solution.session().begin()
+            self.assertEqual(Status.OK, inner.addFile(File(2, "MP3", 4)), "Should work")
+            inner.rollback()
+            self.assertEqual(Status.OK, inner.addFile(File(3, "MP3", 4)), "Should work")
+            inner.commit()
+            inner.close()
+            self.assertEqual(None, outer.getFileByID(2).getFileID(), "Rolled back by rollback()")
+            self.assertEqual(10, outer.getDiskByID(1).getFreeSpace(), "Outer work kept")
+        self.assertEqual(1, Solution.getDiskByID(1).getDiskID(), "Outer session committed")
+        self.assertEqual(None, Solution.getFileByID(1).getFileID(), "Inner work gone")
+        self.assertEqual(None, Solution.getFileByID(2).getFileID(), "Inner work gone")
+        self.assertEqual(3, Solution.getFileByID(3).getFileID(), "Committed inner work kept")
+
+    def test_sessionInvalidation(self):
+        EntityCache.configure(maxsize=100, ttl=60, negative_ttl=60)
+        try:
+            self.assertEqual(Status.OK, Solution.addDisk(Disk(1, "DELL", 10, 10, 10)), "Should work")
+            self.assertEqual(Status.OK, Solution.addFile(File(1, "MP3", 4)), "Should work")
+            self.assertEqual(10, Solution.getDiskByID(1).getFreeSpace(), "Cached")
+            with Solution.session() as session:
+                self.assertEqual(Status.OK, session.addFileToDisk(File(1, "MP3", 4), 1), "Should work")
+                # a reader outside the session still sees (and caches) the committed row
+                outside = contextvars.Context().run(Solution.getDiskByID, 1)
+                self.assertEqual(10, outside.getFreeSpace(), "Not committed yet")
+            self.assertEqual(6, Solution.getDiskByID(1).getFreeSpace(), "Invalidated when the session committed")
+            with self.assertRaises(KeyError):
+                with Solution.session() as session:
+                    self.assertEqual(Status.OK, session.removeFileFromDisk(File(1, "MP3", 4), 1), "Should work")
+                    raise KeyError("abort")
+            self.assertEqual(6, Solution.getDiskByID(1).getFreeSpace(), "Rolled back")
+            self.assertEqual(2, EntityCache.get().stats()["hits"], "Nothing invalidated by the rolled back session")
+            # addFiles invalidates once the rows are committed
+            self.assertEqual(None, Solution.getFileByID(2).getFileID(), "Cached as missing")
+            self.assertListEqual([Status.OK, Status.ALREADY_EXISTS],
+                                 Solution.addFiles([File(2, "MP3", 1), File(1, "MP3", 1)]), "Should work")
+            self.assertEqual(2, Solution.getFileByID(2).getFileID(), "The negative entry was dropped")
+        finally:
+            EntityCache.configure(maxsize=0)
+
+    def test_sharedCacheBadIDs(self):
+        self.assertEqual(Status.OK, Solution.addFile(File(1, "MP3", 4)), "Should work")
+        writer = SharedCache.create("solution_test_" + str(id(self)), capacity=16)
+        try:
+            writer.refresh()
+            SharedCache.configure(name=writer.memory.name)
+            reader = SharedCache.get()
+            self.assertEqual(None, Solution.getFileByID(None).getFileID(), "Not an id")
+            self.assertListEqual([None, 1], [file.getFileID() for file in Solution.getFilesByIDs([None, 1])],
+                                 "Should work")
+            self.assertListEqual([Status.BAD_PARAMS], Solution.addFiles([File(None, "MP3", 1)]), "Should work")
+            self.assertEqual(Status.BAD_PARAMS, Solution.addDisk(Disk(None, "DELL", 10, 10, 10)), "Should work")
+            self.assertEqual(None, asyncio.run(AsyncSolution.getFileByID(None)).getFileID(), "Not an id")
+            self.assertEqual(1, reader.stats()["hits"], "Only file 1 was served from shared memory")
+        finally:
+            SharedCache.configure(name=None)
+            writer.close()
+            writer.unlink()
+
+    def test_configurePoolWhileBorrowed(self):
+        conn = Connector.DBConnector()
+        oldPool = Connector.DBConnector.getPool()
+        try:
+            Connector.DBConnector.configurePool(minconn=0, maxconn=2)
+            newPool = Connector.DBConnector.getPool()
+            self.assertIsNot(oldPool, newPool, "Replaced")
+            conn.execute("SELECT 1")
+            conn.close()
+            self.assertEqual(0, newPool.idle(), "Not handed to the new pool")
+            self.assertEqual(0, newPool.size(), "Not counted by the new pool")
+            self.assertEqual(0, oldPool.idle(), "Closed by the old pool")
+        finally:
+            conn.close()
+            Connector.DBConnector.configurePool()
+
+    def test_entityCacheRacingInvalidation(self):
+        EntityCache.configure(maxsize=100, ttl=60, negative_ttl=60)
+        try:
+            cache = EntityCache.get()
+            self.assertEqual(Status.OK, Solution.addFile(File(1, "MP3", 4)), "Should work")
+            executePrepared = Connector.DBConnector.executePrepared
+
+            # another thread changes the row and invalidates it while this read's query runs
+            def racingWrite(conn, name, params=(), printSchema=False):
+                result = executePrepared(conn, name, params, printSchema)
+                EntityCache.invalidate(("File", 1))
+                return result
+            with mock.patch.object(Connector.DBConnector, "executePrepared", racingWrite):
+                self.assertEqual(4, Solution.getFileByID(1).getSize(), "Should work")
+                self.assertEqual(4, Solution.getFilesByIDs([1])[0].getSize(), "Should work")
+            self.assertEqual(0, cache.size(), "The rows read before the invalidation are not cached")
+            self.assertEqual(4, Solution.getFileByID(1).getSize(), "Should work")
+            self.assertEqual(1, cache.size(), "Cached without a racing invalidation")
+        finally:
+            EntityCache.configure(maxsize=0)
+
+    def test_async(self):
+        async def scenario():
+            statuses = await asyncio.gather(*[AsyncSolution.addFile(File(i, "MP3", i)) for i in range(1, 21)])
+            self.assertListEqual([Status.OK] * 20, statuses, "Should work")
+            self.assertEqual(Status.ALREADY_EXISTS, await AsyncSolution.addFile(File(1, "MP3", 1)), "ID 1 exists")
+            self.assertEqual(Status.BAD_PARAMS, await AsyncSolution.addFile(File(0, "MP3", 1)), "ID 0 is illegal")
+            self.assertEqual(Status.OK, await AsyncSolution.addDisk(Disk(1, "DELL", 10, 10, 3)), "Should work")
+            self.assertEqual(Status.OK, await AsyncSolution.addFileToDisk(File(4, "MP3", 4), 1), "Should work")
+            self.assertEqual(Status.BAD_PARAMS, await AsyncSolution.addFileToDisk(File(7, "MP3", 7), 1), "No space")
+            self.assertEqual(Status.NOT_EXISTS, await AsyncSolution.addFileToDisk(File(99, "MP3", 1), 1), "No file")
+            disk = await AsyncSolution.getDiskByID(1)
+            self.assertEqual(6, disk.getFreeSpace(), "Should work")
+            self.assertEqual(None, (await AsyncSolution.getFileByID(99)).getFileID(), "badFile")
+            self.assertEqual(12, await AsyncSolution.getCostForType("MP3"), "Should work")
+            self.assertListEqual([6, 5, 4, 3, 2], await AsyncSolution.getFilesCanBeAddedToDisk(1), "Should work")
+            self.assertEqual(Status.NOT_EXISTS, await AsyncSolution.deleteDisk(2), "Should work")
+            self.assertEqual(Status.OK, await AsyncSolution.deleteDisk(1), "Should work")
+        asyncio.run(scenario())
+
 
 # *** DO NOT RUN EACH TEST MANUALLY ***
 if __name__ == '__main__':
@@ -0,0 +1,272 @@
+import asyncio
+import time
+import psycopg2
+from psycopg2 import extensions, sql
+from typing import Union
+from Utility import Config
+from Utility import Instrumentation
+from Utility.ConnectionPool import PooledConnection
+from Utility.DBConnector import DBConnector, ResultSet, violationFor
+from Utility.Exceptions import DatabaseException
+
+
+# waits until an asynchronous psycopg2 connection finished its current operation, without blocking the event loop
+# constraint violations are translated like DBConnector.execute does
+async def wait(connection):
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            state = connection.poll()
+        except psycopg2.Error as e:
+            violation = violationFor(e)
+            if violation is None:
+                raise
+            raise violation
+        if state == extensions.POLL_OK:
+            return
+        future = loop.create_future()
+
+        def ready():
+            if not future.done():
+                future.set_result(None)
+
+        fd = connection.fileno()
+        if state == extensions.POLL_READ:
+            loop.add_reader(fd, ready)
+            try:
+                await future
+            finally:
+                loop.remove_reader(fd)
+        elif state == extensions.POLL_WRITE:
+            loop.add_writer(fd, ready)
+            try:
+                await future
+            finally:
+                loop.remove_writer(fd)
+        else:
+            raise DatabaseException.ConnectionInvalid("Unexpected poll state " + str(state))
+
+
+# asyncio counterpart of ConnectionPool, connections are opened lazily and shared by the tasks of one event loop
+class AsyncConnectionPool:
+    # constructor, same settings as ConnectionPool
+    def __init__(self, params: dict, minconn=1, maxconn=10, max_idle=300.0, health_check_after=30.0, timeout=30.0):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("invalid pool size: minconn=" + str(minconn) + ", maxconn=" + str(maxconn))
+        self.params = dict(params)
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.max_idle = max_idle
+        self.health_check_after = health_check_after
+        self.timeout = timeout
+        self.loop = None
+        self.__idle = []  # stack of (connection, time it was returned)
+        self.__size = 0
+        self.__cond = asyncio.Condition()
+
+    # number of open connections (idle + borrowed)
+    def size(self):
+        return self.__size
+
+    # number of connections waiting in the pool
+    def idle(self):
+        return len(self.__idle)
+
+    # borrow a connection, waits up to timeout seconds when maxconn connections are already borrowed
+    async def getconn(self):
+        self.loop = asyncio.get_running_loop()
+        async with self.__cond:
+            self.__reap()
+            try:
+                await asyncio.wait_for(self.__cond.wait_for(lambda: self.__idle or self.__size < self.maxconn),
+                                       self.timeout)
+            except asyncio.TimeoutError:
+                raise DatabaseException.ConnectionInvalid("Connection pool exhausted")
+            if self.__idle:
+                connection, returned_at = self.__idle.pop()
+            else:
+                self.__size += 1
+                connection, returned_at = None, None
+
+        if connection is not None and not await self.__isHealthy(connection, returned_at):
+            connection.close()
+            connection = None
+        if connection is None:
+            try:
+                connection = psycopg2.connect(connection_factory=PooledConnection, async_=1, **self.params)
+                await wait(connection)
+            except Exception:
+                async with self.__cond:
+                    self.__size -= 1
+                    self.__cond.notify()
+                raise DatabaseException.ConnectionInvalid("Could not connect to database")
+        return connection
+
+    # return a borrowed connection, it must not be inside a transaction
+    async def putconn(self, connection, discard=False):
+        async with self.__cond:
+            if discard or connection.closed:
+                self.__size -= 1
+                if not connection.closed:
+                    connection.close()
+            else:
+                self.__idle.append((connection, time.monotonic()))
+            self.__cond.notify()
+
+    # close every idle connection
+    async def closeall(self):
+        async with self.__cond:
+            while self.__idle:
+                connection, _ = self.__idle.pop()
+                self.__size -= 1
+                connection.close()
+
+    async def __isHealthy(self, connection, returned_at):
+        if connection.closed:
+            return False
+        if time.monotonic() - returned_at < self.health_check_after:
+            return True
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SELECT 1")
+            await wait(connection)
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    # must be called with the lock held
+    def __reap(self):
+        now = time.monotonic()
+        while len(self.__idle) > self.minconn and now - self.__idle[0][1] > self.max_idle:
+            connection, _ = self.__idle.pop(0)
+            self.__size -= 1
+            connection.close()
+
+
+# asyncio counterpart of DBConnector, same execute/executePrepared/commit/rollback/close API but awaitable
+# usage: conn = await AsyncDBConnector.connect() ... await conn.close()
+class AsyncDBConnector:
+    # one pool per event loop, created on first use from database.ini
+    __pools = {}
+
+    # constructor, use connect() to get a usable instance
+    def __init__(self):
+        self.connection = None
+        self.cursor = None
+        self.__pool = None
+        self.__inTransaction = False
+
+    # borrows a connection from the pool of the running event loop
+    @staticmethod
+    async def connect():
+        conn = AsyncDBConnector()
+        conn.__pool = AsyncDBConnector.getPool()
+        conn.connection = await conn.__pool.getconn()
+        conn.cursor = conn.connection.cursor()
+        return conn
+
+    # the pool of the running event loop
+    @staticmethod
+    def getPool() -> AsyncConnectionPool:
+        loop = asyncio.get_running_loop()
+        pool = AsyncDBConnector.__pools.get(loop)
+        if pool is None:
+            # forget pools of event loops that were closed (e.g. by asyncio.run)
+            for other in [other for other in AsyncDBConnector.__pools if other.is_closed()]:
+                del AsyncDBConnector.__pools[other]
+            options = {}
+            for key, value in Config.loadConfig('pool', required=False).items():
+                options[key] = int(value) if key in ('minconn', 'maxconn') else float(value)
+            pool = AsyncConnectionPool(Config.loadConfig(), **options)
+            AsyncDBConnector.__pools[loop] = pool
+        return pool
+
+    # close connection, uncommitted changes are rolled back and the connection goes back to the pool
+    async def close(self):
+        if self.connection is None:
+            return
+        discard = False
+        if self.__inTransaction:
+            try:
+                await self.rollback()
+            except Exception:
+                discard = True
+        if self.cursor is not None:
+            self.cursor.close()
+            self.cursor = None
+        await self.__pool.putconn(self.connection, discard)
+        self.connection = None
+
+    # commit connection's changes
+    async def commit(self):
+        if self.connection is not None and self.__inTransaction:
+            try:
+                await self.__run("COMMIT", None)
+            except Exception:
+                raise DatabaseException.ConnectionInvalid("Could not commit changes")
+            finally:
+                self.__inTransaction = False
+
+    # rollback connection's changes
+    async def rollback(self):
+        if self.connection is not None and self.__inTransaction:
+            try:
+                await self.__run("ROLLBACK", None)
+            except Exception:
+                raise DatabaseException.ConnectionInvalid("Could not rollback changes")
+            finally:
+                self.__inTransaction = False
+
+    # executes the query inside the connection's transaction, returns the number of rows effected and a ResultSet
+    async def execute(self, query: Union[str, sql.Composed], printSchema=False) -> (int, ResultSet):
+        return await self.__execute(query, None, printSchema)
+
+    # executes a statement registered with DBConnector.prepare, PREPAREs it first if this connection has not yet
+    async def executePrepared(self, name: str, params=(), printSchema=False) -> (int, ResultSet):
+        statement = DBConnector.getStatement(name)
+        if self.connection is not None and self.connection.prepared.get(statement.name) is not statement:
+            if statement.name in self.connection.prepared:
+                await self.__execute("DEALLOCATE " + statement.name, None)
+                del self.connection.prepared[statement.name]
+            await self.__execute(statement.prepareQuery, None)
+            self.connection.prepared[statement.name] = statement
+        return await self.__execute(statement.executeQuery, tuple(params) if statement.types else None, printSchema,
+                                    statement.text)
+
+    async def __execute(self, query, params, printSchema=False, text=None) -> (int, ResultSet):
+        if self.connection is None:
+            raise DatabaseException.ConnectionInvalid("Connection Invalid")
+        # asynchronous connections are always in autocommit mode, so the transaction is opened explicitly
+        if not self.__inTransaction:
+            await self.__run("BEGIN", None)
+            self.__inTransaction = True
+        if Instrumentation.active:
+            if isinstance(query, sql.Composable):
+                query = query.as_string(self.cursor)
+            token = Instrumentation.start(query if text is None else text, params)
+            try:
+                await self.__run(query, params)
+            except Exception as e:
+                Instrumentation.finish(token, -1, e)
+                raise
+            Instrumentation.finish(token, self.cursor.rowcount)
+        else:
+            await self.__run(query, params)
+        row_effected = max(self.cursor.rowcount, 0)
+
+        # get entries in case of SELECT
+        if self.cursor.description is not None:
+            entries = ResultSet(self.cursor.description, self.cursor.fetchall())
+        else:
+            entries = ResultSet()
+
+        # print SELECT entries
+        if printSchema:
+            print(entries)
+
+        return row_effected, entries
+
+    async def __run(self, query, params):
+        self.cursor.execute(query, params)
+        await wait(self.connection)
@@ -0,0 +1,149 @@
+import select
+import threading
+import time
+import psycopg2
+from psycopg2 import extensions
+from Utility import Config
+from Utility.EntityCache import EntityCache
+
+'''
+    cross-process cache invalidation: the triggers of createTables NOTIFY on CHANNEL after every statement that
+    changes Files, Disks, Rams, FilesInDisks or RamsInDisks, with the payload "<table> <id>,<id>,..." (the ids of
+    the changed rows, disk ids for the link tables) or "<table> *" when too many rows changed to list them
+    a ChangeListener is a background thread that LISTENs on its own connection, coalesces the notifications that
+    arrive within interval seconds and hands them to its subscribers as one {table: set of ids or None (all)}
+    by default it invalidates the matching EntityCache entries
+        listener = ChangeListener.fromConfig()
+        listener.start()
+        ...
+        listener.stop()
+    notifications sent while the listener was not connected are lost, so after every (re)connect the subscribers
+    get every table with None
+'''
+
+CHANNEL = "solution_changes"
+# a statement that changed more rows than this notifies "<table> *"
+MAX_KEYS_PER_NOTIFICATION = 500
+TABLES = ("Files", "Disks", "Rams", "FilesInDisks", "RamsInDisks")
+
+# table -> the EntityCache entity its rows are cached as
+_ENTITIES = {"Files": "File", "Disks": "Disk", "Rams": "RAM"}
+
+
+# the default subscriber, drops the changed rows from the EntityCache
+def invalidateEntityCache(changes: dict):
+    for table, ids in changes.items():
+        entity = _ENTITIES.get(table)
+        if entity is None:
+            continue
+        if ids is None:
+            EntityCache.flush()
+            return
+        EntityCache.invalidate(*[(entity, key) for key in ids])
+
+
+class ChangeListener(threading.Thread):
+    # seconds the thread waits for a notification before it checks whether it was stopped
+    __IDLE_WAIT = 0.5
+
+    # constructor, interval - seconds notifications are collected before the subscribers are called
+    # max_keys - ids kept per table before the table is reported as changed altogether
+    # reconnect_after - seconds to wait before connecting again when the connection is lost
+    def __init__(self, interval=0.05, max_keys=10000, reconnect_after=1.0):
+        super().__init__(name="ChangeListener", daemon=True)
+        self.interval = interval
+        self.max_keys = max_keys
+        self.reconnect_after = reconnect_after
+        self.notifications = 0
+        self.batches = 0
+        self.reconnects = 0
+        self.__subscribers = [invalidateEntityCache]
+        self.__pending = {}  # table -> set of ids, or None once the whole table changed
+        self.__deadline = None
+        self.__stopped = threading.Event()
+        self.__listening = threading.Event()
+
+    # a listener with the settings of the [listener] section of database.ini
+    @staticmethod
+    def fromConfig():
+        options = {}
+        for key, value in Config.loadConfig('listener', required=False).items():
+            options[key] = int(value) if key == 'max_keys' else float(value)
+        return ChangeListener(**options)
+
+    # callback(changes) is called from the listener thread with {table: set of ids or None}
+    def subscribe(self, callback):
+        self.__subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self.__subscribers:
+            self.__subscribers.remove(callback)
+
+    # blocks until the listener is connected, False if it was not within timeout seconds
+    def waitUntilListening(self, timeout=None) -> bool:
+        return self.__listening.wait(timeout)
+
+    # ends the thread, pending notifications are delivered first
+    def stop(self, timeout=None):
+        self.__stopped.set()
+        if self.is_alive():
+            self.join(timeout)
+
+    def run(self):
+        while not self.__stopped.is_set():
+            connection = None
+            try:
+                connection = psycopg2.connect(**Config.loadConfig())
+                connection.set_isolation_level(extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                connection.cursor().execute("LISTEN " + CHANNEL)
+                # whatever changed while nobody listened is unknown
+                self.__pending = {table: None for table in TABLES}
+                self.__deliver()
+                self.__listening.set()
+                self.__listen(connection)
+            except Exception:
+                self.__listening.clear()
+                self.reconnects += 1
+                self.__stopped.wait(self.reconnect_after)
+            finally:
+                if connection is not None:
+                    connection.close()
+        if self.__pending:
+            self.__deliver()
+
+    def __listen(self, connection):
+        while not self.__stopped.is_set():
+            now = time.monotonic()
+            timeout = ChangeListener.__IDLE_WAIT if self.__deadline is None else max(0.0, self.__deadline - now)
+            if select.select([connection], [], [], timeout)[0]:
+                connection.poll()
+                for notification in connection.notifies:
+                    self.__add(notification.payload)
+                connection.notifies.clear()
+            if self.__deadline is not None and time.monotonic() >= self.__deadline:
+                self.__deliver()
+
+    def __add(self, payload: str):
+        self.notifications += 1
+        table, _, keys = payload.partition(" ")
+        if self.__deadline is None:
+            self.__deadline = time.monotonic() + self.interval
+        if table in self.__pending and self.__pending[table] is None:
+            return
+        if keys == "*":
+            self.__pending[table] = None
+            return
+        ids = self.__pending.setdefault(table, set())
+        ids.update(int(key) for key in keys.split(","))
+        if len(ids) > self.max_keys:
+            self.__pending[table] = None
+
+    def __deliver(self):
+        changes, self.__pending, self.__deadline = self.__pending, {}, None
+        self.batches += 1
+        for subscriber in list(self.__subscribers):
+            # a failing subscriber must not stop the listener
+            try:
+                subscriber(changes)
+            except Exception:
+                pass
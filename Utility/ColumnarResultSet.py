@@ -0,0 +1,216 @@
+import io
+import struct
+from Utility.DBConnector import ResultSetDict
+
+# numpy is only needed for columnar results, the rest of the package works without it
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# PostgreSQL type oids -> numpy dtype of the column, everything else is kept as Python objects
+_int_types = (20, 21, 23, 26)  # int8, int2, int4, oid
+_float_types = (700, 701, 1700)  # float4, float8, numeric
+_bool_types = (16,)
+
+_AGGREGATES = ("sum", "count", "mean", "min", "max")
+
+# binary COPY: type oid -> numpy dtype of its fixed-size field, the types executeColumnar copies
+_BINARY_FIXED = {21: ">i2", 23: ">i4", 20: ">i8", 26: ">u4", 700: ">f4", 701: ">f8", 16: "?"}
+_SIGNATURE = b"PGCOPY\n\xff\r\n\x00"
+_INT = struct.Struct("!i")
+
+
+# a column that can hold NULLs: integers become float64 (NULL is nan), booleans objects (NULL is None)
+def _widen(column):
+    if column.dtype == numpy.int64:
+        return column.astype(numpy.float64)
+    return column.astype(object)
+
+
+def _dtype(type_code):
+    if type_code in _int_types:
+        return numpy.int64
+    if type_code in _float_types:
+        return numpy.float64
+    if type_code in _bool_types:
+        return numpy.bool_
+    return object
+
+
+# a query result stored column by column, one numpy array per column
+# columns are keyed by name through cols, like ResultSet
+class ColumnarResultSet:
+    # constructor, cols_header is the list of column names and columns the matching arrays
+    def __init__(self, cols_header=None, columns=None):
+        if numpy is None:
+            raise ImportError("numpy is required for columnar results")
+        self.cols_header = list(cols_header or [])
+        self.columns = list(columns or [])
+        self.cols = ResultSetDict()
+        for index, col in enumerate(self.cols_header):
+            self.cols[col] = index
+
+    # builds the arrays from an executed cursor, reading chunksize rows at a time into preallocated arrays
+    @staticmethod
+    def fromCursor(cursor, chunksize=10000):
+        if cursor.description is None:
+            return ColumnarResultSet()
+        if numpy is None:
+            raise ImportError("numpy is required for columnar results")
+        n = max(cursor.rowcount, 0)
+        cols_header = [d.name for d in cursor.description]
+        columns = [numpy.empty(n, dtype=_dtype(d.type_code)) for d in cursor.description]
+        start = 0
+        while True:
+            chunk = cursor.fetchmany(chunksize)
+            if not chunk:
+                break
+            end = start + len(chunk)
+            for index in range(len(columns)):
+                values = [row[index] for row in chunk]
+                if columns[index].dtype in (numpy.int64, numpy.bool_) and None in values:
+                    # NULLs: integers fall back to float64 with nan, booleans to objects
+                    columns[index] = _widen(columns[index])
+                columns[index][start:end] = values
+            start = end
+        return ColumnarResultSet(cols_header, [column[:start] for column in columns])
+
+    # a file-like sink for cursor.copy_expert(sink.statement(query), sink) that decodes the rows of query, whose
+    # columns are described by description, into the arrays
+    # None if a column is not an integer, float or boolean (use fromCursor then)
+    # sink.result() is the ColumnarResultSet once the COPY finished
+    @staticmethod
+    def copySink(description):
+        if numpy is None:
+            raise ImportError("numpy is required for columnar results")
+        for d in description:
+            if d.type_code not in _BINARY_FIXED:
+                return None
+        return _BinaryCopySink(description)
+
+    # so you can use print(ColumnarResultSet)
+    def __str__(self):
+        string = ""
+        for col in self.cols_header:
+            string += str(col) + "   "
+        string += '\n'
+        for row in range(self.size()):
+            for column in self.columns:
+                string += str(column[row]) + "   "
+            string += '\n'
+        return string
+
+    # what is the size of the ColumnarResultSet?
+    def size(self):
+        return len(self.columns[0]) if self.columns else 0
+
+    # is the ColumnarResultSet empty?
+    def isEmpty(self):
+        return self.size() == 0
+
+    # the array of a column, KeyError for an unknown column
+    def column(self, name: str):
+        if name.lower() not in self.cols:
+            raise KeyError(name)
+        return self.columns[self.cols[name]]
+
+    # rows where mask (a boolean array, e.g. rs.column("size") > 10) is True
+    def filter(self, mask):
+        return ColumnarResultSet(self.cols_header, [column[mask] for column in self.columns])
+
+    def count(self) -> int:
+        return self.size()
+
+    def sum(self, name: str):
+        return self.column(name).sum()
+
+    # nan for an empty column
+    def mean(self, name: str):
+        column = self.column(name)
+        return column.mean() if len(column) else numpy.nan
+
+    def min(self, name: str):
+        return self.column(name).min()
+
+    def max(self, name: str):
+        return self.column(name).max()
+
+    # aggregates column value per distinct key, func is one of sum, count, mean, min, max
+    # returns (sorted distinct keys, aggregate per key), NULL keys (None) are grouped under a last key None
+    def groupBy(self, key: str, value: str, func="mean"):
+        if func not in _AGGREGATES:
+            raise ValueError("unknown aggregate " + str(func) + ", expected one of " + ", ".join(_AGGREGATES))
+        keys, inverse = ColumnarResultSet.__groups(self.column(key))
+        values = self.column(value)
+        if len(values) == 0:
+            return keys, numpy.empty(0, dtype=numpy.int64 if func == "count" else
+                                     values.dtype if func in ("min", "max") else numpy.float64)
+        if func == "count":
+            return keys, numpy.bincount(inverse, minlength=len(keys))
+        if func in ("sum", "mean"):
+            sums = numpy.bincount(inverse, weights=values, minlength=len(keys))
+            if func == "sum":
+                return keys, sums
+            return keys, sums / numpy.bincount(inverse, minlength=len(keys))
+        initial = numpy.full(len(keys), values.max() if func == "min" else values.min(), dtype=values.dtype)
+        (numpy.minimum if func == "min" else numpy.maximum).at(initial, inverse, values)
+        return keys, initial
+
+    # sorted distinct values of column and the index of every row's value among them, None sorts last
+    @staticmethod
+    def __groups(column):
+        if column.dtype != object:
+            return numpy.unique(column, return_inverse=True)
+        nulls = numpy.fromiter((value is None for value in column), dtype=bool, count=len(column))
+        if not nulls.any():
+            return numpy.unique(column, return_inverse=True)
+        keys, inverse = numpy.unique(column[~nulls], return_inverse=True)
+        indexes = numpy.full(len(column), len(keys), dtype=inverse.dtype)
+        indexes[~nulls] = inverse
+        return numpy.concatenate([keys.astype(object), numpy.array([None], dtype=object)]), indexes
+
+
+# decodes the binary COPY of a query whose columns all have fixed-size types into arrays
+# the query is copied as SELECT COALESCE(c, '0'), c IS NULL, ... so every row has the same layout, and the whole
+# stream is read as one numpy record array: no Python object is made per value
+# psycopg2 calls write() once per row, so write is the C method of a BytesIO
+class _BinaryCopySink:
+    def __init__(self, description):
+        self.cols_header = [d.name for d in description]
+        self.__types = [d.type_code for d in description]
+        self.__buffer = io.BytesIO()
+        self.write = self.__buffer.write
+        fields = [("count", ">i2")]
+        for index, code in enumerate(self.__types):
+            fields += [("length" + str(index), ">i4"), ("value" + str(index), _BINARY_FIXED[code]),
+                       ("nullLength" + str(index), ">i4"), ("null" + str(index), "?")]
+        self.__records = numpy.dtype(fields)
+
+    # the COPY statement of query (a SELECT) for this sink
+    def statement(self, query: str) -> str:
+        names = ["c" + str(index) for index in range(len(self.__types))]
+        return ("COPY (SELECT " + ", ".join("COALESCE(" + name + ", '0'), " + name + " IS NULL" for name in names) +
+                " FROM (" + query + ") AS columnar(" + ", ".join(names) + ")) TO STDOUT (FORMAT binary)")
+
+    def result(self) -> ColumnarResultSet:
+        data = self.__buffer.getbuffer()
+        if bytes(data[:len(_SIGNATURE)]) != _SIGNATURE:
+            raise ValueError("not a binary COPY stream")
+        offset = len(_SIGNATURE) + 8 + _INT.unpack_from(data, len(_SIGNATURE) + 4)[0]
+        # the rows, then the trailer of 2 bytes
+        count, rest = divmod(len(data) - offset - 2, self.__records.itemsize)
+        if rest:
+            raise ValueError("binary COPY stream of unexpected length")
+        records = numpy.frombuffer(data, dtype=self.__records, count=count, offset=offset)
+        columns = []
+        for index, code in enumerate(self.__types):
+            column = records["value" + str(index)].astype(_dtype(code))
+            nulls = records["null" + str(index)]
+            if nulls.any():
+                column = _widen(column)
+                column[nulls] = None
+            columns.append(column)
+        del records
+        data.release()
+        return ColumnarResultSet(self.cols_header, columns)
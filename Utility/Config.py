@@ -0,0 +1,76 @@
+from configparser import ConfigParser
+import os
+import threading
+from Utility.Exceptions import DatabaseException
+
+# parsed ini files, path -> (mtime, {section: {key: value}})
+_cache = {}
+_cacheLock = threading.Lock()
+
+# keys that may be overridden from the environment even when database.ini does not list them
+_knownKeys = {
+    "postgresql": ("host", "port", "database", "user", "password"),
+    "pool": ("minconn", "maxconn", "max_idle", "health_check_after", "timeout"),
+    "cache": ("maxsize", "ttl", "negative_ttl"),
+    "listener": ("interval", "max_keys", "reconnect_after"),
+    "shared_cache": ("name",),
+}
+
+
+# where database.ini is looked up, in order:
+# $DATABASE_INI, ./Utility/database.ini and ../Utility/database.ini (relative to the working directory)
+def candidatePaths() -> list:
+    paths = []
+    if os.environ.get("DATABASE_INI"):
+        paths.append(os.path.abspath(os.environ["DATABASE_INI"]))
+    paths.append(os.path.join(os.getcwd(), "Utility", "database.ini"))
+    paths.append(os.path.join(os.path.dirname(os.getcwd()), "Utility", "database.ini"))
+    return paths
+
+
+# returns the key/value pairs of a section of database.ini, with environment overrides applied
+# an override is named <SECTION>_<KEY>, e.g. POSTGRESQL_HOST or POOL_MAXCONN
+# the file is parsed once and re-parsed only when its modification time changes
+def loadConfig(section="postgresql", filename=None, required=True) -> dict:
+    values = None
+    for path in ([filename] if filename is not None else candidatePaths()):
+        sections = _read(path)
+        if sections is not None and section in sections:
+            values = dict(sections[section])
+            break
+    if values is None:
+        if required:
+            raise DatabaseException.database_ini_ERROR("Please modify database.ini file under Utility")
+        values = {}
+
+    prefix = section.upper() + "_"
+    keys = set(values)
+    keys.update(_knownKeys.get(section, ()))
+    for key in keys:
+        override = os.environ.get(prefix + key.upper())
+        if override is not None:
+            values[key] = override
+    return values
+
+
+# forget every parsed file, the next loadConfig reads from disk again
+def clearCache():
+    with _cacheLock:
+        _cache.clear()
+
+
+def _read(path):
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    with _cacheLock:
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+    parser = ConfigParser()
+    parser.read(path)
+    sections = {name: dict(parser.items(name)) for name in parser.sections()}
+    with _cacheLock:
+        _cache[path] = (mtime, sections)
+    return sections
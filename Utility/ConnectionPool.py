@@ -0,0 +1,158 @@
+import os
+import threading
+import time
+import psycopg2
+from psycopg2 import extensions
+from Utility.Exceptions import DatabaseException
+
+
+# psycopg2 connection that remembers which prepared statements exist in its session
+class PooledConnection(extensions.connection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = {}  # statement name -> PreparedStatement
+
+
+class ConnectionPool:
+    # constructor, connections are opened lazily on first demand
+    # minconn - number of idle connections that are never reaped
+    # maxconn - upper bound of open connections (idle + borrowed)
+    # max_idle - seconds an idle connection above minconn is kept before it is closed
+    # health_check_after - seconds of idleness after which a connection is pinged before it is handed out
+    # timeout - seconds getconn waits for a connection when the pool is exhausted
+    def __init__(self, params: dict, minconn=1, maxconn=10, max_idle=300.0, health_check_after=30.0, timeout=30.0):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("invalid pool size: minconn=" + str(minconn) + ", maxconn=" + str(maxconn))
+        self.params = dict(params)
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.max_idle = max_idle
+        self.health_check_after = health_check_after
+        self.timeout = timeout
+        self.__idle = []  # stack of (connection, time it was returned)
+        self.__size = 0  # open connections, idle and borrowed
+        self.__cond = threading.Condition()
+        self.__pid = os.getpid()
+        self.__closed = False
+
+    # number of open connections (idle + borrowed)
+    def size(self):
+        with self.__cond:
+            return self.__size
+
+    # number of connections waiting in the pool
+    def idle(self):
+        with self.__cond:
+            return len(self.__idle)
+
+    # borrow a connection, opens a new one if none is idle and the pool is not full
+    def getconn(self):
+        deadline = time.monotonic() + self.timeout
+        with self.__cond:
+            if self.__closed:
+                raise DatabaseException.ConnectionInvalid("Connection pool is closed")
+            self.__checkFork()
+            self.__reap()
+            while True:
+                if self.__idle:
+                    connection, returned_at = self.__idle.pop()
+                    break
+                if self.__size < self.maxconn:
+                    self.__size += 1
+                    connection, returned_at = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self.__cond.wait(remaining):
+                    if not self.__idle and self.__size >= self.maxconn:
+                        raise DatabaseException.ConnectionInvalid("Connection pool exhausted")
+
+        # connecting and pinging happen outside the lock so other threads are not blocked on the network
+        if connection is not None and not self.__isHealthy(connection, returned_at):
+            self.__closeQuietly(connection)
+            connection = None
+        if connection is None:
+            try:
+                connection = self.__connect()
+            except Exception:
+                with self.__cond:
+                    self.__size -= 1
+                    self.__cond.notify()
+                raise DatabaseException.ConnectionInvalid("Could not connect to database")
+        return connection
+
+    # return a borrowed connection, uncommitted work is rolled back
+    # a broken connection (or discard=True) is closed instead of being pooled
+    def putconn(self, connection, discard=False):
+        if not discard and not connection.closed:
+            try:
+                if connection.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    connection.rollback()
+            except Exception:
+                discard = True
+        with self.__cond:
+            if os.getpid() != self.__pid:
+                # connection belongs to the parent process, never touch its socket
+                return
+            if discard or connection.closed or self.__closed:
+                self.__size -= 1
+                self.__closeQuietly(connection)
+            else:
+                self.__idle.append((connection, time.monotonic()))
+            self.__cond.notify()
+
+    # close idle connections that were unused for more than max_idle seconds
+    def reap(self):
+        with self.__cond:
+            self.__reap()
+
+    # close every idle connection and refuse new borrows, borrowed connections are closed on return
+    def closeall(self):
+        with self.__cond:
+            self.__closed = True
+            while self.__idle:
+                connection, _ = self.__idle.pop()
+                self.__size -= 1
+                self.__closeQuietly(connection)
+            self.__cond.notify_all()
+
+    def __connect(self):
+        connection = psycopg2.connect(connection_factory=PooledConnection, **self.params)
+        connection.autocommit = False
+        return connection
+
+    def __isHealthy(self, connection, returned_at):
+        if connection.closed:
+            return False
+        if time.monotonic() - returned_at < self.health_check_after:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            connection.rollback()
+            return True
+        except Exception:
+            return False
+
+    # must be called with the lock held
+    def __reap(self):
+        now = time.monotonic()
+        # the stack keeps the most recently used connections on top, so stale ones are at the bottom
+        while len(self.__idle) > self.minconn and now - self.__idle[0][1] > self.max_idle:
+            connection, _ = self.__idle.pop(0)
+            self.__size -= 1
+            self.__closeQuietly(connection)
+
+    # must be called with the lock held
+    def __checkFork(self):
+        if os.getpid() != self.__pid:
+            # sockets inherited from the parent are left alone, closing them would end the parent's sessions
+            self.__idle = []
+            self.__size = 0
+            self.__pid = os.getpid()
+
+    @staticmethod
+    def __closeQuietly(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
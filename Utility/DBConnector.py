@@ -1,11 +1,46 @@
 import psycopg2
-from psycopg2 import errors, sql
-from configparser import ConfigParser
+from psycopg2 import errors, extras, sql
 from Utility.Exceptions import DatabaseException
-import os
+from Utility.ConnectionPool import ConnectionPool
+from Utility import Config
+from Utility import Instrumentation
+import contextvars
+import itertools
+import threading
 from typing import Union
 
 
+# the DBConnector of the Session (see Utility.Session) the current thread / task works in, None outside sessions
+# a DBConnector created while it is set shares its connection and transaction and runs under a savepoint
+activeSession = contextvars.ContextVar("activeSession", default=None)
+# the Session itself, which collects the cache invalidations to apply when it commits
+currentSession = contextvars.ContextVar("currentSession", default=None)
+
+
+# DatabaseException matching a constraint violation raised by psycopg2, None for any other error
+def violationFor(error: Exception):
+    if isinstance(error, errors.lookup("23502")):
+        return DatabaseException.NOT_NULL_VIOLATION("NOT_NULL_VIOLATION")
+    if isinstance(error, errors.lookup("23503")):
+        return DatabaseException.FOREIGN_KEY_VIOLATION("FOREIGN_KEY_VIOLATION")
+    if isinstance(error, errors.lookup("23505")):
+        return DatabaseException.UNIQUE_VIOLATION("UNIQUE_VIOLATION")
+    if isinstance(error, errors.lookup("23514")):
+        return DatabaseException.CHECK_VIOLATION("CHECK_VIOLATION")
+    return None
+
+
+# calls function and translates constraint violations into DatabaseException, other errors pass through
+def mapException(function, *args):
+    try:
+        return function(*args)
+    except psycopg2.Error as e:
+        violation = violationFor(e)
+        if violation is None:
+            raise
+        raise violation
+
+
 class ResultSetDict(dict):
     def __getitem__(self, item):
         if type(item) is not str:
@@ -13,6 +48,47 @@ class ResultSetDict(dict):
         return super().__getitem__(item.lower())
 
 
+# read-only view of one row, shares the column index of its ResultSet instead of copying into a dict
+# supports row["col"] (case insensitive, like ResultSetDict), row[i], keys(), values() and items()
+class ResultSetRow:
+    __slots__ = ("__values", "__cols", "__header")
+
+    def __init__(self, values: tuple, cols, header):
+        self.__values = values
+        self.__cols = cols
+        self.__header = header
+
+    def __getitem__(self, item):
+        if type(item) is int:
+            return self.__values[item]
+        if type(item) is not str:
+            return None
+        return self.__values[self.__cols[item]]
+
+    def __len__(self):
+        return len(self.__values)
+
+    def __iter__(self):
+        return iter(self.__header)
+
+    def __str__(self):
+        return str(dict(self.items()))
+
+    def get(self, item, default=None):
+        if type(item) is not str or item.lower() not in self.__cols:
+            return default
+        return self.__values[self.__cols[item]]
+
+    def keys(self):
+        return self.__header
+
+    def values(self):
+        return self.__values
+
+    def items(self):
+        return zip(self.__header, self.__values)
+
+
 class ResultSet:
     # constructor
     def __init__(self, description=None, results=None):
@@ -44,6 +120,23 @@ class ResultSet:
     def isEmpty(self):
         return self.size() == 0
 
+    # the row as a ResultSetRow, no dict is built (result[row] still returns a ResultSetDict)
+    def row(self, row: int) -> ResultSetRow:
+        return ResultSetRow(self.rows[row], self.cols, self.cols_header)
+
+    # all values of a column, by name or position, [] for an empty ResultSet
+    def column(self, col) -> list:
+        if self.isEmpty():
+            return []
+        index = col if type(col) is int else self.cols[col]
+        return [values[index] for values in self.rows]
+
+    # the first value of the first row, None for an empty ResultSet (e.g. SELECT SUM(...) or SELECT COUNT(*))
+    def scalar(self):
+        if self.isEmpty():
+            return None
+        return self.rows[0][0]
+
     def __getRow(self, row: int):
         if len(self.rows) <= row:
             print('Invalid row ' + str(row))
@@ -57,39 +150,176 @@ class ResultSet:
         if results is None or len(results) == 0:  # no results
             self.cols = ResultSetDict()
         else:
-            self.rows = results.copy()
+            # fetchall already returns a fresh list, no need to copy it again
+            self.rows = results
             self.cols_header = [d.name for d in description]
             self.cols = ResultSetDict()
             for col, index in zip(self.cols_header, range(len(results[0]))):
                 self.cols[col] = index
 
 
-class DBConnector:
+# a single-pass ResultSet that reads the rows of a named server-side cursor in chunks of itersize
+# only one chunk is held in memory, rows must be consumed before the transaction ends (commit/rollback/close)
+class StreamingResultSet:
     # constructor
+    def __init__(self, cursor, itersize: int):
+        self.cols_header = []
+        self.cols = ResultSetDict()
+        self.rows_read = 0
+        self.__cursor = cursor
+        self.__itersize = itersize
+
+    # iterate over the rows, each row is a ResultSetDict like ResultSet[i]
+    def __iter__(self):
+        for chunk in self.chunks():
+            for row in chunk:
+                row_to_return = ResultSetDict()
+                for val, col in zip(row, self.cols_header):
+                    row_to_return[col] = val
+                yield row_to_return
+
+    # iterate over the rows in chunks, each chunk is a list of tuples ordered as cols_header
+    def chunks(self):
+        if self.__cursor is None:
+            return
+        try:
+            while True:
+                chunk = mapException(self.__cursor.fetchmany, self.__itersize)
+                if not self.cols_header and self.__cursor.description is not None:
+                    self.cols_header = [d.name for d in self.__cursor.description]
+                    for index, col in enumerate(self.cols_header):
+                        self.cols[col] = index
+                if not chunk:
+                    break
+                self.rows_read += len(chunk)
+                yield chunk
+        finally:
+            self.close()
+
+    # release the server-side cursor before all rows were read
+    def close(self):
+        if self.__cursor is not None:
+            if not self.__cursor.closed and not self.__cursor.connection.closed:
+                try:
+                    self.__cursor.close()
+                except Exception:
+                    pass
+            self.__cursor = None
+
+
+# a statement that is PREPAREd once per connection and then EXECUTEd with bound values
+# text uses $1, $2, ... placeholders, types are the matching SQL types, e.g. ("integer", "text")
+class PreparedStatement:
+    def __init__(self, name: str, text: str, types=()):
+        if not name.isidentifier():
+            raise ValueError("invalid prepared statement name: " + name)
+        self.name = name.lower()
+        self.text = text
+        self.types = tuple(types)
+        # both texts are composed once here and reused on every call
+        if self.types:
+            self.prepareQuery = "PREPARE " + self.name + " (" + ", ".join(self.types) + ") AS " + text
+            self.executeQuery = "EXECUTE " + self.name + " (" + ", ".join(["%s"] * len(self.types)) + ")"
+        else:
+            self.prepareQuery = "PREPARE " + self.name + " AS " + text
+            self.executeQuery = "EXECUTE " + self.name
+
+
+class DBConnector:
+    # registered prepared statements, name -> PreparedStatement
+    __statements = {}
+    # names for the server-side cursors of executeStream
+    __cursorNames = itertools.count()
+    # names for the savepoints of DBConnectors inside a session
+    __savepointNames = itertools.count()
+
+    # connections are shared between DBConnector instances through this pool
+    __pool = None
+    __poolOptions = {}
+    __poolLock = threading.Lock()
+
+    # constructor, borrows a connection from the pool
+    # inside a session the session's connection is used instead: commit releases and rollback rolls back to a
+    # savepoint taken before the first statement, so only this connector's own changes are affected
     def __init__(self):
+        self.connection = None
+        self.cursor = None
+        self.__savepoint = None
+        self.__inSavepoint = False
+        self.__lender = None  # the pool the connection came from, configurePool may have replaced it since
+        session = activeSession.get()
+        if session is not None:
+            if session.connection is None:
+                raise DatabaseException.ConnectionInvalid("Connection Invalid")
+            self.connection = session.connection
+            self.cursor = self.connection.cursor()
+            self.__savepoint = "savepoint_" + str(next(DBConnector.__savepointNames))
+            return
         try:
-            # Obtain the configuration parameters
-            params = DBConnector.__config()
-            self.connection = psycopg2.connect(**params)
-            self.connection.autocommit = False
+            self.__lender = DBConnector.getPool()
+            self.connection = self.__lender.getconn()
             self.cursor = self.connection.cursor()
         except Exception as e:
+            if self.connection is not None:
+                self.__lender.putconn(self.connection, discard=True)
             self.connection = None
             self.cursor = None
             raise DatabaseException.ConnectionInvalid("Could not connect to database")
 
-    # close connection
+    # close connection, the underlying connection goes back to the pool and uncommitted changes are rolled back
     def close(self):
+        if self.__savepoint is not None and self.__inSavepoint:
+            try:
+                self.rollback()
+            except Exception:
+                pass
         if self.cursor is not None:
             self.cursor.close()
+            self.cursor = None
         if self.connection is not None:
-            self.connection.close()
+            # the session's connection stays with the session
+            if self.__savepoint is None:
+                self.__lender.putconn(self.connection)
+            self.connection = None
+
+    # the process-wide pool, created on first use from database.ini
+    @staticmethod
+    def getPool() -> ConnectionPool:
+        if DBConnector.__pool is None:
+            with DBConnector.__poolLock:
+                if DBConnector.__pool is None:
+                    options = DBConnector.__poolOptionsFromConfig()
+                    options.update(DBConnector.__poolOptions)
+                    DBConnector.__pool = ConnectionPool(DBConnector.__config(), **options)
+        return DBConnector.__pool
+
+    # pool settings from the optional [pool] section of database.ini
+    @staticmethod
+    def __poolOptionsFromConfig() -> dict:
+        options = {}
+        for key, value in Config.loadConfig('pool', required=False).items():
+            options[key] = int(value) if key in ('minconn', 'maxconn') else float(value)
+        return options
+
+    # change the pool settings (minconn, maxconn, max_idle, health_check_after, timeout)
+    # open connections are closed, the next DBConnector starts a new pool
+    @staticmethod
+    def configurePool(**options):
+        with DBConnector.__poolLock:
+            DBConnector.__poolOptions = options
+            if DBConnector.__pool is not None:
+                DBConnector.__pool.closeall()
+                DBConnector.__pool = None
 
     # commit connection's changes
     def commit(self):
         if self.connection is not None:
             try:
-                self.connection.commit()
+                if self.__savepoint is None:
+                    self.connection.commit()
+                elif self.__inSavepoint:
+                    self.__inSavepoint = False
+                    self.cursor.execute("RELEASE SAVEPOINT " + self.__savepoint)
             except Exception:
                 raise DatabaseException.ConnectionInvalid("Could not commit changes")
 
@@ -97,28 +327,126 @@ class DBConnector:
     def rollback(self):
         if self.connection is not None:
             try:
-                self.connection.rollback()
+                if self.__savepoint is None:
+                    self.connection.rollback()
+                elif self.__inSavepoint:
+                    self.__inSavepoint = False
+                    self.cursor.execute("ROLLBACK TO SAVEPOINT " + self.__savepoint + "; "
+                                        "RELEASE SAVEPOINT " + self.__savepoint)
             except Exception:
                 raise DatabaseException.ConnectionInvalid("Could not rollback changes")
 
+    # inside a session: take the savepoint now rather than before the first statement (a nested Session runs no
+    # statements itself), does nothing if it is already taken or outside a session
+    def savepoint(self):
+        if self.__savepoint is not None and not self.__inSavepoint:
+            mapException(self.cursor.execute, "SAVEPOINT " + self.__savepoint)
+            self.__inSavepoint = True
+
+    # register a statement for executePrepared, registering the same name again replaces it
+    @staticmethod
+    def prepare(name: str, text: str, types=()) -> PreparedStatement:
+        statement = PreparedStatement(name, text, types)
+        DBConnector.__statements[statement.name] = statement
+        return statement
+
+    # the registered statement called name
+    @staticmethod
+    def getStatement(name: str) -> PreparedStatement:
+        return DBConnector.__statements[name.lower()]
+
+    # executes a registered statement with the given parameters, PREPAREs it first if this connection has not yet
+    # returns the same as execute
+    def executePrepared(self, name: str, params=(), printSchema=False) -> (int, ResultSet):
+        if self.connection is None:
+            raise DatabaseException.ConnectionInvalid("Connection Invalid")
+        statement = DBConnector.getStatement(name)
+        prepared = self.connection.prepared.get(statement.name)
+        if prepared is not statement:
+            if prepared is not None:
+                # the name was registered again with a different text
+                self.__execute("DEALLOCATE " + statement.name, None)
+                del self.connection.prepared[statement.name]
+            self.__execute(statement.prepareQuery, None)
+            # prepared statements outlive the transaction, even a rolled back one
+            self.connection.prepared[statement.name] = statement
+        return self.__execute(statement.executeQuery, tuple(params) if statement.types else None, printSchema,
+                              statement.text)
+
     # executes the query, if it is SELECT you may ask to print the results with printSchema
     # returns the number of rows effected and a ResultSet (for SELECT)
     def execute(self, query: Union[str, sql.Composed], printSchema=False) -> (int, ResultSet):
         if self.connection is None:
             raise DatabaseException.ConnectionInvalid("Connection Invalid")
+        return self.__execute(query, None, printSchema)
 
-        # try execute the query
+    # executes query (containing a single VALUES %s) for many rows, page_size rows per round trip
+    # with fetch=True the rows returned by the statement (e.g. INSERT ... RETURNING) come back in the ResultSet
+    # returns the number of rows effected and a ResultSet
+    def executeMany(self, query: Union[str, sql.Composed], rows, template=None, page_size=1000,
+                    fetch=False) -> (int, ResultSet):
+        if self.connection is None:
+            raise DatabaseException.ConnectionInvalid("Connection Invalid")
+        results = self.__call(self.cursor, query, None, extras.execute_values, self.cursor, query, rows, template,
+                              page_size, fetch)
+        if fetch:
+            return len(results), ResultSet(self.cursor.description, results)
+        return max(self.cursor.rowcount, 0), ResultSet()
+
+    # runs a COPY ... FROM STDIN statement reading its input from stream (anything with read(size))
+    # an exception raised by the stream itself is re-raised as is, returns the number of copied rows
+    def copyFrom(self, query: Union[str, sql.Composed], stream, size=8192) -> int:
+        if self.connection is None:
+            raise DatabaseException.ConnectionInvalid("Connection Invalid")
+        try:
+            self.__call(self.cursor, query, None, self.cursor.copy_expert, query, stream, size)
+        except Exception:
+            if getattr(stream, "error", None) is not None:
+                raise stream.error
+            raise
+        return max(self.cursor.rowcount, 0)
+
+    # executes a SELECT through a named server-side cursor and returns a StreamingResultSet
+    # rows are transferred itersize at a time while iterating, so memory stays bounded for big tables
+    def executeStream(self, query: Union[str, sql.Composed], params=None, itersize=2000) -> StreamingResultSet:
+        if self.connection is None:
+            raise DatabaseException.ConnectionInvalid("Connection Invalid")
+        cursor = self.connection.cursor(name="resultset_stream_" + str(next(DBConnector.__cursorNames)))
+        cursor.itersize = itersize
         try:
-            self.cursor.execute(query)
-            row_effected = max(self.cursor.rowcount, 0)
-        except errors.lookup("23502"):
-            raise DatabaseException.NOT_NULL_VIOLATION("NOT_NULL_VIOLATION")
-        except errors.lookup("23503"):
-            raise DatabaseException.FOREIGN_KEY_VIOLATION("FOREIGN_KEY_VIOLATION")
-        except errors.lookup("23505"):
-            raise DatabaseException.UNIQUE_VIOLATION("UNIQUE_VIOLATION")
-        except errors.lookup("23514"):
-            raise DatabaseException.CHECK_VIOLATION("CHECK_VIOLATION")
+            self.__call(cursor, query, params, cursor.execute, query, params)
+        except Exception:
+            cursor.close()
+            raise
+        return StreamingResultSet(cursor, itersize)
+
+    # executes a SELECT and returns its rows as a ColumnarResultSet (one numpy array per column)
+    # the column types are looked up with LIMIT 0 first, if they are all integers, floats or booleans the rows are
+    # sent with COPY ... TO STDOUT (FORMAT binary) and decoded straight into the arrays, otherwise (e.g. text or
+    # numeric columns) they are fetched through the cursor chunksize rows at a time
+    # requires numpy
+    def executeColumnar(self, query: Union[str, sql.Composed], params=None, chunksize=10000):
+        # imported here, ColumnarResultSet depends on this module
+        from Utility.ColumnarResultSet import ColumnarResultSet
+        if self.connection is None:
+            raise DatabaseException.ConnectionInvalid("Connection Invalid")
+        text = self.cursor.mogrify(query, params).decode().strip().rstrip(";")
+        if text.split(None, 1)[0].lower() in ("select", "with", "values"):
+            probe = "SELECT * FROM (" + text + ") AS columnar LIMIT 0"
+            self.__call(self.cursor, probe, None, self.cursor.execute, probe)
+            sink = ColumnarResultSet.copySink(self.cursor.description)
+            if sink is not None:
+                copy = sink.statement(text)
+                self.__call(self.cursor, copy, None, self.cursor.copy_expert, copy, sink)
+                return sink.result()
+        self.__call(self.cursor, query, params, self.cursor.execute, query, params)
+        return ColumnarResultSet.fromCursor(self.cursor, chunksize)
+
+    # text is what the instrumentation hooks see as the query, the query itself by default
+    def __execute(self, query, params, printSchema=False, text=None) -> (int, ResultSet):
+        # try execute the query
+        self.__call(self.cursor, query if text is None else text, params, self.cursor.execute, query, params)
+        row_effected = max(self.cursor.rowcount, 0)
 
         # get entries in case of SELECT
         if self.cursor.description is not None:
@@ -132,25 +460,23 @@ class DBConnector:
 
         return row_effected, entries
 
-    # grant credentials
+    # runs function(*args) with constraint violations mapped, and reports it to the Instrumentation hooks if any
+    def __call(self, cursor, query, params, function, *args):
+        self.savepoint()
+        if not Instrumentation.active:
+            return mapException(function, *args)
+        if isinstance(query, sql.Composable):
+            query = query.as_string(cursor)
+        token = Instrumentation.start(query, params)
+        try:
+            result = mapException(function, *args)
+        except Exception as e:
+            Instrumentation.finish(token, -1, e)
+            raise
+        Instrumentation.finish(token, cursor.rowcount)
+        return result
+
+    # grant credentials, database.ini is parsed once per process (see Utility.Config)
     @staticmethod
-    def __config(filename=os.path.join(os.path.join(os.getcwd(), "Utility"), 'database.ini'),
-                 section='postgresql'):
-        # create a parser
-        parser = ConfigParser()
-        # read config file
-        parser.read(filename)
-
-        # get section
-        db = {}
-        if parser.has_section(section):
-            params = parser.items(section)
-            for param in params:
-                db[param[0]] = param[1]
-        else:
-            # file not found
-            db = DBConnector.__config(
-                filename=os.path.join(os.path.join(os.path.dirname(os.getcwd()), 'Utility'), 'database.ini'))
-            if db is None:
-                raise DatabaseException.database_ini_ERROR("Please modify database.ini file under Utility")
-        return db
+    def __config(section='postgresql'):
+        return Config.loadConfig(section)
@@ -0,0 +1,154 @@
+import threading
+import time
+from collections import OrderedDict
+from Utility import Config
+from Utility.DBConnector import activeSession, currentSession
+
+'''
+    in-process read-through cache for the get*ByID lookups of Solution
+    entries are keyed by (entity, id), e.g. ("Disk", 3), and hold the row values (not the Business objects, which are
+    mutable) or None for an id that does not exist (a negative entry, kept for negative_ttl seconds only)
+    the cache is off unless database.ini has a [cache] section with maxsize > 0 (or configure() is called):
+        [cache]
+        maxsize=10000
+        ttl=60
+        negative_ttl=5
+    Solution invalidates the entries its write paths change, writes of other processes are seen after ttl seconds
+    inside a Session the invalidations wait until the session commits
+'''
+
+
+class EntityCache:
+    # the process-wide cache, None while caching is off
+    __cache = None
+    __configured = False
+    __lock = threading.Lock()
+    # other caches of the same rows in this process (e.g. the SharedCache reader), invalidated along with this one
+    __followers = []
+
+    # constructor, maxsize - entries kept before the least recently used is evicted
+    # ttl / negative_ttl - seconds an entry / a negative entry is served
+    def __init__(self, maxsize=10000, ttl=60.0, negative_ttl=5.0):
+        if maxsize < 1:
+            raise ValueError("invalid cache size: maxsize=" + str(maxsize))
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.__entries = OrderedDict()  # key -> (expires at, row or None), least recently used first
+        self.__generation = 0  # bumped by every discard and clear, see put
+        self.__lock = threading.Lock()
+
+    # the process-wide cache to use, None while caching is off or inside a Session (whose reads may see
+    # uncommitted changes)
+    @staticmethod
+    def get():
+        if not EntityCache.__configured:
+            with EntityCache.__lock:
+                if not EntityCache.__configured:
+                    options = {}
+                    for key, value in Config.loadConfig('cache', required=False).items():
+                        options[key] = int(value) if key == 'maxsize' else float(value)
+                    if options.get('maxsize', 0) > 0:
+                        EntityCache.__cache = EntityCache(**options)
+                    EntityCache.__configured = True
+        if activeSession.get() is not None:
+            return None
+        return EntityCache.__cache
+
+    # turn caching on with the given settings (maxsize, ttl, negative_ttl), or off with maxsize=0
+    @staticmethod
+    def configure(**options):
+        with EntityCache.__lock:
+            EntityCache.__cache = EntityCache(**options) if options.get('maxsize', 1) > 0 else None
+            EntityCache.__configured = True
+
+    # follower.invalidateLocal(*keys) / follower.flushLocal() are called on every invalidate / flush
+    @staticmethod
+    def addFollower(follower):
+        EntityCache.__followers.append(follower)
+
+    @staticmethod
+    def removeFollower(follower):
+        if follower in EntityCache.__followers:
+            EntityCache.__followers.remove(follower)
+
+    # drop key from the process-wide cache, if any, inside a Session once the session commits
+    @staticmethod
+    def invalidate(*keys):
+        session = currentSession.get()
+        if session is not None:
+            session.invalidate(*keys)
+            return
+        cache = EntityCache.__cache
+        if cache is not None:
+            for key in keys:
+                cache.discard(key)
+        for follower in list(EntityCache.__followers):
+            follower.invalidateLocal(*keys)
+
+    # empty the process-wide cache, if any, inside a Session once the session commits
+    @staticmethod
+    def flush():
+        session = currentSession.get()
+        if session is not None:
+            session.flush()
+            return
+        cache = EntityCache.__cache
+        if cache is not None:
+            cache.clear()
+        for follower in list(EntityCache.__followers):
+            follower.flushLocal()
+
+    # (True, row or None) for a live entry, (False, None) otherwise
+    def lookup(self, key):
+        now = time.monotonic()
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self.__entries[key]
+                self.misses += 1
+                return False, None
+            self.__entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[1]
+
+    # to be read before the row to put is queried
+    def generation(self) -> int:
+        return self.__generation
+
+    # remember row for key, None means key does not exist
+    # a row queried before generation() changed is dropped, an invalidation may have raced with the query
+    def put(self, key, row, generation=None):
+        expires = time.monotonic() + (self.ttl if row is not None else self.negative_ttl)
+        with self.__lock:
+            if generation is not None and generation != self.__generation:
+                return
+            self.__entries[key] = (expires, row)
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.maxsize:
+                self.__entries.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, key):
+        with self.__lock:
+            self.__generation += 1
+            self.__entries.pop(key, None)
+
+    def clear(self):
+        with self.__lock:
+            self.__generation += 1
+            self.__entries.clear()
+
+    def size(self):
+        with self.__lock:
+            return len(self.__entries)
+
+    # hits, misses, evictions and size
+    def stats(self) -> dict:
+        with self.__lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "size": len(self.__entries)}
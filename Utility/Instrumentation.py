@@ -0,0 +1,193 @@
+import math
+import sys
+import threading
+import time
+
+'''
+    query instrumentation for DBConnector / AsyncDBConnector
+    a before-execute hook is called as hook(query, params) and an after-execute hook as hook(event) with a QueryEvent
+    while no hook is installed the connectors only test the active flag below
+'''
+
+# True while at least one hook is installed
+active = False
+
+_beforeHooks = []
+_afterHooks = []
+_lock = threading.Lock()
+
+
+# what an after-execute hook receives
+class QueryEvent:
+    __slots__ = ("query", "params", "duration", "rowcount", "exception", "caller")
+
+    def __init__(self, query, params, duration, rowcount, exception, caller):
+        self.query = query  # query text (the statement text for prepared statements)
+        self.params = params
+        self.duration = duration  # seconds
+        self.rowcount = rowcount  # -1 if the query failed
+        self.exception = exception  # class of the raised (DatabaseException-mapped) exception, None on success
+        self.caller = caller  # "module.function" that issued the query, e.g. "Solution.addFile"
+
+    def __str__(self):
+        return self.caller + ": " + str(self.query) + " (" + str(round(self.duration * 1000, 3)) + " ms)"
+
+
+def addBeforeExecuteHook(hook):
+    _add(_beforeHooks, hook)
+
+
+def addAfterExecuteHook(hook):
+    _add(_afterHooks, hook)
+
+
+# removes hook from both lists
+def removeHook(hook):
+    global active
+    with _lock:
+        for hooks in (_beforeHooks, _afterHooks):
+            if hook in hooks:
+                hooks.remove(hook)
+        active = bool(_beforeHooks or _afterHooks)
+
+
+def _add(hooks, hook):
+    global active
+    with _lock:
+        hooks.append(hook)
+        active = True
+
+
+# called by the connectors right before a query, returns the token to pass to finish
+def start(query, params):
+    caller = _caller()
+    for hook in list(_beforeHooks):
+        # a failing hook must not fail the query
+        try:
+            hook(query, params)
+        except Exception:
+            pass
+    return query, params, caller, time.perf_counter()
+
+
+# called by the connectors after the query ran (or raised exception)
+def finish(token, rowcount, exception=None):
+    query, params, caller, started = token
+    event = QueryEvent(query, params, time.perf_counter() - started, rowcount if exception is None else -1,
+                       None if exception is None else type(exception), caller)
+    for hook in list(_afterHooks):
+        try:
+            hook(event)
+        except Exception:
+            pass
+
+
+# the first function up the stack that is not part of Utility and not a private helper (its name starts with _)
+def _caller() -> str:
+    frame = sys._getframe(2)
+    fallback = None
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if not module.startswith("Utility.") and module != "Utility":
+            name = module + "." + frame.f_code.co_name
+            if fallback is None:
+                fallback = name
+            if not frame.f_code.co_name.startswith("_"):
+                return name
+        frame = frame.f_back
+    return fallback or "<unknown>"
+
+
+# latency histogram with logarithmic buckets, 4 per power of two microseconds (relative error below 19%)
+class LatencyHistogram:
+    __BUCKETS_PER_DOUBLING = 4
+    __MAX_BUCKET = 4 * 40
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.__buckets = {}
+
+    def record(self, duration: float, failed=False):
+        self.count += 1
+        self.errors += 1 if failed else 0
+        self.total += duration
+        self.max = max(self.max, duration)
+        micros = duration * 1e6
+        bucket = 0 if micros <= 1 else min(math.ceil(math.log2(micros) * LatencyHistogram.__BUCKETS_PER_DOUBLING),
+                                          LatencyHistogram.__MAX_BUCKET)
+        self.__buckets[bucket] = self.__buckets.get(bucket, 0) + 1
+
+    # the duration (seconds) below which fraction (e.g. 0.95) of the calls finished, upper bound of its bucket
+    def percentile(self, fraction: float) -> float:
+        if self.count == 0:
+            return 0.0
+        rank = max(1, math.ceil(fraction * self.count))
+        seen = 0
+        for bucket in sorted(self.__buckets):
+            seen += self.__buckets[bucket]
+            if seen >= rank:
+                return min(2 ** (bucket / LatencyHistogram.__BUCKETS_PER_DOUBLING) / 1e6, self.max)
+        return self.max
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+# after-execute hook that keeps a LatencyHistogram per (caller, query)
+# usage: aggregator = LatencyAggregator().install() ... print(aggregator.report()) ... aggregator.uninstall()
+class LatencyAggregator:
+    def __init__(self):
+        self.histograms = {}
+        self.__lock = threading.Lock()
+
+    def __call__(self, event: QueryEvent):
+        key = (event.caller, event.query)
+        with self.__lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = LatencyHistogram()
+            histogram.record(event.duration, event.exception is not None)
+
+    def install(self):
+        addAfterExecuteHook(self)
+        return self
+
+    def uninstall(self):
+        removeHook(self)
+
+    def reset(self):
+        with self.__lock:
+            self.histograms = {}
+
+    # (caller, query) -> {count, errors, mean, p50, p95, p99, max}, durations in seconds
+    def stats(self) -> dict:
+        with self.__lock:
+            return {key: {"count": histogram.count,
+                          "errors": histogram.errors,
+                          "mean": histogram.mean(),
+                          "p50": histogram.percentile(0.50),
+                          "p95": histogram.percentile(0.95),
+                          "p99": histogram.percentile(0.99),
+                          "max": histogram.max}
+                    for key, histogram in self.histograms.items()}
+
+    # caller -> number of queries it issued
+    def callCounts(self) -> dict:
+        counts = {}
+        with self.__lock:
+            for (caller, _), histogram in self.histograms.items():
+                counts[caller] = counts.get(caller, 0) + histogram.count
+        return counts
+
+    # one line per (caller, query), slowest p99 first, durations in milliseconds
+    def report(self) -> str:
+        lines = []
+        for (caller, query), stat in sorted(self.stats().items(), key=lambda item: -item[1]["p99"]):
+            lines.append(caller + "   calls=" + str(stat["count"]) + "   errors=" + str(stat["errors"]) +
+                         "   p50=" + str(round(stat["p50"] * 1000, 3)) +
+                         "   p95=" + str(round(stat["p95"] * 1000, 3)) +
+                         "   p99=" + str(round(stat["p99"] * 1000, 3)) + "   " + " ".join(str(query).split()))
+        return "\n".join(lines)
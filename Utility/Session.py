@@ -0,0 +1,129 @@
+from Utility.DBConnector import DBConnector, activeSession, currentSession
+from Utility.EntityCache import EntityCache
+
+'''
+    unit of work: the Solution functions called through a session (or inside its with block) share one connection
+    and one transaction, each of them runs under its own savepoint so it returns the same Status as when called alone
+    and a failed call leaves the work of the others in place, the session commits once at the end
+        with Solution.session() as session:
+            session.addDisk(disk)
+            for ram in rams:
+                session.addRAMToDisk(ram.getRamID(), disk.getDiskID())
+    leaving the with block because of an exception rolls everything back
+    the EntityCache entries the calls change are invalidated when the session commits (a nested session hands them
+    to the outer one), not when each call's savepoint is released
+'''
+
+
+class Session:
+    # constructor, operations is the module whose functions the session exposes (e.g. Solution)
+    def __init__(self, operations=None):
+        self.operations = operations
+        self.connector = None
+        self.__token = None
+        self.__sessionToken = None
+        self.__outer = None
+        self.__invalidated = []  # EntityCache keys changed since the last commit
+        self.__flushed = False  # whether the whole EntityCache is to be flushed on commit
+
+    # borrows the connection and makes the session active for the current thread / task
+    # a session started inside another session runs under a savepoint of the outer one
+    def begin(self):
+        if self.connector is not None:
+            raise RuntimeError("session already started")
+        self.connector = DBConnector()
+        try:
+            self.connector.savepoint()
+        except Exception:
+            self.connector.close()
+            self.connector = None
+            raise
+        self.__outer = currentSession.get()
+        self.__token = activeSession.set(self.connector)
+        self.__sessionToken = currentSession.set(self)
+        return self
+
+    # commit the work done so far, the session can go on with a new transaction
+    def commit(self):
+        if self.connector is not None:
+            self.connector.commit()
+            self.connector.savepoint()
+            self.__applyInvalidations()
+
+    # roll back the work done since the last commit
+    def rollback(self):
+        if self.connector is not None:
+            self.connector.rollback()
+            self.connector.savepoint()
+            self.__invalidated = []
+            self.__flushed = False
+
+    # uncommitted work is rolled back and the connection goes back to the pool
+    def close(self):
+        if self.connector is None:
+            return
+        try:
+            currentSession.reset(self.__sessionToken)
+            activeSession.reset(self.__token)
+        except ValueError:
+            # closed from another thread / task than the one that began it
+            pass
+        self.__token = None
+        self.__sessionToken = None
+        self.__invalidated = []
+        self.__flushed = False
+        connector, self.connector = self.connector, None
+        connector.close()
+
+    def __enter__(self):
+        return self.begin()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type is None:
+                self.commit()
+            else:
+                self.rollback()
+        finally:
+            self.close()
+        return False
+
+    # session.addDisk(...) calls operations.addDisk(...) inside the session, also outside the with block
+    def __getattr__(self, name):
+        if name.startswith("_") or self.operations is None:
+            raise AttributeError(name)
+        function = getattr(self.operations, name)
+        if not callable(function):
+            return function
+
+        def call(*args, **kwargs):
+            if self.connector is None:
+                raise RuntimeError("session not started")
+            token = activeSession.set(self.connector)
+            sessionToken = currentSession.set(self)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                currentSession.reset(sessionToken)
+                activeSession.reset(token)
+        return call
+
+    # called by EntityCache.invalidate / flush inside the session, applied on commit
+    def invalidate(self, *keys):
+        self.__invalidated.extend(keys)
+
+    def flush(self):
+        self.__flushed = True
+
+    # the outer session (if any) takes the invalidations over, otherwise they reach the EntityCache now
+    def __applyInvalidations(self):
+        keys, flushed = self.__invalidated, self.__flushed
+        self.__invalidated, self.__flushed = [], False
+        token = currentSession.set(self.__outer)
+        try:
+            if flushed:
+                EntityCache.flush()
+            elif keys:
+                EntityCache.invalidate(*keys)
+        finally:
+            currentSession.reset(token)
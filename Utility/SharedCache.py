@@ -0,0 +1,282 @@
+import struct
+import sys
+import threading
+from multiprocessing import shared_memory, resource_tracker
+from Utility import Config
+from Utility.DBConnector import DBConnector, activeSession
+from Utility.EntityCache import EntityCache
+
+'''
+    cache of the Files, Disks and Rams rows shared by the worker processes of one machine, in a fixed-layout
+    multiprocessing.shared_memory segment: a header and one array of fixed-size records per table, the record of an
+    id lives in slot id % capacity (a colliding id replaces it, readers compare the stored id)
+    one process is the writer, it creates the segment and keeps it up to date from the database, usually driven by a
+    ChangeListener:
+        cache = SharedCache.create("solution", capacity=1 << 16)
+        cache.refresh()
+        listener = ChangeListener.fromConfig()
+        listener.subscribe(cache.apply)
+        listener.start()
+    the other processes only read, without locks and without unpickling, after a [shared_cache] section with the
+    segment's name in database.ini (or SharedCache.configure(name=...)), Solution's get*ByID try it first
+    every record starts with a version that the writer makes odd while it rewrites the record and even again after
+    (a seqlock), a reader retries while the version is odd or changed under it
+    this relies on the stores of the writer becoming visible in program order, as they do on x86
+    strings longer than 31 bytes (utf-8) are not cached, such rows are always read from the database
+    a process does not serve the rows it changed itself until the writer rewrote them (see invalidateLocal)
+'''
+
+_MAGIC = b"SOLSHM01"
+# magic, capacity, generation (bumped by the writer after every refresh or apply)
+_HEADER = struct.Struct("<8sqQ")
+_HEADER_SIZE = 64
+_VERSION = struct.Struct("<Q")
+
+# entity -> (table, key column, record layout: version, id, then the other constructor arguments in order)
+_LAYOUTS = {
+    "File": ("Files", "file_id", struct.Struct("<Qq32pq")),
+    "Disk": ("Disks", "disk_id", struct.Struct("<Qq32pqqq")),
+    "RAM": ("Rams", "ram_id", struct.Struct("<Qq32pq")),
+}
+_ENTITIES = {table: entity for entity, (table, _, _) in _LAYOUTS.items()}
+# reads retried before a lookup gives up and goes to the database
+_RETRIES = 16
+
+for _entity, (_table, _column, _) in _LAYOUTS.items():
+    DBConnector.prepare("sharedCache" + _entity, "SELECT * FROM " + _table + " WHERE " + _column + " = ANY($1)",
+                        ("integer[]",))
+
+
+# the segment outlives the processes using it and is removed with unlink() only, so it is kept from the resource
+# tracker (which removes the segments of a process when it exits)
+def _open(name, create=False, size=0) -> shared_memory.SharedMemory:
+    try:
+        return shared_memory.SharedMemory(name, create=create, size=size, track=False)
+    except TypeError:
+        # track was added in Python 3.13
+        pass
+    memory = shared_memory.SharedMemory(name, create=create, size=size)
+    resource_tracker.unregister(memory._name, "shared_memory")
+    return memory
+
+
+class SharedCache:
+    # the segment this process reads from, None while sharing is off
+    __reader = None
+    __configured = False
+    __lock = threading.Lock()
+
+    # use create / attach
+    def __init__(self, memory: shared_memory.SharedMemory, capacity: int, writer: bool):
+        self.memory = memory
+        self.capacity = capacity
+        self.writer = writer
+        self.hits = 0
+        self.misses = 0
+        self.__buffer = memory.buf
+        self.__bases = {}
+        base = _HEADER_SIZE
+        for entity, (_, _, layout) in _LAYOUTS.items():
+            self.__bases[entity] = base
+            base += layout.size * capacity
+        self.__dirty = {}  # (entity, id) -> version of its slot when this process changed the row
+        self.__barrier = None  # generation during which this process serves nothing (after flushLocal())
+
+    # the writer's segment, an existing segment of the same capacity is reused (and stays warm across restarts)
+    @staticmethod
+    def create(name: str, capacity: int = 1 << 16):
+        if capacity < 1:
+            raise ValueError("invalid capacity: " + str(capacity))
+        size = _HEADER_SIZE + sum(layout.size for _, _, layout in _LAYOUTS.values()) * capacity
+        try:
+            memory = _open(name, create=True, size=size)
+            _HEADER.pack_into(memory.buf, 0, _MAGIC, capacity, 0)
+        except FileExistsError:
+            cache = SharedCache.attach(name)
+            if cache.capacity != capacity:
+                cache.close()
+                raise ValueError("shared cache " + name + " exists with capacity " + str(cache.capacity))
+            cache.writer = True
+            return cache
+        return SharedCache(memory, capacity, True)
+
+    # a reader of the segment created by the writer
+    @staticmethod
+    def attach(name: str):
+        memory = _open(name)
+        magic, capacity, _ = _HEADER.unpack_from(memory.buf, 0)
+        if magic != _MAGIC:
+            memory.close()
+            raise ValueError(name + " is not a shared cache")
+        return SharedCache(memory, capacity, False)
+
+    # the segment to read from, None while sharing is off, its segment does not exist yet or inside a Session
+    @staticmethod
+    def get():
+        if not SharedCache.__configured:
+            SharedCache.configure(**Config.loadConfig('shared_cache', required=False))
+        if activeSession.get() is not None:
+            return None
+        return SharedCache.__reader
+
+    # read from the segment name, or stop sharing with name=None
+    @staticmethod
+    def configure(name=None):
+        with SharedCache.__lock:
+            if SharedCache.__reader is not None:
+                EntityCache.removeFollower(SharedCache.__reader)
+                SharedCache.__reader.close()
+            SharedCache.__reader = None
+            if name:
+                try:
+                    SharedCache.__reader = SharedCache.attach(name)
+                except (FileNotFoundError, ValueError):
+                    pass
+                else:
+                    # the invalidations of Solution's writes reach the reader through the EntityCache
+                    EntityCache.addFollower(SharedCache.__reader)
+            SharedCache.__configured = True
+
+    # the segment read by this process, None while sharing is off (unlike get() also inside a Session)
+    @staticmethod
+    def reader():
+        return SharedCache.__reader
+
+    # the row values of (entity, id), e.g. ("Disk", 3), None if they are not cached (or id is not an int)
+    def lookup(self, entity: str, key: int):
+        if type(key) is not int:
+            self.misses += 1
+            return None
+        if self.__barrier is not None:
+            if self.generation() == self.__barrier:
+                self.misses += 1
+                return None
+            self.__barrier = None
+        layout = _LAYOUTS[entity][2]
+        offset = self.__bases[entity] + (key % self.capacity) * layout.size
+        for _ in range(_RETRIES):
+            record = layout.unpack_from(self.__buffer, offset)
+            if record[0] & 1 or _VERSION.unpack_from(self.__buffer, offset)[0] != record[0]:
+                continue
+            if record[1] != key:
+                self.__dirty.pop((entity, key), None)
+                break
+            if (entity, key) in self.__dirty:
+                if self.__dirty[(entity, key)] == record[0]:
+                    break
+                del self.__dirty[(entity, key)]
+            self.hits += 1
+            return (record[1], record[2].decode()) + record[3:]
+        self.misses += 1
+        return None
+
+    # rows this process changed are not served until the writer rewrote them
+    def invalidateLocal(self, *keys):
+        for entity, key in keys:
+            # only int ids are ever stored
+            if entity in _LAYOUTS and type(key) is int:
+                layout = _LAYOUTS[entity][2]
+                offset = self.__bases[entity] + (key % self.capacity) * layout.size
+                version, cached = struct.unpack_from("<Qq", self.__buffer, offset)
+                # a row that is not cached is not served before the writer stores it anyway
+                if cached == key:
+                    self.__dirty[(entity, key)] = version
+
+    # nothing is served until the writer's next refresh or apply
+    def flushLocal(self):
+        self.__dirty.clear()
+        self.__barrier = self.generation()
+
+    def generation(self) -> int:
+        return _HEADER.unpack_from(self.__buffer, 0)[2]
+
+    # writer only: reload every cached table from the database, a table that can't be read is emptied
+    def refresh(self):
+        self.apply({table: None for table in _ENTITIES})
+
+    # writer only: ChangeListener subscriber, re-reads the changed rows ({table: ids or None for all})
+    def apply(self, changes: dict):
+        if not self.writer:
+            raise RuntimeError("only the writer of a shared cache may change it")
+        for table, ids in changes.items():
+            entity = _ENTITIES.get(table)
+            if entity is None:
+                continue
+            try:
+                rows = self.__query(entity, ids)
+            except Exception:
+                rows = {}
+                ids = None
+            for row in rows.values():
+                self.__store(entity, row)
+            if ids is None:
+                self.__clearExcept(entity, rows)
+            else:
+                for key in ids:
+                    if key not in rows:
+                        self.__clear(entity, key)
+        _, capacity, generation = _HEADER.unpack_from(self.__buffer, 0)
+        _HEADER.pack_into(self.__buffer, 0, _MAGIC, capacity, generation + 1)
+
+    # hits, misses of this process and the segment's generation
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "generation": self.generation()}
+
+    # detach from the segment (it stays for the other processes)
+    def close(self):
+        self.__buffer = None
+        self.memory.close()
+
+    # writer only: remove the segment, processes attached to it keep their mapping
+    def unlink(self):
+        if sys.version_info < (3, 13):
+            # SharedMemory.unlink unregisters the segment from the resource tracker, _open did so already
+            resource_tracker.register(self.memory._name, "shared_memory")
+        self.memory.unlink()
+
+    def __query(self, entity, ids) -> dict:
+        conn = None
+        try:
+            conn = DBConnector()
+            if ids is None:
+                _, result = conn.execute("SELECT * FROM " + _LAYOUTS[entity][0])
+            else:
+                _, result = conn.executePrepared("sharedCache" + entity, (list(ids),))
+            conn.commit()
+        finally:
+            if conn is not None:
+                conn.close()
+        return {row[0]: row for row in result.rows}
+
+    def __store(self, entity, row):
+        layout = _LAYOUTS[entity][2]
+        offset = self.__bases[entity] + (row[0] % self.capacity) * layout.size
+        text = row[1].encode()
+        if len(text) > 31:
+            self.__clear(entity, row[0])
+            return
+        version = _VERSION.unpack_from(self.__buffer, offset)[0]
+        _VERSION.pack_into(self.__buffer, offset, version + 1)
+        layout.pack_into(self.__buffer, offset, version + 1, row[0], text, *row[2:])
+        _VERSION.pack_into(self.__buffer, offset, version + 2)
+
+    def __clear(self, entity, key):
+        layout = _LAYOUTS[entity][2]
+        offset = self.__bases[entity] + (key % self.capacity) * layout.size
+        record = layout.unpack_from(self.__buffer, offset)
+        if record[1] == key:
+            self.__clearSlot(layout, offset, record[0])
+
+    def __clearExcept(self, entity, rows):
+        layout = _LAYOUTS[entity][2]
+        base = self.__bases[entity]
+        for slot in range(self.capacity):
+            offset = base + slot * layout.size
+            version, key = struct.unpack_from("<Qq", self.__buffer, offset)
+            if key != 0 and key not in rows:
+                self.__clearSlot(layout, offset, version)
+
+    def __clearSlot(self, layout, offset, version):
+        _VERSION.pack_into(self.__buffer, offset, version + 1)
+        struct.pack_into("<q", self.__buffer, offset + 8, 0)
+        _VERSION.pack_into(self.__buffer, offset, version + 2)